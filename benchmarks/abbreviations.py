@@ -0,0 +1,80 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Compare the single pass abbreviation expansion with expanding every
+abbreviation one after another as the abbreviation table grows.
+'''
+
+import argparse
+import random
+import re
+import string
+import timeit
+
+from instmatcher import core
+
+affiliations = [
+	'Inst of Theoretical Phys, Univ of Hamburg, Hamburg, Germany',
+	'Dept of Chem Engn, Natl Univ of Singapore, Singapore',
+	'Acad of Sci of the Czech Republic, Prague',
+	'Massachusetts Gen Hosp, Harvard Med Sch, Boston, MA, USA',
+]
+
+def randomAbbreviations(size, seed=0):
+	rng = random.Random(seed)
+	table = dict(core.abbreviations)
+	while len(table) < size:
+		length = rng.randint(2, 8)
+		abbrev = ''.join(rng.choice(string.ascii_lowercase) for _ in range(length))
+		table[abbrev] = abbrev + '*'
+	return table
+
+def loopExpand(text, table):
+	for abbrev, expansion in table.items():
+		text = re.sub(r'(?i)\b{}\b'.format(abbrev), expansion, text)
+	return text
+
+def singlePassExpand(text, table, pattern):
+	return pattern.sub(lambda match: table[match.group(0).lower()], text)
+
+def run(sizes, number):
+	print('{:>8} {:>14} {:>14} {:>8}'.format(
+		'size', 'loop [us]', 'single [us]', 'speedup'))
+	for size in sizes:
+		table = randomAbbreviations(size)
+		pattern = core.compileAbbreviations(table)
+		for text in affiliations:
+			assert loopExpand(text, table) == singlePassExpand(text, table, pattern)
+		loop = timeit.timeit(
+			lambda: [loopExpand(text, table) for text in affiliations],
+			number=number,
+		)
+		single = timeit.timeit(
+			lambda: [singlePassExpand(text, table, pattern) for text in affiliations],
+			number=number,
+		)
+		calls = number * len(affiliations)
+		print('{:>8} {:>14.2f} {:>14.2f} {:>7.1f}x'.format(
+			size, loop / calls * 1e6, single / calls * 1e6, loop / single))
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--sizes', type=int, nargs='+',
+		default=[25, 100, 1000, 5000],
+		help='the number of abbreviations to benchmark')
+	parser.add_argument('--number', type=int, default=20,
+		help='the number of repetitions per table size')
+	args = parser.parse_args()
+	run(args.sizes, args.number)
@@ -0,0 +1,75 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Compare the latency of the whoosh and the in-memory BM25F backends of
+the institution search using queries built from the indexed names.
+'''
+
+import argparse
+import random
+import time
+
+from instmatcher import core
+
+def sampleQueries(size, seed=0):
+	rng = random.Random(seed)
+	searcher = core.searchers.searcher()
+	stored = list(searcher.reader().all_stored_fields())
+	queries = []
+	for _ in range(size):
+		fields = rng.choice(stored)
+		words = fields['name'].split()
+		name = ' '.join(rng.sample(words, min(len(words), rng.randint(1, 3))))
+		alpha2 = rng.choice([None, fields['alpha2']])
+		lat, lon = fields['lat'], fields['lon']
+		if rng.random() < 0.5 or lat != lat:
+			lat, lon = None, None
+		queries.append((core.expandAbbreviations(name), alpha2, lat, lon, 1))
+	return queries
+
+def timeQueries(queries, limit):
+	start = time.perf_counter()
+	results = [[item['source'] for item, score in core.query(*query, limit=limit)]
+		for query in queries]
+	return (time.perf_counter() - start) / len(queries), results
+
+def run(size, limits):
+	queries = sampleQueries(size)
+	core.useBackend('bm25')
+	start = time.perf_counter()
+	core.bm25Index(core.searchers.searcher())
+	print('bm25 index loaded in {:.2f} s'.format(time.perf_counter() - start))
+	print('{:>8} {:>14} {:>14} {:>8} {:>10}'.format(
+		'limit', 'whoosh [ms]', 'bm25 [ms]', 'speedup', 'agreement'))
+	for limit in limits:
+		core.useBackend('whoosh')
+		whoosh, expected = timeQueries(queries, limit)
+		core.useBackend('bm25')
+		bm25, actual = timeQueries(queries, limit)
+		agreement = sum(x[:1] == y[:1] for x, y in zip(expected, actual))
+		print('{:>8} {:>14.3f} {:>14.3f} {:>7.1f}x {:>9.1f}%'.format(
+			str(limit), whoosh * 1e3, bm25 * 1e3, whoosh / bm25,
+			100 * agreement / len(queries)))
+	core.useBackend('whoosh')
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--size', type=int, default=500,
+		help='the number of sampled queries')
+	parser.add_argument('--limits', type=lambda x: None if x == 'None' else int(x),
+		nargs='+', default=[None, 1],
+		help='the limits to benchmark, None retrieves every result')
+	args = parser.parse_args()
+	run(args.size, args.limits)
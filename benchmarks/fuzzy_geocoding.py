@@ -0,0 +1,79 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Measure the time to build the deletion index of the gazetteer and the
+latency of geo.fuzzyGeocodeAll for a sample of settlement names with one
+or two random typos, and report how often the misspelled settlement is
+found and ranked first.
+'''
+
+import argparse
+import random
+import string
+import time
+
+from instmatcher import geo
+
+def misspell(rng, name, edits):
+	for _ in range(edits):
+		position = rng.randrange(len(name))
+		operation = rng.choice(['insert', 'delete', 'substitute', 'transpose'])
+		letter = rng.choice(string.ascii_lowercase)
+		if operation == 'insert':
+			name = name[:position] + letter + name[position:]
+		elif operation == 'delete' and len(name) > 1:
+			name = name[:position] + name[position + 1:]
+		elif operation == 'transpose' and position + 1 < len(name):
+			name = (name[:position] + name[position + 1] + name[position]
+				+ name[position + 2:])
+		else:
+			name = name[:position] + letter + name[position + 1:]
+	return name
+
+def run(size, edits):
+	gazetteer = geo.gazetteer
+	start = time.perf_counter()
+	deletions = geo.deletions
+	print('deletion index of {} name variants built in {:.2f} s'.format(
+		len(deletions), time.perf_counter() - start))
+	rng = random.Random(0)
+	sample = []
+	for city in rng.sample(range(len(gazetteer)), size):
+		name = gazetteer.names[city]
+		if len(name) >= 8:
+			sample.append((city, misspell(rng, name.lower(), edits)))
+	found = first = 0
+	start = time.perf_counter()
+	for city, name in sample:
+		records = list(geo.fuzzyGeocodeAll(name))
+		coordinates = [(record['lat'], record['lon']) for record in records]
+		expected = float(gazetteer.lat[city]), float(gazetteer.lon[city])
+		found += expected in coordinates
+		first += coordinates[:1] == [expected]
+	elapsed = time.perf_counter() - start
+	print('{} names of at least 8 characters with {} typos'.format(
+		len(sample), edits))
+	print('query: {:.1f} µs'.format(elapsed / len(sample) * 1e6))
+	print('found: {}/{}, ranked first: {}/{}'.format(
+		found, len(sample), first, len(sample)))
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--size', type=int, default=2000,
+		help='the number of sampled settlement names')
+	parser.add_argument('--edits', type=int, default=1,
+		help='the number of random typos per name')
+	args = parser.parse_args()
+	run(args.size, args.edits)
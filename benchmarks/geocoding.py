@@ -0,0 +1,69 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Compare the latency of the whoosh and the gazetteer backend of
+geo.geocodeAll for a sample of settlement names and report how often both
+backends find the same settlements and the same first settlement.
+'''
+
+import argparse
+import random
+import time
+
+from instmatcher import geo
+
+def timeBackend(name, sample):
+	geo.useBackend(name)
+	start = time.perf_counter()
+	results = [list(geo.geocodeAll(*query)) for query in sample]
+	return time.perf_counter() - start, results
+
+def run(size, country):
+	start = time.perf_counter()
+	gazetteer = geo.gazetteer
+	print('gazetteer of {} settlements and {} name variants loaded in '
+		'{:.2f} s'.format(len(gazetteer), len(gazetteer.slots),
+		time.perf_counter() - start))
+	rng = random.Random(0)
+	sample = []
+	for city in rng.sample(range(len(gazetteer)), size):
+		alpha2 = str(gazetteer.alpha2[city]) if country else None
+		sample.append((gazetteer.names[city], alpha2))
+	try:
+		timeBackend('whoosh', sample[:100])
+		timings = {}
+		for name in ['whoosh', 'gazetteer']:
+			timings[name] = timeBackend(name, sample)
+	finally:
+		geo.useBackend('whoosh')
+	print('{:>10} {:>12}'.format('backend', 'query [µs]'))
+	for name, (elapsed, _) in timings.items():
+		print('{:>10} {:>12.1f}'.format(name, elapsed / size * 1e6))
+	pairs = list(zip(timings['whoosh'][1], timings['gazetteer'][1]))
+	key = lambda record: (record['lat'], record['lon'], record['locality'])
+	same = sum(sorted(map(key, first)) == sorted(map(key, second))
+		for first, second in pairs)
+	top = sum(first[:1] == second[:1] for first, second in pairs)
+	print('same settlements: {}/{}, same first settlement: {}/{}'.format(
+		same, size, top, size))
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--size', type=int, default=2000,
+		help='the number of sampled settlement names')
+	parser.add_argument('--country', action='store_true',
+		help='restrict the search to the country of the settlement')
+	args = parser.parse_args()
+	run(args.size, args.country)
@@ -0,0 +1,80 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Report the time saved by the caches of the parsed institution and
+settlement queries for a corpus of queries whose names repeat following
+a Zipf distribution, as the names of real affiliation strings do.
+'''
+
+import argparse
+import random
+import time
+
+from instmatcher import core, geo
+
+def sampleCorpus(size, distinct, seed=0):
+	rng = random.Random(seed)
+	searcher = core.searchers.searcher()
+	stored = rng.sample(list(searcher.reader().all_stored_fields()), distinct)
+	weights = [1 / rank for rank in range(1, distinct + 1)]
+	corpus = []
+	for fields in rng.choices(stored, weights, k=size):
+		words = fields['name'].split()
+		corpus.append((' '.join(words[:3]), fields['alpha2']))
+	return corpus
+
+def timeCorpus(corpus, cached):
+	sizes = core.parseCache.cache.maxsize, geo.parseCache.cache.maxsize
+	if not cached:
+		core.parseCache.cache.maxsize = geo.parseCache.cache.maxsize = 0
+	core.parseCache.clear()
+	geo.parseCache.clear()
+	try:
+		start = time.perf_counter()
+		for name, alpha2 in corpus:
+			list(core.query(core.expandAbbreviations(name), alpha2, None, None,
+				1, 1))
+			list(geo.geocodeAll(name.split()[-1], alpha2))
+		return time.perf_counter() - start
+	finally:
+		core.parseCache.cache.maxsize, geo.parseCache.cache.maxsize = sizes
+
+def run(size, distinct):
+	corpus = sampleCorpus(size, distinct)
+	timeCorpus(corpus[:100], True)
+	uncached = timeCorpus(corpus, False)
+	before = core.parseCacheInfo(), geo.parseCacheInfo()
+	cached = timeCorpus(corpus, True)
+	after = core.parseCacheInfo(), geo.parseCacheInfo()
+	print('{} queries of {} distinct names'.format(size, distinct))
+	print('uncached: {:.2f} s, cached: {:.2f} s'.format(uncached, cached))
+	print('{:>12} {:>8} {:>8} {:>12} {:>12}'.format(
+		'cache', 'hits', 'misses', 'parse [s]', 'saved [s]'))
+	for name, first, last in zip(['institution', 'settlement'], before, after):
+		print('{:>12} {:>8} {:>8} {:>12.3f} {:>12.3f}'.format(name,
+			last['hits'] - first['hits'], last['misses'] - first['misses'],
+			last['parseTime'] - first['parseTime'],
+			last['savedTime'] - first['savedTime']))
+	print('stemmer: {} hits, {} misses'.format(
+		after[0]['stemHits'], after[0]['stemMisses']))
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--size', type=int, default=2000,
+		help='the number of queries of the corpus')
+	parser.add_argument('--distinct', type=int, default=500,
+		help='the number of distinct institutions of the corpus')
+	args = parser.parse_args()
+	run(args.size, args.distinct)
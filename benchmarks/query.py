@@ -0,0 +1,58 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Compare retrieving every search result of an institution query with
+retrieving only the best results for common and rare query terms.
+'''
+
+import argparse
+import timeit
+
+from instmatcher import core
+
+queries = {
+	'common': [
+		('institute', None, None, None, 1),
+		('university', None, 48.85, 2.35, 1),
+		('hospital', 'US', 42.36, -71.06, 1),
+	],
+	'rare': [
+		('technical university of berlin', None, None, None, 1),
+		('pisa university', None, 43.72, 10.4, 1),
+		('london health sciences centre', 'CA', 42.98, -81.23, 1),
+	],
+}
+
+def run(limits, number):
+	print('{:>8} {:>40} {:>8} {:>12}'.format('terms', 'query', 'limit', 'time [ms]'))
+	for kind, params in sorted(queries.items()):
+		for param in params:
+			for limit in limits:
+				duration = timeit.timeit(
+					lambda: list(core.query(*param, limit=limit)),
+					number=number,
+				)
+				print('{:>8} {:>40} {:>8} {:>12.3f}'.format(
+					kind, param[0], str(limit), duration / number * 1e3))
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--limits', type=lambda x: None if x == 'None' else int(x),
+		nargs='+', default=[None, 10, 1],
+		help='the limits to benchmark, None retrieves every result')
+	parser.add_argument('--number', type=int, default=20,
+		help='the number of repetitions per query and limit')
+	args = parser.parse_args()
+	run(args.limits, args.number)
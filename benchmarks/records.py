@@ -0,0 +1,84 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Compare the memory held by institution search results kept as plain
+dictionaries with the memory held by the records sharing interned strings.
+'''
+
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+from instmatcher import core
+
+def dictInstitution(fields):
+	# the dictionaries yielded by core.query before the records
+	return {
+		'source': fields['source'],
+		'name': fields['name'],
+		'isni': fields['isni'],
+		'lat': float(fields['lat']),
+		'lon': float(fields['lon']),
+		'country': fields['country'],
+		'alpha2': fields['alpha2'],
+		'type': fields['type'],
+	}
+
+def sampleDocnums(size, seed=0):
+	# sample the hits of a batch job, popular institutions are found often
+	rng = random.Random(seed)
+	searcher = core.searchers.searcher()
+	population = list(range(searcher.doc_count_all()))
+	weights = [1 / (rank + 1) for rank in range(len(population))]
+	rng.shuffle(population)
+	return rng.choices(population, weights, k=size)
+
+def measure(build):
+	gc.collect()
+	tracemalloc.start()
+	start = time.perf_counter()
+	results = build()
+	duration = time.perf_counter() - start
+	size, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	return results, size, duration
+
+def run(size):
+	searcher = core.searchers.searcher()
+	docnums = sampleDocnums(size)
+	institution = core._materializer(searcher)
+	variants = [
+		('dicts', lambda: [dictInstitution(searcher.stored_fields(docnum))
+			for docnum in docnums]),
+		('records', lambda: [institution(docnum) for docnum in docnums]),
+	]
+	if core.store is None:
+		print('no field store, the records are read from the index')
+	print('{:>14} {:>16} {:>16} {:>12}'.format(
+		'results', 'bytes / result', 'MB / 100k', 'time [s]'))
+	for name, build in variants:
+		results, allocated, duration = measure(build)
+		print('{:>14} {:>16.1f} {:>16.2f} {:>12.2f}'.format(name,
+			allocated / size, allocated / size * 1e5 / 2 ** 20, duration))
+		del results
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--size', type=int, default=100000,
+		help='the number of results kept in memory')
+	args = parser.parse_args()
+	run(args.size)
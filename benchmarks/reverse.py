@@ -0,0 +1,71 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Report the time per point of geo.reverseGeocodeMany, of
+geo.nearestSettlements and of the k-d tree query alone for points
+scattered around the settlements of the gazetteer, as the coordinates of
+institutions are, and for points distributed uniformly over the
+inhabited latitudes.
+'''
+
+import argparse
+import time
+
+import numpy as np
+
+from instmatcher import geo
+
+def samplePoints(size, uniform, seed=0):
+	rng = np.random.default_rng(seed)
+	if uniform:
+		return rng.uniform(-60, 70, size), rng.uniform(-180, 180, size)
+	cities = geo.gazetteer
+	ids = rng.integers(0, len(cities), size)
+	lat = cities.lat[ids] + rng.normal(scale=0.05, size=size)
+	lon = cities.lon[ids] + rng.normal(scale=0.05, size=size)
+	return lat, lon
+
+def run(size, k, uniform):
+	start = time.perf_counter()
+	geo.tree
+	print('gazetteer and tree loaded in {:.2f} s'.format(
+		time.perf_counter() - start))
+	lat, lon = samplePoints(size, uniform)
+	points = geo.unitVectors(lat, lon)
+	start = time.perf_counter()
+	geo.tree.query(points, k)
+	query = time.perf_counter() - start
+	start = time.perf_counter()
+	geo.nearestSettlements(lat, lon, k)
+	nearest = time.perf_counter() - start
+	start = time.perf_counter()
+	geo.reverseGeocodeMany(lat, lon, k)
+	total = time.perf_counter() - start
+	print('{} points, k = {}'.format(size, k))
+	print('tree query: {:.2f} us per point'.format(query / size * 1e6))
+	print('nearestSettlements: {:.2f} us per point'.format(
+		nearest / size * 1e6))
+	print('reverseGeocodeMany: {:.2f} us per point'.format(total / size * 1e6))
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--size', type=int, default=200000,
+		help='the number of points')
+	parser.add_argument('-k', type=int, default=1,
+		help='the number of settlements per point')
+	parser.add_argument('--uniform', action='store_true',
+		help='distribute the points uniformly instead of around settlements')
+	args = parser.parse_args()
+	run(args.size, args.k, args.uniform)
@@ -0,0 +1,53 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Measure the wall-clock time of fresh interpreters importing instmatcher
+and calling its functions for the first time.
+'''
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+statements = [
+	('python', 'pass'),
+	('import', 'import instmatcher'),
+	('geocode', 'import instmatcher; instmatcher.geocode("Berlin", "DE")'),
+	('find', 'import instmatcher; instmatcher.find("TU Berlin")'),
+]
+
+def timeStatement(statement, number):
+	timings = []
+	for _ in range(number):
+		start = time.perf_counter()
+		subprocess.check_call([sys.executable, '-W', 'ignore', '-c', statement])
+		timings.append(time.perf_counter() - start)
+	return timings
+
+def run(number):
+	print('{:>10} {:>12} {:>12}'.format('statement', 'mean [ms]', 'min [ms]'))
+	for name, statement in statements:
+		timings = timeStatement(statement, number)
+		print('{:>10} {:>12.1f} {:>12.1f}'.format(
+			name, statistics.mean(timings) * 1e3, min(timings) * 1e3))
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--number', type=int, default=10,
+		help='the number of interpreters started per statement')
+	args = parser.parse_args()
+	run(args.number)
@@ -0,0 +1,68 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Measure the throughput of a Matcher searching queries built from the
+indexed names with a growing number of worker threads.
+'''
+
+import argparse
+import random
+import time
+
+import instmatcher
+from instmatcher import core
+
+def sampleQueries(size, seed=0):
+	rng = random.Random(seed)
+	searcher = core.searchers.searcher()
+	stored = list(searcher.reader().all_stored_fields())
+	queries = []
+	for _ in range(size):
+		fields = rng.choice(stored)
+		words = fields['name'].split()
+		name = ' '.join(rng.sample(words, min(len(words), rng.randint(1, 3))))
+		alpha2 = rng.choice([None, fields['alpha2']])
+		lat, lon = fields['lat'], fields['lon']
+		if rng.random() < 0.5 or lat != lat:
+			lat, lon = None, None
+		queries.append((name, alpha2, lat, lon, 1))
+	return queries
+
+def run(size, workers):
+	queries = sampleQueries(size)
+	# load the in-memory indices before measuring
+	with instmatcher.Matcher(1) as matcher:
+		list(matcher.map(queries[:10]))
+	print('{:>8} {:>14} {:>10}'.format('threads', 'queries/s', 'scaling'))
+	base = None
+	for number in workers:
+		with instmatcher.Matcher(number) as matcher:
+			# open the searchers and parsers of the threads
+			list(matcher.map(queries[:number * 2]))
+			start = time.perf_counter()
+			list(matcher.map(queries))
+			throughput = len(queries) / (time.perf_counter() - start)
+		base = base or throughput
+		print('{:>8} {:>14.1f} {:>9.2f}x'.format(
+			number, throughput, throughput / base))
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument('--size', type=int, default=1000,
+		help='the number of sampled queries')
+	parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8],
+		help='the numbers of worker threads to benchmark')
+	args = parser.parse_args()
+	run(args.size, args.workers)
@@ -18,32 +18,91 @@ A library to match an affiliation string to a known institution.
 This library provides means to search for an institution by its name and
 means to extract information using either the internal geocoder along
 with an external grobid server or by providing self-defined functions.
+
+The functions may be called from several threads at once: every thread
+searches with its own searchers and query parsers. A Matcher searches
+concurrently in a pool of worker threads.
 '''
 
-from .core import findAll, find
-from .geo import geocodeAll, geocode
-from .parser import parseAll, parse
+from importlib import import_module
+
+from . import core, geo, parser
+from .core import findAll, find, findMany
+from .geo import geocodeAll, geocodeMany, geocode
+from .parser import GrobidClient, parseAll, parse
+from .resources import Lazy, moduleGetattr
 from .version import __version__
 
-def matchAll(string, url='http://0.0.0.0:8080', offset=1):
+# the Matcher and its thread pool are imported on first use
+__getattr__ = moduleGetattr(__name__, {
+	'Matcher': Lazy(lambda: import_module('.matcher', __name__).Matcher),
+})
+
+def matchAll(string, url='http://0.0.0.0:8080', offset=1, limit=None,
+		bestPerCountry=False):
 	'''
 	Yield all institutions matching the affiliation string using a
-	grobid service to parse the string.
+	grobid service to parse the string. The institutions are searched
+	around every coordinate of the parsed settlements, optionally only
+	around the best settlement of every country, so that a common
+	settlement name costs a handful of searches at most.
 	
 	:param string: the affiliation string to be extracted
-	:param url: the URL to the grobid service
+	:param url: the URL to the grobid service or a GrobidClient
 	:param offset: the half-width of the preferred box in degree of arcs
+	:param limit: the maximum number of institutions per settlement
+	:param bestPerCountry: whether to search around the best settlement
+		of every country only, see geo.geocodeAll
 	'''
-	for parsed in parseAll(string, url):
+	yield from _matchParsed(parseAll(string, url), offset, limit,
+		bestPerCountry)
+
+def _locate(records, bestPerCountry=False):
+	# return the records yielded by parseAll along with the coordinates of
+	# each of their settlements, which are geocoded at once, see batch
+	records = list(records)
+	settlements, alpha2s = [], []
+	for parsed in records:
+		settlements.extend(parsed['settlement'])
+		alpha2s.extend([parsed.get('alpha2')] * len(parsed['settlement']))
+	coords = iter(geocodeMany(settlements, alpha2s,
+		bestPerCountry=bestPerCountry))
+	return [(parsed, [next(coords) for _ in parsed['settlement']])
+		for parsed in records]
+
+def _matchParsed(records, offset, limit, bestPerCountry=False):
+	# yield the institutions matching the records yielded by parseAll, the
+	# settlements of a record are geocoded once the institutions of the
+	# previous records have been yielded
+	for parsed in records:
+		yield from _matchLocated(_locate([parsed], bestPerCountry), offset,
+			limit)
+
+def _matchFirst(records, offset):
+	# return the most accurate institution matching the records yielded by
+	# parseAll, the settlements are geocoded one at a time until an
+	# institution is found
+	located = ((parsed, _geocodeEach(parsed)) for parsed in records)
+	return next(_matchLocated(located, offset, 1), None)
+
+def _geocodeEach(parsed):
+	# yield the coordinates of every settlement of a record
+	for settlement in parsed['settlement']:
+		yield geocodeAll(settlement, parsed.get('alpha2'))
+
+def _matchLocated(located, offset, limit):
+	# yield the institutions matching the records returned by _locate
+	for parsed, coordLists in located:
 		alpha2 = parsed.get('alpha2')
-		for settlement in parsed['settlement']:
-			for coord in geocodeAll(settlement, alpha2):
+		for coords in coordLists:
+			for coord in coords:
 				institutions = findAll(
 					institution=parsed.get('institution'),
 					alpha2=alpha2,
 					lat=coord.get('lat'),
 					lon=coord.get('lon'),
-					offset=offset
+					offset=offset,
+					limit=limit,
 				)
 				for instit in institutions:
 					yield instit
@@ -54,10 +113,20 @@ def match(string, url='http://0.0.0.0:8080', offset=1):
 	using a grobid service to parse the string.
 	
 	:param string: the affiliation string to be extracted
-	:param url: the URL to the grobid service
+	:param url: the URL to the grobid service or a GrobidClient
 	:param offset: the half-width of the preferred box in degree of arcs
 	'''
-	try:
-		return next(matchAll(string, url, offset))
-	except StopIteration:
-		return
+	return _matchFirst(parseAll(string, url), offset)
+
+def close():
+	'''
+	Close the searchers shared by the find, geocode and match functions
+	and the grobid clients shared by the parse and match functions given a
+	URL. Calling any of these functions afterwards opens new searchers and
+	connections.
+	'''
+	# only the searchers which have been loaded are closed
+	for searchers in (core._searchers, core._shards, geo._searchers):
+		if searchers.loaded:
+			searchers.get().close()
+	parser.close()
@@ -0,0 +1,279 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Module providing coroutine versions of the parse, geocode, find and match
+functions for asyncio applications.
+
+The requests to the grobid service are sent without blocking the event
+loop, at most grobidConcurrency of them at once, each waiting at most
+grobidTimeout seconds for a connection and for the response. The index
+lookups run in lookupExecutor, by default the default executor of the
+event loop, see configure. The coroutines return lists instead of
+yielding the results.
+'''
+
+import asyncio
+import functools
+from urllib.parse import quote_plus, urlsplit
+import weakref
+
+from . import _matchFirst, _matchParsed, core, geo, parser
+
+# the executor of the index lookups, None for the default executor of the
+# event loop, the maximum number of concurrent grobid requests and the
+# seconds to wait for a connection to grobid and for its response
+lookupExecutor = None
+grobidConcurrency = 16
+grobidTimeout = (5, 60)
+
+# the semaphores limiting the grobid requests of every event loop
+_semaphores = weakref.WeakKeyDictionary()
+
+def configure(executor=None, concurrency=16, connectTimeout=5,
+		readTimeout=60):
+	'''
+	Set the executor running the index lookups, the maximum number of
+	concurrent requests to the grobid service and the timeouts of the
+	requests given a URL instead of a parser.GrobidClient.
+	
+	:param executor: a concurrent.futures.Executor or None for the default
+		executor of the event loop
+	:param concurrency: the maximum number of concurrent grobid requests
+	:param connectTimeout: the seconds to wait for a connection to the
+		service or None to wait forever
+	:param readTimeout: the seconds to wait for the response of the
+		service or None to wait forever
+	'''
+	global lookupExecutor, grobidConcurrency, grobidTimeout
+	lookupExecutor = executor
+	grobidConcurrency = concurrency
+	grobidTimeout = (connectTimeout, readTimeout)
+	_semaphores.clear()
+
+def _semaphore():
+	loop = asyncio.get_running_loop()
+	try:
+		return _semaphores[loop]
+	except KeyError:
+		semaphore = _semaphores[loop] = asyncio.Semaphore(grobidConcurrency)
+		return semaphore
+
+async def _run(function, *args):
+	# run the function in the executor without blocking the event loop
+	loop = asyncio.get_running_loop()
+	return await loop.run_in_executor(
+		lookupExecutor, functools.partial(function, *args))
+
+async def _post(url, data, contentType, timeout):
+	# send a HTTP/1.1 POST request and return the body of the response,
+	# waiting at most the connect and read timeouts of the tuple timeout
+	connectTimeout, readTimeout = timeout
+	parts = urlsplit(url)
+	secure = parts.scheme == 'https'
+	port = parts.port or (443 if secure else 80)
+	reader, writer = await asyncio.wait_for(asyncio.open_connection(
+		parts.hostname, port, ssl=True if secure else None), connectTimeout)
+	try:
+		return await asyncio.wait_for(
+			_exchange(reader, writer, parts, data, contentType), readTimeout)
+	finally:
+		writer.close()
+		await writer.wait_closed()
+
+async def _exchange(reader, writer, parts, data, contentType):
+	# write the request and read the response of _post
+	path = parts.path or '/'
+	if parts.query:
+		path += '?' + parts.query
+	head = (
+		'POST {} HTTP/1.1\r\n'
+		'Host: {}\r\n'
+		'Content-Type: {}\r\n'
+		'Content-Length: {}\r\n'
+		'Connection: close\r\n'
+		'\r\n'
+	).format(path, parts.netloc, contentType, len(data))
+	writer.write(head.encode('latin-1') + data)
+	await writer.drain()
+	status = (await reader.readline()).decode('latin-1').split(None, 2)
+	if len(status) < 2 or not status[1].startswith('2'):
+		raise parser.GrobidError('grobid responded with {!r}'.format(
+			' '.join(status[1:]).strip()))
+	headers = {}
+	while True:
+		line = (await reader.readline()).decode('latin-1').strip()
+		if not line:
+			break
+		name, _, value = line.partition(':')
+		headers[name.strip().lower()] = value.strip()
+	if headers.get('transfer-encoding', '').lower() == 'chunked':
+		chunks = []
+		while True:
+			size = int((await reader.readline()).split(b';')[0], 16)
+			if not size:
+				break
+			chunks.append(await reader.readexactly(size))
+			await reader.readline()
+		return b''.join(chunks)
+	if 'content-length' in headers:
+		return await reader.readexactly(int(headers['content-length']))
+	return await reader.read()
+
+async def queryGrobid(affiliation, url):
+	'''
+	Try to retrieve a structured xml representation of the the
+	affiliation string using grobid without blocking the event loop.
+	
+	:param affiliation: the affiliation string to be sent to grobid
+	:param url: the URL to the grobid service or a parser.GrobidClient,
+		whose URL and timeouts are used
+	:raises asyncio.TimeoutError: if grobid does not respond in time
+	:raises parser.GrobidError: if grobid responds with an error
+	'''
+	try:
+		cmd = 'affiliations=' + quote_plus(affiliation)
+	except TypeError:
+		return '<results></results>'
+	timeout = grobidTimeout
+	if isinstance(url, parser.GrobidClient):
+		url, timeout = url.url, url.timeout
+	async with _semaphore():
+		content = await _post(url + '/processAffiliations', cmd.encode('ascii'),
+			'application/x-www-form-urlencoded', timeout)
+	return '<results>' + content.decode('UTF-8') + '</results>'
+
+async def parseAll(affiliation, url):
+	'''
+	Return a list of all possible institutions along with their
+	corresponding departments, laboratories and address information, see
+	parser.parseAll.
+	
+	:param affiliation: the affiliation string to be parsed
+	:param url: the URL to the grobid service
+	'''
+	results = await queryGrobid(affiliation, url)
+	return await _run(lambda: list(parser.parseResults(affiliation, results)))
+
+async def parse(affiliation, url):
+	'''
+	Return the first institution along with the corresponding department,
+	laboratory and address information, see parser.parse.
+	
+	:param affiliation: the affiliation string to be parsed
+	:param url: the URL to the grobid service
+	'''
+	results = await parseAll(affiliation, url)
+	return results[0] if results else None
+
+async def geocodeAll(settlement, alpha2=None, fuzzy=False, limit=None,
+		minPopulation=0, bestPerCountry=False):
+	'''
+	Return a list of all geographical coordinates of a given settlement
+	name, see geo.geocodeAll.
+	
+	:param settlement: the settlement name to search for
+	:param alpha2: the country to restrict search results to
+	:param fuzzy: whether to fall back to geo.fuzzyGeocodeAll if nothing is
+		found
+	:param limit: the maximum number of settlements or None for all
+	:param minPopulation: the minimum population of the settlements
+	:param bestPerCountry: whether to return only the best settlement of
+		every country
+	'''
+	return await _run(lambda: list(geo.geocodeAll(settlement, alpha2,
+		fuzzy=fuzzy, limit=limit, minPopulation=minPopulation,
+		bestPerCountry=bestPerCountry)))
+
+async def geocodeMany(settlements, alpha2s=None, fuzzy=False, limit=None,
+		minPopulation=0, bestPerCountry=False):
+	'''
+	Return a list of all geographical coordinates of every given
+	settlement name, see geo.geocodeMany.
+	
+	:param settlements: an iterable of settlement names
+	:param alpha2s: an iterable of the countries to restrict the search
+		results of the settlements to or None for no restrictions
+	:param fuzzy: whether to fall back to geo.fuzzyGeocodeAll if nothing is
+		found
+	:param limit: the maximum number of settlements per name or None for all
+	:param minPopulation: the minimum population of the settlements
+	:param bestPerCountry: whether to return only the best settlement of
+		every country per name
+	'''
+	return await _run(lambda: geo.geocodeMany(settlements, alpha2s,
+		fuzzy=fuzzy, limit=limit, minPopulation=minPopulation,
+		bestPerCountry=bestPerCountry))
+
+async def geocode(settlement, alpha2=None, fuzzy=False, minPopulation=0):
+	'''
+	Return the most accurate geographical coordinate of a given
+	settlement name, see geo.geocode.
+	
+	:param settlement: the settlement name to search for
+	:param alpha2: the country to restrict search results to
+	:param fuzzy: whether to fall back to geo.fuzzyGeocodeAll if nothing is
+		found
+	:param minPopulation: the minimum population of the settlement
+	'''
+	return await _run(geo.geocode, settlement, alpha2, fuzzy, minPopulation)
+
+@core._appendDoc(core._findAll_param_list)
+async def findAll(institution, alpha2=None, lat=None, lon=None, offset=0.4,
+		limit=None, fuzzy=False):
+	'''
+	Return a list of all institutions compatible with the search
+	parameters, see core.findAll.
+	'''
+	return await _run(lambda: list(core.findAll(
+		institution, alpha2, lat, lon, offset, limit, fuzzy)))
+
+@core._appendDoc(core._find_param_list)
+async def find(institution, alpha2=None, lat=None, lon=None, offset=0.4,
+		fuzzy=False):
+	'''
+	Return the most accurate institution compatible with the search
+	parameters, see core.find.
+	'''
+	return await _run(core.find, institution, alpha2, lat, lon, offset, fuzzy)
+
+async def matchAll(string, url='http://0.0.0.0:8080', offset=1, limit=None,
+		bestPerCountry=False):
+	'''
+	Return a list of all institutions matching the affiliation string
+	using a grobid service to parse the string, see instmatcher.matchAll.
+	
+	:param string: the affiliation string to be extracted
+	:param url: the URL to the grobid service
+	:param offset: the half-width of the preferred box in degree of arcs
+	:param limit: the maximum number of institutions per settlement
+	:param bestPerCountry: whether to search around the best settlement
+		of every country only, see geo.geocodeAll
+	'''
+	results = await queryGrobid(string, url)
+	return await _run(lambda: list(_matchParsed(
+		parser.parseResults(string, results), offset, limit, bestPerCountry)))
+
+async def match(string, url='http://0.0.0.0:8080', offset=1):
+	'''
+	Return the most accurate institution matching the affiliation string
+	using a grobid service to parse the string, see instmatcher.match.
+	
+	:param string: the affiliation string to be extracted
+	:param url: the URL to the grobid service
+	:param offset: the half-width of the preferred box in degree of arcs
+	'''
+	results = await queryGrobid(string, url)
+	return await _run(_matchFirst, parser.parseResults(string, results),
+		offset)
@@ -0,0 +1,202 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Module to process large batches of queries in a pool of processes.
+
+The resources of the package are loaded in the parent process before the
+workers are forked, so that the workers share their memory pages
+copy-on-write instead of loading them once per process. On platforms
+without fork the workers load the resources on first use.
+'''
+
+import functools
+import gc
+import itertools
+import multiprocessing
+
+import instmatcher
+from . import core, geo, parser
+
+def preload(fuzzy=False):
+	'''
+	Load the indices, the in-memory indices derived from the institution
+	index, the abbreviations and the country tables in the calling process.
+	The searchers used to load them are closed afterwards, since open files
+	must not be shared with forked processes.
+	
+	:param fuzzy: whether to load the trigram index of fuzzyQuery as well
+	'''
+	# accessing the lazily loaded module attributes loads them
+	core.abbrevPattern, core.store, core.shards, geo.ix, parser.countryList
+	searcher = core.searchers.searcher()
+	core.coordinateIndex(searcher)
+	core.nameIndex(searcher)
+	if core.backend == 'bm25':
+		core.bm25Index(searcher)
+	if fuzzy:
+		core.trigramIndex(searcher)
+	instmatcher.close()
+
+def extract(string, url):
+	'''
+	Return a list of all institutions parsed from the affiliation string,
+	see parser.parseAll, each updated with the coordinates of the first of
+	its settlements found by geo.geocodeMany. Only the best settlement of
+	every country is searched.
+	
+	:param string: the affiliation string to be extracted
+	:param url: the URL to the grobid service
+	'''
+	parsed = instmatcher.parseAll(string, url)
+	return _extracted(instmatcher._locate(parsed, bestPerCountry=True))
+
+def _extracted(located):
+	# update the parsed institutions with their first coordinates
+	result = []
+	for parsed, coordLists in located:
+		for coords in coordLists:
+			if coords:
+				parsed.update(coords[0])
+				break
+		result.append(parsed)
+	return result
+
+def _locateChunk(url, chunk, bestPerCountry):
+	# parse the affiliation strings of a chunk and geocode all of their
+	# settlements at once, return the located records of every string
+	parsed = [list(instmatcher.parseAll(string, url)) for string in chunk]
+	located = iter(instmatcher._locate(itertools.chain.from_iterable(parsed),
+		bestPerCountry))
+	return [list(itertools.islice(located, len(records))) for records in parsed]
+
+def _initWorker():
+	# open new searchers instead of using the files of the parent process
+	instmatcher.close()
+
+def _findChunk(fuzzy, chunk):
+	return list(core.findMany(chunk, len(chunk), fuzzy))
+
+def _matchChunk(url, offset, chunk):
+	return [next(instmatcher._matchLocated(located, offset, 1), None)
+		for located in _locateChunk(url, chunk, False)]
+
+def _extractChunk(url, chunk):
+	# only the first coordinates are used, the best settlement of every
+	# country is enough
+	return [_extracted(located) for located in _locateChunk(url, chunk, True)]
+
+def _enumerated(function, item):
+	start, chunk = item
+	return start, function(chunk)
+
+class BatchPool():
+	'''
+	A persistent pool of worker processes finding, matching or extracting
+	the institutions of an iterable of queries. The queries are sent to
+	the workers in chunks and the results are yielded either in the order
+	of the queries or as soon as their chunk is done.
+	
+	Creating the pool preloads the resources of the package and freezes
+	the garbage collector so that the forked workers share the memory
+	pages of the resources with the parent process, see preload.
+	
+	A pool is a context manager terminating its workers on exit.
+	
+	:param processes: the number of worker processes, by default the
+		number of CPUs
+	:param chunksize: the number of queries sent to a worker at once
+	:param fuzzy: whether to preload the trigram index of fuzzyQuery
+	'''
+	
+	def __init__(self, processes=None, chunksize=100, fuzzy=False):
+		self.chunksize = chunksize
+		preload(fuzzy)
+		# keep the garbage collector from touching the preloaded objects,
+		# which would copy their pages into every worker
+		gc.collect()
+		gc.freeze()
+		try:
+			context = multiprocessing.get_context('fork')
+		except ValueError:
+			context = multiprocessing.get_context()
+		self.pool = context.Pool(processes, _initWorker)
+	
+	def __enter__(self):
+		return self
+	
+	def __exit__(self, *exc_info):
+		self.close()
+	
+	def close(self):
+		'''Terminate the workers of the pool.'''
+		self.pool.terminate()
+		self.pool.join()
+		gc.unfreeze()
+	
+	def _map(self, function, queries, ordered):
+		queries = iter(queries)
+		size = self.chunksize
+		chunks = iter(lambda: list(itertools.islice(queries, size)), [])
+		if ordered:
+			for results in self.pool.imap(function, chunks):
+				yield from results
+			return
+		chunks = zip(itertools.count(0, size), chunks)
+		function = functools.partial(_enumerated, function)
+		for start, results in self.pool.imap_unordered(function, chunks):
+			yield from enumerate(results, start)
+	
+	def find(self, queries, ordered=True, fuzzy=False):
+		'''
+		Yield the most accurate institution for every query of the
+		iterable, see core.findMany. If ordered is false, the results are
+		yielded as soon as their chunk is done as tuples of the position of
+		the query and the result.
+		
+		:param queries: an iterable of institution names or parameter tuples
+		:param ordered: whether to yield the results in the order of the queries
+		:param fuzzy: whether to fall back to fuzzyQuery if nothing is found
+		'''
+		function = functools.partial(_findChunk, fuzzy)
+		return self._map(function, queries, ordered)
+	
+	def match(self, strings, url='http://0.0.0.0:8080', offset=1, ordered=True):
+		'''
+		Yield the most accurate institution matching every affiliation
+		string of the iterable, see instmatcher.match. If ordered is false,
+		the results are yielded as soon as their chunk is done as tuples of
+		the position of the string and the result.
+		
+		:param strings: an iterable of affiliation strings
+		:param url: the URL to the grobid service
+		:param offset: the half-width of the preferred box in degree of arcs
+		:param ordered: whether to yield the results in the order of the strings
+		'''
+		function = functools.partial(_matchChunk, url, offset)
+		return self._map(function, strings, ordered)
+	
+	def extract(self, strings, url='http://0.0.0.0:8080', ordered=True):
+		'''
+		Yield the list of institutions extracted from every affiliation
+		string of the iterable, see extract. If ordered is false, the
+		results are yielded as soon as their chunk is done as tuples of the
+		position of the string and the result.
+		
+		:param strings: an iterable of affiliation strings
+		:param url: the URL to the grobid service
+		:param ordered: whether to yield the results in the order of the strings
+		'''
+		function = functools.partial(_extractChunk, url)
+		return self._map(function, strings, ordered)
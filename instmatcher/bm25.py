@@ -0,0 +1,251 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Module to search an index in memory using BM25F scoring.'''
+
+import bisect
+import fnmatch
+import re
+
+import numpy as np
+from whoosh import query
+
+from .store import indexToken
+
+class Postings():
+	'''
+	Keep the postings of a field in compressed sparse row arrays: the
+	documents and term frequencies of the n-th term of the sorted term
+	list are stored between indptr[n] and indptr[n + 1].
+	
+	:param reader: the index reader to load the postings from
+	:param fieldname: the name of the field
+	'''
+	
+	def __init__(self, reader, fieldname):
+		self.terms = []
+		indptr, docs, freqs = [0], [], []
+		postings = {}
+		leaves = reader.leaf_readers()
+		self.sizes = np.array([leaf.doc_count_all() for leaf, offset in leaves],
+			dtype=np.int64)
+		self.segment = np.repeat(np.arange(len(leaves)), self.sizes)
+		for leaf, offset in leaves:
+			if fieldname not in leaf.schema:
+				continue
+			for btext in leaf.lexicon(fieldname):
+				matcher = leaf.postings(fieldname, btext)
+				items = postings.setdefault(btext.decode('utf-8'), [])
+				while matcher.is_active():
+					items.append((matcher.id() + offset, matcher.weight()))
+					matcher.next()
+		for text in sorted(postings):
+			items = postings[text]
+			self.terms.append(text)
+			docs.extend(docnum for docnum, weight in items)
+			freqs.extend(weight for docnum, weight in items)
+			indptr.append(len(docs))
+		self.indptr = np.array(indptr, dtype=np.int64)
+		self.docs = np.array(docs, dtype=np.int64)
+		self.freqs = np.array(freqs, dtype=np.float64)
+		size = reader.doc_count_all()
+		self.lengths = np.array([reader.doc_field_length(docnum, fieldname, 0)
+			for docnum in range(size)], dtype=np.float64)
+		self.avglength = (reader.field_length(fieldname) / (size or 1)) or 1
+		self.idf = np.log(size / (np.diff(self.indptr) + 1)) + 1
+	
+	def find(self, text):
+		'''
+		Return the position of the term in the term list or None.
+		
+		:param text: the term
+		'''
+		pos = bisect.bisect_left(self.terms, text)
+		if pos < len(self.terms) and self.terms[pos] == text:
+			return pos
+	
+	def prefixed(self, prefix):
+		'''
+		Return the range of positions of the terms starting with the prefix.
+		
+		:param prefix: the prefix of the terms
+		'''
+		start = bisect.bisect_left(self.terms, prefix)
+		end = bisect.bisect_left(self.terms, prefix + '\U0010ffff')
+		return range(start, end)
+	
+	def matching(self, pattern):
+		'''
+		Return the positions of the terms matching the wildcard pattern.
+		
+		:param pattern: the pattern containing * and ? wildcards
+		'''
+		prefix = re.split(r'[*?]', pattern, 1)[0]
+		regex = re.compile(fnmatch.translate(pattern))
+		return [pos for pos in self.prefixed(prefix)
+			if regex.match(self.terms[pos])]
+	
+	def postings(self, pos):
+		'''
+		Return the documents containing the term at the position along
+		with the term frequencies.
+		
+		:param pos: the position of the term
+		'''
+		start, end = self.indptr[pos], self.indptr[pos + 1]
+		return self.docs[start:end], self.freqs[start:end]
+
+class BM25Index():
+	'''
+	Search the text fields of an index in memory scoring the documents
+	with BM25F as the default weighting of whoosh does. Queries are
+	parsed by whoosh, their Term, Prefix, Wildcard, And and Or nodes are
+	evaluated with vectorised NumPy operations on the postings of every
+	document at once.
+	
+	:param reader: the index reader to load the fields from
+	:param fieldnames: the names of the text fields to search
+	:param B: the BM25F length normalisation parameter
+	:param K1: the BM25F term frequency saturation parameter
+	'''
+	
+	def __init__(self, reader, fieldnames, B=0.75, K1=1.2):
+		self.token = indexToken(reader)
+		self.size = reader.doc_count_all()
+		self.B = B
+		self.K1 = K1
+		self.fields = {name: Postings(reader, name) for name in fieldnames}
+		self.alive = np.ones(self.size, dtype=bool)
+		if reader.has_deletions():
+			for docnum in range(self.size):
+				self.alive[docnum] = not reader.is_deleted(docnum)
+	
+	def score(self, q):
+		'''
+		Return the scores of every document along with a boolean array
+		marking the documents matching the query.
+		
+		:param q: the whoosh query to be evaluated
+		:raises NotImplementedError: if the query contains other nodes
+		'''
+		if q is query.NullQuery:
+			return np.zeros(self.size), np.zeros(self.size, dtype=bool)
+		if type(q) in (query.And, query.Or):
+			scores = np.zeros(self.size)
+			matched = np.full(self.size, type(q) is query.And)
+			for sub in q.subqueries:
+				subScores, subMatched = self.score(sub)
+				scores += subScores
+				if type(q) is query.And:
+					matched &= subMatched
+				else:
+					matched |= subMatched
+			scores[~matched] = 0
+			return scores * q.boost, matched
+		if type(q) not in (query.Term, query.Prefix, query.Wildcard):
+			raise NotImplementedError(type(q).__name__)
+		scores = np.zeros(self.size)
+		matched = np.zeros(self.size, dtype=bool)
+		try:
+			postings = self.fields[q.fieldname]
+		except KeyError:
+			raise NotImplementedError(q.fieldname)
+		if type(q) is query.Term:
+			pos = postings.find(q.text)
+			if pos is not None:
+				docs, termScores = self.bm25(postings, pos)
+				scores[docs] = termScores * q.boost
+				matched[docs] = True
+			return scores, matched
+		if type(q) is query.Prefix:
+			positions = postings.prefixed(q.text)
+		else:
+			positions = postings.matching(q.text)
+		# like whoosh, score the documents of an index segment by the sum of
+		# the scores of the matching terms if the segment contains at most two
+		# terms of the query or more than 5000 documents and with a constant
+		# score of one otherwise
+		counts = np.zeros(len(postings.sizes), dtype=np.int64)
+		for pos in positions:
+			docs, freqs = postings.postings(pos)
+			counts[np.unique(postings.segment[docs])] += 1
+		summed = (counts <= 2) | ((postings.sizes > 5000) & (counts < 1024))
+		for pos in positions:
+			docs, termScores = self.bm25(postings, pos)
+			scores[docs] += termScores
+			matched[docs] = True
+		scores[matched & ~summed[postings.segment]] = 1.0
+		return scores, matched
+	
+	def bm25(self, postings, pos):
+		'''
+		Return the documents containing the term at the position of the
+		postings along with their BM25F scores.
+		
+		:param postings: the postings of a field
+		:param pos: the position of the term
+		'''
+		docs, freqs = postings.postings(pos)
+		norm = (1 - self.B) + self.B * postings.lengths[docs] / postings.avglength
+		return docs, postings.idf[pos] * freqs * (self.K1 + 1) / (
+			freqs + self.K1 * norm)
+	
+	def search(self, q, coords, alpha2, lat, lon, offset, limit=None):
+		'''
+		Return the document numbers and scores of the documents matching
+		the query in descending order of their score.
+		
+		The documents inside of the box described by lat, lon and offset
+		come first, their scores are multiplied with the distance decay of
+		the coordinate index.
+		
+		:param q: the whoosh query to be evaluated
+		:param coords: the coordinate index of the same index reader
+		:param alpha2: the country to restrict search results to
+		:param lat: the latitude describing the middle of the preferred box
+		:param lon: the longitude describing the middle of preferred box
+		:param offset: the half-width of the preferred box in degree of arcs
+		:param limit: the maximum number of results or None for all results
+		:raises NotImplementedError: if the query contains other nodes
+		'''
+		scores, matched = self.score(q)
+		matched &= self.alive
+		if alpha2:
+			matched &= coords.alpha2 == alpha2
+		docnums = np.flatnonzero(matched)
+		scores = scores[docnums]
+		try:
+			inside, scores = coords.boost(lat, lon, offset, docnums, scores)
+		except TypeError:
+			inside = np.zeros(len(docnums), dtype=bool)
+		groups = [(docnums[inside], scores[inside]),
+			(docnums[~inside], scores[~inside])]
+		results = []
+		for docnums, docScores in groups:
+			order = _top(docScores, docnums, limit)
+			results.extend(zip(docnums[order].tolist(), docScores[order].tolist()))
+			if limit is not None:
+				limit -= len(order)
+				if limit <= 0:
+					break
+		return results
+
+def _top(scores, docnums, limit):
+	# return the indices of the best scores, ties are broken by docnum
+	if limit is not None and limit < len(scores):
+		threshold = np.partition(-scores, limit - 1)[limit - 1]
+		candidates = np.flatnonzero(-scores <= threshold)
+		order = np.lexsort((docnums[candidates], -scores[candidates]))
+		return candidates[order][:limit]
+	return np.lexsort((docnums, -scores))
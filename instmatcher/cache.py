@@ -0,0 +1,272 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Module to cache results in memory and on disk.'''
+
+from collections import OrderedDict
+import json
+import os
+import threading
+import time
+
+class LRUCache():
+	'''
+	A thread-safe cache of bounded size discarding the least recently
+	used entries first. The cache counts its hits, misses and evictions.
+	
+	:param maxsize: the maximum number of cached entries
+	'''
+	
+	def __init__(self, maxsize):
+		self.maxsize = maxsize
+		self.data = OrderedDict()
+		self.lock = threading.Lock()
+		self.token = None
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+	
+	def get(self, key, default=None):
+		'''
+		Return the value cached for the key or the default value.
+		
+		:param key: the key of the cached value
+		:param default: the value to return on a miss
+		'''
+		with self.lock:
+			try:
+				value = self.data[key]
+			except KeyError:
+				self.misses += 1
+				return default
+			self.data.move_to_end(key)
+			self.hits += 1
+			return value
+	
+	def put(self, key, value):
+		'''
+		Cache the value for the key evicting the least recently used
+		entries if the cache is full.
+		
+		:param key: the key of the value
+		:param value: the value to be cached
+		'''
+		with self.lock:
+			self.data[key] = value
+			self.data.move_to_end(key)
+			while len(self.data) > self.maxsize:
+				self.data.popitem(last=False)
+				self.evictions += 1
+	
+	def validate(self, token):
+		'''
+		Clear the cache if the token differs from the token of the
+		previous call, e.g. to invalidate every entry after the cached data
+		source changed.
+		
+		:param token: an object identifying the state of the data source
+		'''
+		with self.lock:
+			if token != self.token:
+				self.data.clear()
+				self.token = token
+	
+	def clear(self):
+		'''Remove every entry from the cache.'''
+		with self.lock:
+			self.data.clear()
+	
+	def info(self):
+		'''Return the statistics and the size of the cache.'''
+		with self.lock:
+			return {
+				'hits': self.hits,
+				'misses': self.misses,
+				'evictions': self.evictions,
+				'size': len(self.data),
+				'maxsize': self.maxsize,
+			}
+
+class DiskCache():
+	'''
+	A thread-safe cache of bounded size persisting JSON serialisable keys
+	and values in a SQLite database, discarding the least recently used
+	entries first. The cache may be shared by several processes, every
+	process opens its own connection to the database. The cache counts
+	the hits, misses and evictions of the calling process.
+	
+	Hits do not write to the database: the times of use of the hit
+	entries are kept in memory and written in batches, at the latest
+	before the next entry is added by the process. Entries evicted by
+	other processes in the meantime are chosen by their previous times
+	of use.
+	
+	:param path: the path of the database file
+	:param maxsize: the maximum number of cached entries
+	:param batch: the number of hits whose times of use are written at once
+	'''
+	
+	def __init__(self, path, maxsize, batch=256):
+		self.path = path
+		self.maxsize = maxsize
+		self.batch = batch
+		self.lock = threading.Lock()
+		self.used = {}
+		self.pid = None
+		self.connection = None
+		self.token = None
+		self.size = 0
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+	
+	def _connect(self):
+		# connect on first use and after a fork, the connection of the parent
+		# process must not be used by its children
+		if self.pid != os.getpid():
+			# imported on first use to keep importing the package fast
+			import sqlite3
+			connection = sqlite3.connect(self.path, timeout=60,
+				isolation_level=None, check_same_thread=False)
+			connection.execute('PRAGMA journal_mode=WAL')
+			connection.execute('PRAGMA synchronous=NORMAL')
+			connection.execute('CREATE TABLE IF NOT EXISTS entries '
+				'(key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+				'used REAL NOT NULL)')
+			connection.execute('CREATE INDEX IF NOT EXISTS entriesUsed '
+				'ON entries (used)')
+			connection.execute('CREATE TABLE IF NOT EXISTS meta '
+				'(name TEXT PRIMARY KEY, value TEXT NOT NULL)')
+			self.size, = connection.execute(
+				'SELECT count(*) FROM entries').fetchone()
+			self.connection, self.pid = connection, os.getpid()
+			self.token = None
+		return self.connection
+	
+	def _touch(self, connection):
+		# write the times of use of the hit entries, the caller has to begin
+		# a transaction to write them at once
+		connection.executemany('UPDATE entries SET used = ? WHERE key = ?',
+			[(used, key) for key, used in self.used.items()])
+		self.used.clear()
+	
+	def get(self, key, default=None):
+		'''
+		Return the value cached for the key or the default value.
+		
+		:param key: the key of the cached value
+		:param default: the value to return on a miss
+		'''
+		key = json.dumps(key)
+		with self.lock:
+			connection = self._connect()
+			row = connection.execute(
+				'SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+			if row is None:
+				self.misses += 1
+				return default
+			self.used[key] = time.time()
+			if len(self.used) >= self.batch:
+				with connection:
+					connection.execute('BEGIN')
+					self._touch(connection)
+			self.hits += 1
+			return json.loads(row[0])
+	
+	def put(self, key, value):
+		'''
+		Cache the value for the key evicting the least recently used
+		entries if the cache is full.
+		
+		:param key: the key of the value
+		:param value: the value to be cached
+		'''
+		key, value = json.dumps(key), json.dumps(value)
+		with self.lock:
+			connection = self._connect()
+			with connection:
+				connection.execute('BEGIN')
+				self._touch(connection)
+				cursor = connection.execute('INSERT OR IGNORE INTO entries '
+					'VALUES (?, ?, ?)', (key, value, time.time()))
+				if not cursor.rowcount:
+					connection.execute('UPDATE entries SET value = ?, used = ? '
+						'WHERE key = ?', (value, time.time(), key))
+				self.size += cursor.rowcount
+				if self.size > self.maxsize:
+					# other processes may have added entries as well
+					self.size, = connection.execute(
+						'SELECT count(*) FROM entries').fetchone()
+					excess = max(0, self.size - self.maxsize)
+					connection.execute('DELETE FROM entries WHERE key IN '
+						'(SELECT key FROM entries ORDER BY used LIMIT ?)',
+						(excess,))
+					self.size -= excess
+					self.evictions += excess
+	
+	def validate(self, token):
+		'''
+		Clear the cache if the token differs from the token stored in the
+		database, e.g. to invalidate every entry after the cached data
+		source changed. The token is stored along with the entries, so
+		that the entries remain valid for other processes using the same
+		token.
+		
+		:param token: a JSON serialisable object identifying the state of
+			the data source
+		'''
+		token = json.dumps(token)
+		with self.lock:
+			connection = self._connect()
+			if token == self.token:
+				return
+			with connection:
+				connection.execute('BEGIN IMMEDIATE')
+				row = connection.execute(
+					"SELECT value FROM meta WHERE name = 'token'").fetchone()
+				if row is None or row[0] != token:
+					connection.execute('DELETE FROM entries')
+					connection.execute(
+						"INSERT OR REPLACE INTO meta VALUES ('token', ?)", (token,))
+					self.size = 0
+			self.token = token
+	
+	def clear(self):
+		'''Remove every entry from the cache.'''
+		with self.lock:
+			connection = self._connect()
+			connection.execute('DELETE FROM entries')
+			self.size = 0
+	
+	def close(self):
+		'''Close the connection of the calling process to the database.'''
+		with self.lock:
+			if self.pid == os.getpid():
+				with self.connection:
+					self.connection.execute('BEGIN')
+					self._touch(self.connection)
+				self.connection.close()
+			self.pid = self.connection = None
+	
+	def info(self):
+		'''Return the statistics and the size of the cache.'''
+		with self.lock:
+			self._connect()
+			return {
+				'hits': self.hits,
+				'misses': self.misses,
+				'evictions': self.evictions,
+				'size': self.size,
+				'maxsize': self.maxsize,
+			}
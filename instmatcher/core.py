@@ -15,27 +15,133 @@
 '''Module to search for known institutions.'''
 
 import csv
-from pkg_resources import resource_filename
+import itertools
+import os.path
 import re
+import threading
 
 from whoosh import index
+from whoosh.collectors import FilterCollector, TopCollector
 from whoosh.qparser import MultifieldParser
-from whoosh.query import Term
-
-# load the available abbreviations from 'data/abbreviations.csv'
-abbreviations = {}
-source = resource_filename(__name__, 'data/abbreviations.csv')
-with open(source) as csvfile:
-	data = filter(lambda row: not row[0].startswith('#'), csvfile)
-	reader = csv.reader(data)
-	for row in reader:
-		abbreviations[row[0]] = row[1]
-
-# load the index and create the institution and coordinate query parsers
-ixPath = resource_filename(__name__, 'data/index')
-ix = index.open_dir(ixPath)
-instParser = MultifieldParser(['tokens', 'alias',], ix.schema)
-coordParser = MultifieldParser(['lat', 'lon',], ix.schema)
+from whoosh.query import MultiTerm, Term
+import numpy as np
+
+from .bm25 import BM25Index
+from .cache import LRUCache
+from .fuzzy import TrigramIndex
+from .names import NameIndex
+from .parsing import memoiseStemmers, ParseCache, stem
+from .pool import SearcherPool
+from .records import InstitutionRecord
+from .resources import dataPath, Lazy, moduleGetattr, ThreadLocal
+from .shards import ShardedIndex
+from .spatial import CoordinateIndex
+from .store import FieldStore, indexToken, writeStore
+
+def loadAbbreviations(source):
+	'''
+	Return a dictionary mapping the lower case abbreviations of the csv
+	file to their expansions.
+	
+	:param source: the path of the csv file
+	'''
+	abbreviations = {}
+	with open(source) as csvfile:
+		data = filter(lambda row: not row[0].startswith('#'), csvfile)
+		reader = csv.reader(data)
+		for row in reader:
+			abbreviations[row[0].lower()] = row[1]
+	return abbreviations
+
+def compileAbbreviations(abbreviations):
+	'''
+	Compile the given abbreviations into a single regular expression
+	matching any of them on word boundaries. The alternatives are arranged
+	as a prefix tree so that the expression is evaluated in a single pass
+	regardless of the number of abbreviations.
+	
+	:param abbreviations: an iterable of lower case abbreviations
+	'''
+	trie = {}
+	for abbrev in abbreviations:
+		node = trie
+		for char in abbrev:
+			node = node.setdefault(char, {})
+		node[''] = None
+	
+	def pattern(node):
+		end = '' in node
+		branches = [re.escape(char) + pattern(child)
+			for char, child in sorted(node.items()) if char]
+		if not branches:
+			return ''
+		if len(branches) == 1 and not end:
+			return branches[0]
+		group = '(?:' + '|'.join(branches) + ')'
+		return group + '?' if end else group
+	
+	return re.compile(r'(?i)\b' + (pattern(trie) or '(?!)') + r'\b')
+
+# the available abbreviations of 'data/abbreviations.csv', the index, its
+# shared searchers and the institution query parser are loaded on first use
+# and available as module attributes of the same name. Every thread gets
+# its own searcher and parser: the stemming cache of the analyzers of the
+# parser is not thread-safe, hence every parser uses its own copy of the
+# schema read from the index with a shared memoised stemmer
+ixPath = dataPath('index')
+instFields = ['tokens', 'alias',]
+storePath = os.path.join(ixPath, 'fields.store')
+storeFields = [
+	'source', 'name', 'isni', 'lat', 'lon', 'country', 'alpha2', 'type',
+]
+_abbreviations = Lazy(lambda: loadAbbreviations(dataPath('abbreviations.csv')))
+_abbrevPattern = Lazy(lambda: compileAbbreviations(_abbreviations.get()))
+_ix = Lazy(lambda: index.open_dir(ixPath))
+_searchers = Lazy(lambda: SearcherPool(_ix.get()))
+_instParser = ThreadLocal(
+	lambda: MultifieldParser(instFields, memoiseStemmers(_ix.get().schema)))
+_store = Lazy(lambda: loadStore(storePath))
+_shards = Lazy(lambda: ShardedIndex(ixPath, lambda: _searchers.get().searcher()))
+__getattr__ = moduleGetattr(__name__, {
+	'abbreviations': _abbreviations,
+	'abbrevPattern': _abbrevPattern,
+	'ix': _ix,
+	'searchers': _searchers,
+	'instParser': _instParser,
+	'store': _store,
+	'shards': _shards,
+})
+
+# guards building the in-memory indices below
+_loadLock = threading.Lock()
+
+# the coordinates of the indexed institutions, see coordinateIndex
+coordinates = None
+
+# the search backend used by query and its in-memory index, see useBackend
+backend = 'whoosh'
+bm25 = None
+
+# the trigrams of the institution names, see trigramIndex, and the minimum
+# similarity of the institutions found by the fuzzy fallback of findAll
+trigrams = None
+fuzzyThreshold = 0.5
+
+# the normalised names of the institutions, see nameIndex, the scores of
+# the exact name matches of the recently searched institution strings and
+# the number of calls of find and of the calls answered by an exact match
+names = None
+exactScores = LRUCache(16384)
+_exactLock = threading.Lock()
+exactCalls = 0
+exactHits = 0
+
+# the cache of the parsed institution queries, see parseCacheInfo
+parseCache = ParseCache(4096)
+
+# the optional cache of search results and its coordinate precision
+resultCache = None
+cachePrecision = None
 
 def _appendDoc(docstring):
 	def decorator(function):
@@ -51,8 +157,26 @@ _find_query_param_list='''
 	:param offset: the half-width of the preferred box in degree of arcs
 '''
 
-@_appendDoc(_find_query_param_list)
-def query(institution, alpha2, lat, lon, offset):
+_fuzzy_param = '''\
+	:param fuzzy: whether to fall back to fuzzyQuery if nothing is found
+'''
+
+_limit_param = '''\
+	:param limit: the maximum number of results or None for all results
+'''
+
+_find_param_list = _find_query_param_list + _fuzzy_param
+
+_findAll_param_list = _find_query_param_list + _limit_param + _fuzzy_param
+
+_query_param_list = _find_query_param_list + _limit_param + '''\
+	:param searcher: the searcher to use instead of the shared one
+	:param shards: the shards.ShardedIndex to use instead of the shared one
+'''
+
+@_appendDoc(_query_param_list)
+def query(institution, alpha2, lat, lon, offset, limit=None, searcher=None,
+		shards=None):
 	'''
 	Yield all institutions along with their score compatible with the
 	search parameters. The search results are sorted in descending order
@@ -64,69 +188,535 @@ def query(institution, alpha2, lat, lon, offset):
 	describe a geographical box in which results are preferred. Note that
 	an offset of one degree of arc corresponds to about 111 km: Using an
 	offset of 1 results into a box with a width of approximately 222 km.
+	
+	Results inside of the box are ranked by their score multiplied with a
+	factor decaying with the distance to lat/lon, see CoordinateIndex.
+	The longitude half-width of the box grows toward the poles so that
+	the box covers about the same area at every latitude.
+	
+	Limiting the number of results lets the searcher score and sort only
+	the best results instead of every matching institution. A limit below
+	1 yields nothing.
+	
+	Searches restricted to a country are run on the smaller index of the
+	country if it has been created along with the index, see
+	shards.createShards.
 	'''
-	if not institution:
+	if not institution or limit is not None and limit < 1:
 		return
-	with ix.searcher() as searcher:
-		# search for the given institution
-		instQuery = instParser.parse(institution.lower())
-		filterTerm = Term('alpha2', alpha2) if alpha2 else None
-		instResults = searcher.search(instQuery, limit=None, filter=filterTerm)
-		# try to enhance the search boosting results in the vicinity of lat/lon
+	searcher = searcher or _searchers.get().searcher()
+	# search for the given institution, the parsed queries are cached
+	text = ' '.join(institution.lower().split())
+	instQuery = parseCache.parse(_instParser.get(), text,
+		searcher.reader().generation())
+	if backend == 'bm25':
 		try:
-			latQueryText = 'lat:[{} to {}]'.format(lat - offset, lat + offset)
-			lonQueryText = 'lon:[{} to {}]'.format(lon - offset, lon + offset)
-			coordQuery = coordParser.parse(latQueryText + lonQueryText)
-			coordResults = searcher.search(coordQuery, limit=None)
-			instResults.upgrade(coordResults)
-		except TypeError:
+			results = bm25Index(searcher).search(instQuery,
+				coordinateIndex(searcher), alpha2, lat, lon, offset, limit)
+		except NotImplementedError:
 			pass
-		# yield hits along with the score
-		for hit in instResults:
-			yield {
-				'source': hit['source'],
-				'name': hit['name'],
-				'isni': hit['isni'],
-				'lat': float(hit['lat']),
-				'lon': float(hit['lon']),
-				'country': hit['country'],
-				'alpha2': hit['alpha2'],
-				'type': hit['type'],
-			}, hit.score
+		else:
+			institution = _materializer(searcher)
+			for docnum, score in results:
+				yield institution(docnum), score
+			return
+	institution = _materializer(searcher)
+	filterTerm = Term('alpha2', alpha2) if alpha2 else None
+	coords = coordinateIndex(searcher)
+	docnums = None
+	shard = None
+	# whoosh scores prefix and wildcard queries depending on the segments of
+	# the index, only queries of plain terms are searched in the shards to
+	# yield the same results as the global index
+	if not any(isinstance(leaf, MultiTerm) for leaf in instQuery.leaves()):
+		shard = (shards or _shards.get()).shard(alpha2, searcher)
+	if shard is not None:
+		# search the index of the country instead of filtering the results
+		# of the global index, the documents of the shard are mapped to the
+		# documents of the global index
+		searcher = shard.searchers.searcher()
+		docnums = shard.mapping(searcher)
+		filterTerm = None
+		materialize = institution
+		institution = lambda docnum: materialize(int(docnums[docnum]))
+	if lat is None or lon is None:
+		results = _search(searcher, instQuery, limit, filterTerm)
+		yield from _hits(results, institution)
+		return
+	# prefer the results in the vicinity of lat/lon by scoring every text
+	# candidate once and ranking the candidates inside of the box first
+	results = searcher.search(instQuery, limit=None, filter=filterTerm)
+	if not results.top_n:
+		return
+	scores, hits = map(np.array, zip(*results.top_n))
+	globalHits = hits if docnums is None else docnums[hits]
+	try:
+		inside, scores = coords.boost(lat, lon, offset, globalHits, scores)
+	except TypeError:
+		# invalid coordinates are ignored
+		inside = np.zeros(len(hits), dtype=bool)
+	order = np.lexsort((hits, -scores, ~inside))[:limit]
+	for score, docnum in zip(scores[order].tolist(), hits[order].tolist()):
+		yield institution(docnum), score
+
+def coordinateIndex(searcher):
+	'''
+	Return the coordinate index of the institutions corresponding to the
+	segments of the index read by the searcher.
+	
+	:param searcher: the searcher of the institution index
+	'''
+	global coordinates
+	token = indexToken(searcher.reader())
+	coords = coordinates
+	if coords is None or coords.token != token:
+		with _loadLock:
+			coords = coordinates
+			if coords is None or coords.token != token:
+				coords = coordinates = CoordinateIndex(searcher.reader())
+	return coords
+
+def bm25Index(searcher):
+	'''
+	Return the in-memory BM25F index of the institutions corresponding to
+	the segments of the index read by the searcher.
+	
+	:param searcher: the searcher of the institution index
+	'''
+	global bm25
+	token = indexToken(searcher.reader())
+	engine = bm25
+	if engine is None or engine.token != token:
+		with _loadLock:
+			engine = bm25
+			if engine is None or engine.token != token:
+				engine = bm25 = BM25Index(searcher.reader(), instFields)
+	return engine
+
+def trigramIndex(searcher):
+	'''
+	Return the trigram index of the institution names corresponding to
+	the segments of the index read by the searcher.
+	
+	:param searcher: the searcher of the institution index
+	'''
+	global trigrams
+	token = indexToken(searcher.reader())
+	grams = trigrams
+	if grams is None or grams.token != token:
+		with _loadLock:
+			grams = trigrams
+			if grams is None or grams.token != token:
+				grams = trigrams = TrigramIndex(searcher.reader())
+	return grams
+
+def nameIndex(searcher):
+	'''
+	Return the index of the normalised institution names corresponding to
+	the segments of the index read by the searcher.
+	
+	:param searcher: the searcher of the institution index
+	'''
+	global names
+	token = indexToken(searcher.reader())
+	exact = names
+	if exact is None or exact.token != token:
+		with _loadLock:
+			exact = names
+			if exact is None or exact.token != token:
+				exact = names = NameIndex(searcher.reader())
+	return exact
+
+@_appendDoc(_find_query_param_list + '''\
+	:param searcher: the searcher to use instead of the shared one
+''')
+def exactMatch(institution, alpha2, lat, lon, offset, searcher=None):
+	'''
+	Return the institution whose name or alias equals the institution
+	name once both are normalised like the index does if it is certainly
+	the most accurate institution found by findAll, otherwise None. The
+	name is looked up in a dictionary loaded on first use.
+	
+	The institutions of the name, optionally restricted to the country,
+	are ranked by the score of the query of findAll. Given coordinates,
+	only the institutions inside of the box are considered and their
+	scores decay with the distance to lat/lon as in query. The best
+	institution is returned only if its score exceeds the score of every
+	other institution of the name and the best score of all institutions
+	of other names, which can only decrease inside of the box. The scores
+	are searched once per institution string and kept in exactScores, so
+	that repeated institution strings are answered without searching.
+	'''
+	if not isinstance(institution, str):
+		return
+	searcher = searcher or _searchers.get().searcher()
+	docnums = np.union1d(*nameIndex(searcher).lookup(institution))
+	if not len(docnums):
+		return
+	scores, rival = _exactScores(institution, docnums, searcher)
+	coords = coordinateIndex(searcher)
+	if alpha2:
+		country = coords.alpha2[docnums] == alpha2
+		docnums, scores = docnums[country], scores[country]
+		if not len(docnums):
+			return
+	try:
+		inside, scores = coords.boost(lat, lon, offset, docnums, scores)
+	except TypeError:
+		# query ignores invalid coordinates as well
+		pass
+	else:
+		if not inside.any():
+			return
+		docnums, scores = docnums[inside], scores[inside]
+	order = np.argsort(-scores, kind='stable')
+	best = scores[order[0]]
+	if not best > rival or len(order) > 1 and not best > scores[order[1]]:
+		return
+	return _materializer(searcher)(int(docnums[order[0]]))
+
+def _exactScores(institution, docnums, searcher):
+	# return the scores of the documents of the exact name matches and the
+	# best score of any other document for the query searched by findAll,
+	# documents not matching the query have a score of -inf
+	exactScores.validate(indexToken(searcher.reader()))
+	found = exactScores.get(institution)
+	if found is not None:
+		return found
+	text = ' '.join(expandAbbreviations(institution).lower().split())
+	instQuery = parseCache.parse(_instParser.get(), text,
+		searcher.reader().generation())
+	candidates = set(docnums.tolist())
+	results = searcher.search(instQuery, limit=None, filter=candidates)
+	matched = {docnum: score for score, docnum in results.top_n}
+	scores = np.array([matched.get(docnum, -np.inf)
+		for docnum in docnums.tolist()])
+	others = searcher.search(instQuery, limit=1, mask=candidates).top_n
+	rival = others[0][0] if others else -np.inf
+	exactScores.put(institution, (scores, rival))
+	return scores, rival
+
+def exactMatchInfo():
+	'''
+	Return the number of calls of find, the number of calls answered by
+	an exact name match and the fraction of these calls, see exactMatch.
+	'''
+	with _exactLock:
+		calls, hits = exactCalls, exactHits
+	return {
+		'calls': calls,
+		'hits': hits,
+		'ratio': hits / calls if calls else 0.0,
+	}
+
+def _countExact(hit):
+	global exactCalls, exactHits
+	with _exactLock:
+		exactCalls += 1
+		exactHits += hit
+
+def fuzzyQuery(institutions, alpha2s=None, limit=5, threshold=0.0,
+		searcher=None):
+	'''
+	Return a list of the institutions with the most similar names along
+	with their similarity for every institution name of the iterable.
+	
+	The names are compared by the cosine similarity of their TF-IDF
+	weighted character trigrams, so that misspelled names still match.
+	The whole batch is compared with every institution at once, the
+	trigram index is loaded on first use. Known abbreviations are
+	expanded before comparing the names.
+	
+	:param institutions: an iterable of institution names
+	:param alpha2s: the countries to restrict the results of the names to
+	:param limit: the maximum number of results per name
+	:param threshold: the minimum similarity of the results
+	:param searcher: the searcher to use instead of the shared one
+	'''
+	searcher = searcher or _searchers.get().searcher()
+	texts = [expandAbbreviations(name) if isinstance(name, str) else ''
+		for name in institutions]
+	results = trigramIndex(searcher).search(texts, alpha2s, limit, threshold)
+	institution = _materializer(searcher)
+	return [[(institution(docnum), similarity)
+		for docnum, similarity in items] for items in results]
+
+def loadStore(path):
+	'''
+	Return the memory-mapped field store of the institutions or None if
+	it does not exist, see buildStore.
+	
+	:param path: the path of the field store
+	'''
+	try:
+		return FieldStore(path)
+	except (OSError, ValueError):
+		return
+
+def buildStore(reader, path=storePath):
+	'''
+	Write the stored fields of the institutions read by the index reader
+	into a columnar field store. Search results are looked up in the
+	memory-mapped field store instead of the index as long as the store
+	corresponds to the segments of the searched index.
+	
+	:param reader: the reader of the institution index
+	:param path: the path of the field store
+	'''
+	writeStore(reader, path, storeFields, ['lat', 'lon',])
+	if path == storePath:
+		_store.reset()
+
+def useBackend(name):
+	'''
+	Select the backend used to search for institutions. The default
+	backend 'whoosh' searches the index on disk. The backend 'bm25' loads
+	the postings of the index into memory on first use and scores the
+	queries with vectorised operations, falling back to whoosh for queries
+	it does not support. Both backends yield the same results.
+	
+	:param name: either 'whoosh' or 'bm25'
+	'''
+	global backend
+	if name not in ('whoosh', 'bm25'):
+		raise ValueError('unknown backend {!r}'.format(name))
+	backend = name
+
+def _search(searcher, query, limit, filter=None, mask=None):
+	# collect the best results only if a limit is given, but disable the
+	# matcher replacement and block quality optimizations of whoosh which
+	# may skip the best documents of the multi-field institution queries
+	if limit is None:
+		return searcher.search(query, limit=None, filter=filter, mask=mask)
+	collector = TopCollector(limit, usequality=False, replace=0)
+	if filter or mask:
+		collector = FilterCollector(collector, filter, mask)
+	searcher.search_with_collector(query, collector)
+	return collector.results()
+
+def _hits(results, institution):
+	# yield hits along with the score
+	for hit in results:
+		yield institution(hit.docnum), hit.score
+
+def _materializer(searcher):
+	# return a function looking up the institution of a document number in
+	# the field store if it was written for the index read by the searcher
+	store = _store.get()
+	if store is not None and store.token == indexToken(searcher.reader()):
+		return lambda docnum: InstitutionRecord.fromStore(store, docnum)
+	return lambda docnum: _institution(searcher.stored_fields(docnum))
+
+def _institution(fields):
+	return InstitutionRecord.fromFields(fields)
 
 def expandAbbreviations(text):
 	'''
 	Expand known abbreviations in the supplied string.
 	Known abbreviations may be found in data/abbreviations.csv.
 	
+	Every abbreviation is expanded in a single scan of the string.
+	
 	:param text: the text in which abbreviations should be expanded
 	'''
 	try:
-		for abbrev, expansion in abbreviations.items():
-			text = re.sub(r'(?i)\b{}\b'.format(abbrev), expansion, text)
+		table = _abbreviations.get()
+		return _abbrevPattern.get().sub(
+			lambda match: table[match.group(0).lower()], text)
 	except TypeError:
-		pass
-	return text
+		return text
 
-@_appendDoc(_find_query_param_list)
-def findAll(institution, alpha2=None, lat=None, lon=None, offset=0.4):
+@_appendDoc(_findAll_param_list)
+def findAll(institution, alpha2=None, lat=None, lon=None, offset=0.4,
+		limit=None, fuzzy=False):
 	'''
 	Yield all institutions compatible with the search parameters by calling
 	the query function with the given parameters.
 	Known abbreviations inside of the institution string are expanded.
+	
+	If fuzzy is true and the search finds nothing, the institutions whose
+	names are at least fuzzyThreshold similar to the given name are
+	yielded instead, see fuzzyQuery. The fuzzy results ignore the
+	coordinates but are restricted to the country.
+	
+	If the cache is enabled, the results are looked up in and stored to
+	the cache, see enableCache.
 	'''
+	cache = resultCache
+	if cache is None:
+		yield from _findAll(institution, alpha2, lat, lon, offset, limit, fuzzy)
+		return
+	try:
+		lat, lon = round(lat, cachePrecision), round(lon, cachePrecision)
+	except TypeError:
+		pass
+	try:
+		name = ' '.join(institution.lower().split())
+	except AttributeError:
+		name = institution
+	key = name, alpha2, lat, lon, offset, limit, bool(fuzzy), backend
+	# the cached results are discarded once the segments of the index
+	# change, unlike its generation they change whenever it is rebuilt
+	searcher = _searchers.get().searcher()
+	cache.validate(indexToken(searcher.reader()))
+	try:
+		results = cache.get(key)
+	except TypeError:
+		# unhashable parameters can not be cached
+		key, results = None, None
+	if results is None:
+		results = list(_findAll(
+			institution, alpha2, lat, lon, offset, limit, fuzzy, searcher))
+		if key is not None:
+			cache.put(key, results)
+	for result in results:
+		yield result.copy()
+
+def _findAll(institution, alpha2, lat, lon, offset, limit, fuzzy,
+		searcher=None, shards=None):
+	if limit is not None and limit < 1:
+		return
 	fullName = expandAbbreviations(institution)
-	for result in query(fullName, alpha2, lat, lon, offset):
-		yield result[0]
+	found = False
+	results = query(fullName, alpha2, lat, lon, offset, limit, searcher,
+		shards)
+	for item, score in results:
+		found = True
+		yield item
+	if fuzzy and not found and institution:
+		results = fuzzyQuery([institution], [alpha2], limit, fuzzyThreshold,
+			searcher)
+		for item, similarity in results[0]:
+			yield item
 
-@_appendDoc(_find_query_param_list)
-def find(institution, alpha2=None, lat=None, lon=None, offset=0.4):
+@_appendDoc(_find_param_list)
+def find(institution, alpha2=None, lat=None, lon=None, offset=0.4,
+		fuzzy=False):
 	'''
 	Find the most accurate institution compatible with the search
 	parameters by calling the query function with the given parameters.
 	Known abbreviations inside of the institution string are expanded.
+	
+	An institution whose name or alias exactly matches the institution
+	string is returned without searching the index again if it is
+	certainly the most accurate one, see exactMatch.
 	'''
+	inst = exactMatch(institution, alpha2, lat, lon, offset)
+	_countExact(inst is not None)
+	if inst is not None:
+		return inst
 	try:
-		return next(findAll(institution, alpha2, lat, lon, offset))
+		return next(findAll(institution, alpha2, lat, lon, offset, 1, fuzzy))
 	except StopIteration:
 		return
+
+def findMany(queries, batchSize=1000, fuzzy=False):
+	'''
+	Yield the most accurate institution for every query of the iterable
+	in the order of the queries. A query is either an institution name or
+	a tuple of the parameters of the find function in the same order.
+	
+	The queries are processed in batches sharing a single searcher. As in
+	find, exact name matches are returned without searching. Every
+	distinct query of a batch is searched only once, its repeats yield
+	copies of its result. If fuzzy is true, the queries of a batch without
+	any result are passed to fuzzyQuery at once.
+	
+	:param queries: an iterable of institution names or parameter tuples
+	:param batchSize: the maximum number of queries per batch
+	:param fuzzy: whether to fall back to fuzzyQuery if nothing is found
+	'''
+	queries = iter(queries)
+	defaults = (None, None, None, None, 0.4)
+	while True:
+		batch = list(itertools.islice(queries, batchSize))
+		if not batch:
+			return
+		searcher = _searchers.get().searcher()
+		results = {}
+		found = []
+		for params in batch:
+			if not isinstance(params, (tuple, list)):
+				params = (params,)
+			params = tuple(params) + defaults[len(params):]
+			try:
+				hash(params)
+			except TypeError:
+				# unhashable parameters can not be de-duplicated
+				found.append((params, _findFirst(params, searcher)))
+				continue
+			if params not in results:
+				results[params] = _findFirst(params, searcher)
+			found.append((params, results[params]))
+		if fuzzy:
+			missing = [i for i, (params, inst) in enumerate(found)
+				if inst is None and params[0]]
+			matches = fuzzyQuery([found[i][0][0] for i in missing],
+				[found[i][0][1] for i in missing], 1, fuzzyThreshold, searcher)
+			for i, items in zip(missing, matches):
+				for inst, similarity in items:
+					found[i] = found[i][0], inst
+		# repeated queries share their result, every repeat yields a copy
+		yielded = set()
+		for params, inst in found:
+			if inst is not None:
+				if id(inst) in yielded:
+					inst = inst.copy()
+				yielded.add(id(inst))
+			yield inst
+
+def _findFirst(params, searcher):
+	institution, alpha2, lat, lon, offset = params
+	inst = exactMatch(institution, alpha2, lat, lon, offset, searcher)
+	_countExact(inst is not None)
+	if inst is not None:
+		return inst
+	fullName = expandAbbreviations(institution)
+	results = query(fullName, alpha2, lat, lon, offset, 1, searcher)
+	for inst, score in results:
+		return inst
+
+def enableCache(maxsize=4096, precision=2):
+	'''
+	Cache the results of find and findAll in memory, discarding the least
+	recently used results once more than maxsize queries are cached. The
+	cache is cleared whenever the index is rebuilt.
+	
+	Queries are identified by their case and whitespace normalised
+	institution name, their country and their coordinates. The coordinates
+	are rounded to the given number of decimal places before searching,
+	so that nearby coordinates share the same cached results.
+	
+	:param maxsize: the maximum number of cached queries
+	:param precision: the number of decimal places of the coordinates
+	'''
+	global resultCache, cachePrecision
+	resultCache = LRUCache(maxsize)
+	cachePrecision = precision
+
+def disableCache():
+	'''Disable and discard the cache of find and findAll results.'''
+	global resultCache
+	resultCache = None
+
+def cacheInfo():
+	'''
+	Return the number of hits, misses and evictions along with the size
+	of the cache of find and findAll results or None if it is disabled.
+	'''
+	cache = resultCache
+	if cache is not None:
+		return cache.info()
+
+def parseCacheInfo():
+	'''
+	Return the number of hits, misses and evictions along with the size
+	of the cache of parsed institution queries, the time spent parsing
+	and the estimated time saved by the cache in seconds as well as the
+	hits and misses of the memoised stemmer.
+	'''
+	info = parseCache.info()
+	stemInfo = stem.cache_info()
+	info['stemHits'] = stemInfo.hits
+	info['stemMisses'] = stemInfo.misses
+	return info
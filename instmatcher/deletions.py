@@ -0,0 +1,167 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Module to find names within a small edit distance of misspelled names.'''
+
+import itertools
+
+import numpy as np
+
+def codes(strings, width):
+	'''
+	Return the code points of the first width characters of the strings
+	as an array of shape (strings, width) padded with zeros.
+	
+	:param strings: a sequence of strings
+	:param width: the number of characters per string
+	'''
+	padded = ''.join(string[:width].ljust(width, '\0') for string in strings)
+	return np.frombuffer(padded.encode('utf-32-le'), dtype=np.uint32).reshape(
+		len(strings), width)
+
+def editDistances(string, strings):
+	'''
+	Return an array of the edit distances of the string and every string
+	of the sequence, i.e. the minimum numbers of inserted, deleted and
+	substituted characters and transposed adjacent characters to turn one
+	into the other, where no substring is edited twice (the optimal
+	string alignment distance). The distances of all strings are computed
+	at once, one row of the dynamic program per character of the string.
+	
+	:param string: the string to compare with the strings
+	:param strings: a non-empty sequence of strings
+	'''
+	lengths = [len(other) for other in strings]
+	# one row per character of the strings, one column per string
+	others = np.ascontiguousarray(codes(strings, max(lengths)).T)
+	# keep the distances minus their row, so that inserting characters
+	# into the string, one more than the row above, is a running minimum
+	previous = np.zeros((len(others) + 1, len(strings)), dtype=np.int64)
+	before = beforeSame = None
+	for step, code in enumerate(codes([string], len(string))[0], 1):
+		same = others == code
+		current = np.empty_like(previous)
+		current[0] = step
+		np.minimum(previous[1:] + 1, previous[:-1] - same, out=current[1:])
+		if before is not None:
+			# transposing two adjacent characters, unless they differ, costs
+			# at least as much as substituting them
+			np.minimum(current[2:], before[:-2] - (same[:-1] & beforeSame[1:]),
+				out=current[2:])
+		np.minimum.accumulate(current, axis=0, out=current)
+		before, beforeSame, previous = previous, same, current
+	return previous[lengths, np.arange(len(strings))] + lengths
+
+class DeletionIndex():
+	'''
+	Find the keys within a small edit distance of a string, see
+	editDistances, by symmetric deletions: if two strings are at most d
+	edits apart, both turn into the same string by deleting at most d
+	characters from each of them. The same holds for the first width
+	characters of both strings, so only the deletions of the prefixes are
+	indexed, which keeps the index small at the cost of candidates
+	sharing a prefix only. The candidates are verified by their edit
+	distance.
+	
+	Every deletion of a prefix is stored as a 32 bit hash, the sums of the
+	code points of the remaining characters multiplied by odd numbers of
+	their positions, sorted along with the position of its key. Colliding
+	hashes merely add candidates.
+	
+	:param keys: a sequence of strings
+	:param maxDistance: the maximum edit distance supported by search
+	:param width: the number of indexed characters of every key
+	'''
+	
+	def __init__(self, keys, maxDistance=2, width=7):
+		self.keys = keys
+		self.maxDistance = maxDistance
+		self.width = width
+		multipliers = np.random.default_rng(0).integers(
+			0, 2 ** 31, width, dtype=np.uint32) * np.uint32(2) + np.uint32(1)
+		# the multipliers of the deletions of a prefix of every length in
+		# the columns of a matrix, ordered by the number of deleted characters
+		self.weights, self.deletions = [], []
+		for length in range(width + 1):
+			columns, counts = [], []
+			for count in range(min(maxDistance, length) + 1):
+				for deleted in itertools.combinations(range(length), count):
+					kept = [i for i in range(length) if i not in deleted]
+					column = np.zeros(length, dtype=np.uint32)
+					column[kept] = multipliers[:len(kept)]
+					columns.append(column)
+				counts.append(len(columns))
+			self.weights.append(np.array(columns, dtype=np.uint32).reshape(
+				len(columns), length).T)
+			self.deletions.append(counts)
+		self.lengths = np.array([len(key) for key in keys], dtype=np.int64)
+		prefixes = codes(keys, width)
+		widths = np.minimum(self.lengths, width)
+		hashes, owners = [], []
+		for length in range(width + 1):
+			rows = np.flatnonzero(widths == length)
+			matrix = prefixes[rows, :length] @ self.weights[length]
+			hashes.append(matrix.ravel())
+			owners.append(np.repeat(rows.astype(np.int32), matrix.shape[1]))
+		hashes = np.concatenate(hashes)
+		order = np.argsort(hashes)
+		self.hashes = hashes[order]
+		self.owners = np.concatenate(owners)[order]
+	
+	def __len__(self):
+		return len(self.keys)
+	
+	def candidates(self, string, maxDistance):
+		'''
+		Return the sorted positions of the keys sharing a deletion of their
+		prefix with the prefix of the string and differing in length by at
+		most maxDistance.
+		
+		:param string: the string to search for
+		:param maxDistance: the maximum number of deleted characters
+		'''
+		prefix = string[:self.width]
+		columns = self.deletions[len(prefix)][min(maxDistance, len(prefix))]
+		hashes = codes([prefix], len(prefix))[0] @ (
+			self.weights[len(prefix)][:, :columns])
+		starts = np.searchsorted(self.hashes, hashes, 'left')
+		counts = np.searchsorted(self.hashes, hashes, 'right') - starts
+		positions = np.arange(counts.sum()) + np.repeat(
+			starts - np.cumsum(counts) + counts, counts)
+		found = np.unique(self.owners[positions])
+		return found[np.abs(self.lengths[found] - len(string)) <= maxDistance]
+	
+	def search(self, string, maxDistance=None):
+		'''
+		Return a list of tuples of the position and the edit distance of
+		every key at most maxDistance edits apart from the string in
+		ascending order of the distance and the position.
+		
+		:param string: the string to search for
+		:param maxDistance: the maximum edit distance, by default the one of
+			the index
+		:raises ValueError: if maxDistance exceeds the one of the index
+		'''
+		if maxDistance is None:
+			maxDistance = self.maxDistance
+		if maxDistance > self.maxDistance:
+			raise ValueError('the index supports up to {} edits'.format(
+				self.maxDistance))
+		found = self.candidates(string, maxDistance).tolist()
+		if not found:
+			return []
+		distances = editDistances(string, [self.keys[key] for key in found])
+		order = np.lexsort((found, distances))
+		return [(found[i], int(distances[i])) for i in order
+			if distances[i] <= maxDistance]
@@ -0,0 +1,173 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Module to match misspelled names using character trigrams.'''
+
+import re
+from collections import Counter
+
+import numpy as np
+
+from .store import indexToken
+
+def trigrams(text):
+	'''
+	Return the character trigrams of the lower case words of the text.
+	Every word is padded with spaces so that the trigrams include the
+	beginning and the end of the words.
+	
+	:param text: the text to split into trigrams
+	'''
+	words = re.findall(r'\w+', text.lower())
+	padded = '  ' + '  '.join(words) + '  ' if words else ''
+	return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+class TrigramIndex():
+	'''
+	Keep the TF-IDF weighted character trigrams of the names and aliases
+	of every document as a sparse matrix in compressed sparse column
+	arrays: the rows and weights of the n-th trigram are stored between
+	indptr[n] and indptr[n + 1]. Every row is a name or an alias and
+	belongs to the document owner[row].
+	
+	The cosine similarities of a batch of queries and every row are
+	computed by a single sparse matrix multiplication.
+	
+	:param reader: the index reader to load the stored fields from
+	'''
+	
+	def __init__(self, reader):
+		self.token = indexToken(reader)
+		self.size = reader.doc_count_all()
+		self.alpha2 = np.zeros(self.size, dtype='U2')
+		owner, counts = [], []
+		for docnum in range(self.size):
+			if reader.is_deleted(docnum):
+				continue
+			fields = reader.stored_fields(docnum)
+			self.alpha2[docnum] = fields['alpha2']
+			names = [fields['name']] + (fields.get('alias') or '').split(';')
+			for name in set(name.strip() for name in names):
+				grams = Counter(trigrams(name))
+				if grams:
+					owner.append(docnum)
+					counts.append(grams)
+		self.owner = np.array(owner, dtype=np.int64)
+		# the first row of every document, the rows are sorted by document
+		self.starts = np.flatnonzero(np.diff(self.owner, prepend=-1))
+		self.vocabulary = {}
+		for grams in counts:
+			for gram in grams:
+				self.vocabulary.setdefault(gram, len(self.vocabulary))
+		df = np.zeros(len(self.vocabulary))
+		rows, cols, tfs = [], [], []
+		for row, grams in enumerate(counts):
+			for gram, count in grams.items():
+				col = self.vocabulary[gram]
+				df[col] += 1
+				rows.append(row)
+				cols.append(col)
+				tfs.append(count)
+		rows = np.array(rows, dtype=np.int64)
+		cols = np.array(cols, dtype=np.int64)
+		self.idf = np.log((len(counts) + 1) / (df + 1)) + 1
+		weights = (1 + np.log(np.array(tfs, dtype=np.float64))) * self.idf[cols]
+		weights /= np.sqrt(np.bincount(rows, weights ** 2, len(counts)))[rows]
+		order = np.argsort(cols, kind='stable')
+		self.rows = rows[order]
+		self.weights = weights[order]
+		self.indptr = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+		np.cumsum(np.bincount(cols, minlength=len(self.vocabulary)),
+			out=self.indptr[1:])
+	
+	def vectorize(self, texts):
+		'''
+		Return the rows, columns and weights of the TF-IDF weighted and
+		normalised trigram vectors of the texts. Trigrams not contained in
+		the index are ignored.
+		
+		:param texts: the texts to vectorize
+		'''
+		rows, cols, tfs = [], [], []
+		for row, text in enumerate(texts):
+			for gram, count in Counter(trigrams(text)).items():
+				col = self.vocabulary.get(gram)
+				if col is not None:
+					rows.append(row)
+					cols.append(col)
+					tfs.append(count)
+		rows = np.array(rows, dtype=np.int64)
+		cols = np.array(cols, dtype=np.int64)
+		weights = (1 + np.log(np.array(tfs, dtype=np.float64))) * self.idf[cols]
+		norms = np.sqrt(np.bincount(rows, weights ** 2, len(texts)))
+		return rows, cols, weights / norms[rows]
+	
+	def similarities(self, texts):
+		'''
+		Return a matrix of the cosine similarities of every text and every
+		document, the maximum similarity of the names and aliases of the
+		document.
+		
+		:param texts: the texts to compare with the documents
+		'''
+		rows, cols, weights = self.vectorize(texts)
+		# multiply the sparse query matrix with the transposed index matrix
+		# by repeating every query entry for every row containing the trigram
+		starts = self.indptr[cols]
+		lengths = self.indptr[cols + 1] - starts
+		total = lengths.sum()
+		positions = np.arange(total) + np.repeat(
+			starts - np.cumsum(lengths) + lengths, lengths)
+		keys = np.repeat(rows, lengths) * len(self.owner) + self.rows[positions]
+		products = np.repeat(weights, lengths) * self.weights[positions]
+		sims = np.bincount(keys, products, len(texts) * len(self.owner))
+		sims = sims.reshape(len(texts), len(self.owner))
+		matrix = np.zeros((len(texts), self.size))
+		if len(self.owner):
+			matrix[:, self.owner[self.starts]] = np.maximum.reduceat(
+				sims, self.starts, axis=1)
+		return matrix
+	
+	def search(self, texts, alpha2s=None, limit=5, threshold=0.0,
+			batchSize=None):
+		'''
+		Return a list of the most similar documents for every text. Each
+		list contains tuples of the document number and the similarity in
+		descending order of the similarity.
+		
+		:param texts: the texts to compare with the documents
+		:param alpha2s: the countries to restrict the documents of the texts to
+		:param limit: the maximum number of documents per text
+		:param threshold: the minimum similarity of the documents
+		:param batchSize: the number of texts multiplied at once, by default
+			as many as fit a similarity matrix of about 32 MB
+		'''
+		texts = list(texts)
+		alpha2s = [None] * len(texts) if alpha2s is None else list(alpha2s)
+		batchSize = batchSize or max(1, 2 ** 22 // max(1, len(self.owner)))
+		results = []
+		for start in range(0, len(texts), batchSize):
+			batch = texts[start:start + batchSize]
+			matrix = self.similarities(batch)
+			for sims, alpha2 in zip(matrix, alpha2s[start:start + batchSize]):
+				if alpha2:
+					sims[self.alpha2 != alpha2] = 0
+				candidates = np.flatnonzero(sims > max(threshold, 0))
+				if limit is not None and limit < len(candidates):
+					kth = np.partition(-sims[candidates], limit - 1)[limit - 1]
+					candidates = candidates[-sims[candidates] <= kth]
+				order = np.lexsort((candidates, -sims[candidates]))
+				docnums = candidates[order][:limit]
+				results.append(list(zip(docnums.tolist(), sims[docnums].tolist())))
+		return results
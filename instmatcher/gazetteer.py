@@ -0,0 +1,373 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Module to look up settlements by their names in memory.'''
+
+import bisect
+import csv
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+
+import numpy as np
+
+magic = b'IMGAZET1'
+
+# the record of a settlement inside of a binary gazetteer
+cityType = np.dtype([
+	('lat', '<f8'),
+	('lon', '<f8'),
+	('population', '<i8'),
+	('boost', '<f8'),
+	('alpha2', '<U2'),
+])
+
+def readGeoNames(path):
+	'''
+	Yield the rows of a tab-separated GeoNames file, e.g. cities1000.txt.
+	
+	:param path: the path of the file
+	'''
+	with open(path, encoding='utf-8') as f:
+		yield from csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE)
+
+class Gazetteer():
+	'''
+	Keep the coordinates, country codes, populations, names and boosts of
+	the settlements of GeoNames rows in arrays indexed by the city id, the
+	position of the row. The boost of a settlement is the logarithm of
+	its population as in the geoindex.
+	
+	Every name variant indexed by the geoindex, the lower case name, the
+	lower case ASCII name and every lower case alternate name, is mapped
+	to a slot. The ids of the settlements of the n-th slot are stored
+	between indptr[n] and indptr[n + 1] of the ids array in descending
+	order of their boost.
+	
+	A gazetteer may be saved to a compact binary file and loaded from it
+	without parsing the GeoNames rows again, see save and load.
+	
+	:param rows: an iterable of GeoNames rows
+	:param pattern: the pattern of an alternate name
+	'''
+	
+	def __init__(self, rows, pattern=re.compile(r'[^,]+')):
+		names, lats, lons, alpha2s, populations = [], [], [], [], []
+		self.slots = {}
+		slots, ids = [], []
+		for city, row in enumerate(rows):
+			names.append(sys.intern(row[1]))
+			lats.append(float(row[4]))
+			lons.append(float(row[5]))
+			alpha2s.append(row[8])
+			populations.append(int(row[14] or 0))
+			variants = {row[1].lower(), row[2].lower()}
+			variants.update(pattern.findall(row[3].lower()))
+			variants.discard('')
+			for variant in variants:
+				slots.append(self.slots.setdefault(variant, len(self.slots)))
+				ids.append(city)
+		self.names = names
+		self.lat = np.array(lats, dtype=np.float64)
+		self.lon = np.array(lons, dtype=np.float64)
+		self.alpha2 = np.array(alpha2s, dtype='U2')
+		self.population = np.array(populations, dtype=np.int64)
+		self.boost = np.log(np.maximum(math.e, self.population))
+		slots = np.array(slots, dtype=np.int64)
+		ids = np.array(ids, dtype=np.int32)
+		order = np.lexsort((ids, -self.boost[ids], slots))
+		self.ids = ids[order]
+		self.indptr = np.zeros(len(self.slots) + 1, dtype=np.int64)
+		np.cumsum(np.bincount(slots, minlength=len(self.slots)),
+			out=self.indptr[1:])
+	
+	def __len__(self):
+		return len(self.names)
+	
+	def localities(self, ids):
+		'''
+		Return a list of the names of the settlements of the given ids.
+		
+		:param ids: an array of city ids
+		'''
+		if isinstance(self.names, StringTable):
+			return self.names.take(ids)
+		names = self.names
+		return [names[city] for city in ids.tolist()]
+	
+	@classmethod
+	def load(cls, path):
+		'''
+		Return the gazetteer of a binary file written by save. The file is
+		memory-mapped: the pages are shared between processes and only the
+		pages of the looked up names and settlements are read, so that
+		loading the gazetteer takes no time.
+		
+		:param path: the path of the file
+		:raises ValueError: if the file is not a gazetteer of this byte order
+		'''
+		with open(path, 'rb') as f:
+			buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		if buffer[:len(magic)] != magic:
+			raise ValueError('{} is not a gazetteer'.format(path))
+		start, = struct.unpack_from('<Q', buffer, len(magic))
+		header = json.loads(buffer[len(magic) + 8:start].rstrip(b'\0')
+			.decode('utf-8'))
+		if header['byteorder'] != sys.byteorder:
+			raise ValueError('{} has a different byte order'.format(path))
+		def array(name, dtype, count):
+			return np.frombuffer(buffer, dtype, count,
+				start + header['arrays'][name])
+		def table(name, offsetsName, count):
+			offset = start + header['arrays'][offsetsName]
+			offsets = memoryview(buffer)[offset:offset + 8 * (count + 1)]
+			return StringTable(buffer, offsets.cast('q'),
+				start + header['arrays'][name])
+		size, slots = header['size'], header['slots']
+		gazetteer = cls.__new__(cls)
+		gazetteer.buffer = buffer
+		cities = array('cities', cityType, size)
+		for name in ('lat', 'lon', 'population', 'boost', 'alpha2'):
+			setattr(gazetteer, name, cities[name])
+		gazetteer.names = table('names', 'nameOffsets', size)
+		gazetteer.slots = table('keys', 'keyOffsets', slots)
+		gazetteer.indptr = array('indptr', np.int64, slots + 1)
+		gazetteer.ids = array('ids', np.int32, int(gazetteer.indptr[-1]))
+		return gazetteer
+	
+	def save(self, path):
+		'''
+		Write the gazetteer into a compact binary file: a structured array
+		of the coordinates, populations, boosts and country codes of the
+		settlements, a heap of the UTF-8 encoded names along with an array
+		of their offsets, the name variants sorted by their encoding in the
+		same layout to be searched by bisection and the arrays of the ids
+		of the settlements of every name variant.
+		
+		:param path: the path of the file to write
+		'''
+		cities = np.zeros(len(self), dtype=cityType)
+		for name in ('lat', 'lon', 'population', 'boost', 'alpha2'):
+			cities[name] = getattr(self, name)
+		names = [name.encode('utf-8') for name in self.names]
+		keys = [None] * len(self.slots)
+		for variant, slot in self.slots.items():
+			keys[slot] = variant.encode('utf-8')
+		order = sorted(range(len(keys)), key=keys.__getitem__)
+		# move the ids of the slots into the order of their keys
+		starts = self.indptr[:-1][order]
+		counts = np.diff(self.indptr)[order]
+		indptr = np.zeros(len(keys) + 1, dtype=np.int64)
+		np.cumsum(counts, out=indptr[1:])
+		positions = np.repeat(starts - indptr[:-1], counts)
+		ids = self.ids[positions + np.arange(len(positions))]
+		
+		arrays, blobs = {}, []
+		position = 0
+		def append(name, blob):
+			nonlocal position
+			# align every array to 8 bytes
+			padding = -position % 8
+			blobs.append(b'\0' * padding + blob)
+			position += padding
+			arrays[name] = position
+			position += len(blob)
+		def appendStrings(name, offsetsName, strings):
+			offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+			np.cumsum([len(string) for string in strings], out=offsets[1:])
+			append(offsetsName, offsets.tobytes())
+			append(name, b''.join(strings))
+		append('cities', cities.tobytes())
+		appendStrings('names', 'nameOffsets', names)
+		appendStrings('keys', 'keyOffsets', [keys[slot] for slot in order])
+		append('indptr', indptr.tobytes())
+		append('ids', ids.astype(np.int32).tobytes())
+		header = json.dumps({
+			'byteorder': sys.byteorder,
+			'size': len(self),
+			'slots': len(keys),
+			'arrays': arrays,
+		}).encode('utf-8')
+		# the arrays start at the first multiple of 8 after the header
+		start = len(magic) + 8 + len(header)
+		start += -start % 8
+		# replace the file at once since it may be memory-mapped by a reader
+		temp = path + '.tmp'
+		with open(temp, 'wb') as f:
+			f.write(magic)
+			f.write(struct.pack('<Q', start))
+			f.write(header)
+			f.write(b'\0' * (start - len(magic) - 8 - len(header)))
+			for blob in blobs:
+				f.write(blob)
+		os.replace(temp, path)
+	
+	def lookup(self, variants, alpha2=None):
+		'''
+		Return the array of the ids of the settlements having any of the
+		name variants in descending order of their boost, optionally
+		restricted to a country.
+		
+		:param variants: the lower case name variants to look up
+		:param alpha2: the country to restrict the settlements to
+		'''
+		found = {self.slots.get(variant) for variant in variants}
+		found.discard(None)
+		if not found:
+			return self.ids[:0]
+		if len(found) == 1:
+			slot, = found
+			ids = self.ids[self.indptr[slot]:self.indptr[slot + 1]]
+		else:
+			ids = np.unique(np.concatenate([
+				self.ids[self.indptr[slot]:self.indptr[slot + 1]]
+				for slot in found]))
+			ids = ids[np.argsort(-self.boost[ids], kind='stable')]
+		if alpha2:
+			ids = ids[self.alpha2[ids] == alpha2]
+		return ids
+	
+	def select(self, ids, limit=None, minPopulation=0, bestPerCountry=False):
+		'''
+		Return the ids of an array of ranked settlements restricted to the
+		first limit settlements having at least the minimum population,
+		optionally keeping only the first settlement of every country.
+		
+		:param ids: the array of the ids of the settlements
+		:param limit: the maximum number of settlements or None for all
+		:param minPopulation: the minimum population of the settlements
+		:param bestPerCountry: whether to keep the first settlement of every
+			country only
+		'''
+		if minPopulation:
+			ids = ids[self.population[ids] >= minPopulation]
+		if bestPerCountry:
+			_, first = np.unique(self.alpha2[ids], return_index=True)
+			ids = ids[np.sort(first)]
+		return ids[:limit]
+	
+	def lookupSlots(self, slots, ranks, alpha2=None):
+		'''
+		Return the array of the ids of the settlements of the given slots in
+		ascending order of the rank of their slot and descending order of
+		their boost, optionally restricted to a country. A settlement of
+		several slots is returned once at its lowest rank.
+		
+		:param slots: the slots of the name variants to look up
+		:param ranks: the rank of every slot
+		:param alpha2: the country to restrict the settlements to
+		'''
+		slots = np.asarray(slots, dtype=np.int64)
+		starts = self.indptr[slots]
+		counts = self.indptr[slots + 1] - starts
+		positions = np.arange(counts.sum()) + np.repeat(
+			starts - np.cumsum(counts) + counts, counts)
+		ids = self.ids[positions]
+		ranks = np.repeat(np.asarray(ranks), counts)
+		ids = ids[np.lexsort((ids, -self.boost[ids], ranks))]
+		_, first = np.unique(ids, return_index=True)
+		ids = ids[np.sort(first)]
+		if alpha2:
+			ids = ids[self.alpha2[ids] == alpha2]
+		return ids
+
+class StringTable():
+	'''
+	A read-only sequence of the strings of a heap of UTF-8 encoded strings
+	inside of a buffer, the i-th string is stored between the offsets i
+	and i + 1 of the heap. If the strings are sorted by their encoding,
+	the position of a string is found by get: the first string of every
+	block of blocksize strings is kept in memory to find the block of the
+	string by bisection, whose strings are then searched inside of the
+	buffer.
+	
+	:param buffer: the buffer holding the heap
+	:param offsets: a memoryview of the offsets of the strings
+	:param heap: the position of the heap inside of the buffer
+	:param blocksize: the number of strings of a block
+	'''
+	
+	def __init__(self, buffer, offsets, heap, blocksize=32):
+		self.buffer = buffer
+		self.offsets = offsets
+		self.heap = heap
+		self.blocksize = blocksize
+		self.fences = None
+	
+	def __len__(self):
+		return len(self.offsets) - 1
+	
+	def __getitem__(self, index):
+		if not -len(self) <= index < len(self):
+			raise IndexError('string index out of range')
+		return str(self.encoded(index % len(self)), 'utf-8')
+	
+	def encoded(self, index):
+		'''
+		Return the encoded string at the given position.
+		
+		:param index: the position of the string
+		'''
+		heap, offsets = self.heap, self.offsets
+		return self.buffer[heap + offsets[index]:heap + offsets[index + 1]]
+	
+	def take(self, indices):
+		'''
+		Return a list of the strings at the given positions.
+		
+		:param indices: an array of non-negative positions
+		'''
+		offsets = np.frombuffer(self.offsets, np.int64)
+		starts = (offsets[indices] + self.heap).tolist()
+		ends = (offsets[indices + 1] + self.heap).tolist()
+		buffer = self.buffer
+		return [str(buffer[start:end], 'utf-8')
+			for start, end in zip(starts, ends)]
+	
+	def get(self, string, default=None):
+		'''
+		Return the position of a string of a sorted table or the default
+		value if the table does not contain the string.
+		
+		:param string: the string to search for
+		:param default: the value to return if the string is missing
+		'''
+		if self.fences is None:
+			self.fences = [self.encoded(index)
+				for index in range(0, len(self), self.blocksize)]
+		encoded = string.encode('utf-8')
+		block = bisect.bisect_right(self.fences, encoded) - 1
+		if block < 0:
+			return default
+		# search the string inside of the heap of the block, an occurrence
+		# is the string if it starts and ends at the offsets of a string
+		start = block * self.blocksize
+		offsets = self.offsets[start:start + self.blocksize + 1].tolist()
+		first = offsets[0]
+		heap = self.buffer[self.heap + first:self.heap + offsets[-1]]
+		position = heap.find(encoded)
+		while position >= 0:
+			# empty strings share their offset with the following string
+			offset = first + position
+			begin = bisect.bisect_left(offsets, offset)
+			end = bisect.bisect_right(offsets, offset, begin, len(offsets) - 1)
+			for index in range(begin, end):
+				if offsets[index + 1] == offset + len(encoded):
+					return start + index
+			position = heap.find(encoded, position + 1)
+		return default
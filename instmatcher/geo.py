@@ -14,49 +14,528 @@
 
 '''Module to retrieve coordinates of a given settlement'''
 
-from pkg_resources import resource_filename
+import itertools
+import os
+import sys
+from zipfile import BadZipFile
 
+import numpy as np
 from whoosh import index
 from whoosh.qparser import MultifieldParser
-from whoosh.query import Term
+from whoosh.query import And, ConstantScoreQuery, NumericRange, Term
 
-# load the index and create the settlement/alpha2 query parser
-ixPath = resource_filename(__name__, 'data/geoindex')
-ix = index.open_dir(ixPath)
-parser = MultifieldParser(['lower', 'asci', 'alias',], ix.schema)
+from .cache import DiskCache, LRUCache
+from .parser import _countries
+from .parsing import ParseCache
+from .pool import SearcherPool
+from .records import GeoRecord, PlaceRecord
+from .resources import dataPath, Lazy, moduleGetattr, ThreadLocal
+from .store import indexToken
 
-def geocodeAll(settlement, alpha2=None):
+# the index, its shared searchers, the settlement/alpha2 query parser, the
+# in-memory gazetteer, the k-d tree of its coordinates and the deletion
+# index of its name variants are loaded on first use and available as
+# module attributes of the same name, every thread gets its own searcher
+# and parser
+ixPath = dataPath('geoindex')
+citiesPath = dataPath('cities1000.txt')
+gazetteerPath = dataPath('gazetteer.bin')
+treePath = dataPath('cities.tree.npz')
+_ix = Lazy(lambda: index.open_dir(ixPath))
+_searchers = Lazy(lambda: SearcherPool(_ix.get()))
+_parser = ThreadLocal(lambda: MultifieldParser(['lower', 'asci', 'alias',],
+	_ix.get().schema))
+_gazetteer = Lazy(lambda: loadGazetteer())
+_tree = Lazy(lambda: loadTree())
+_deletions = Lazy(lambda: loadDeletions())
+__getattr__ = moduleGetattr(__name__, {
+	'ix': _ix,
+	'searchers': _searchers,
+	'parser': _parser,
+	'gazetteer': _gazetteer,
+	'tree': _tree,
+	'deletions': _deletions,
+})
+
+# the mean radius of the earth in kilometres
+earthRadius = 6371.0088
+
+# the backend used by geocodeAll, see useBackend
+backend = 'whoosh'
+
+# the maximum edit distance of the settlements found by the fuzzy fallback
+# of geocodeAll, at most the maximum distance of the deletion index
+fuzzyDistance = 2
+
+# the cache of the parsed settlement queries, see parseCacheInfo
+parseCache = ParseCache(4096)
+
+# the optional in-memory and on-disk caches of the settlements found by
+# geocodeAll, see enableCache
+resultCache = None
+diskCache = None
+
+def geocodeAll(settlement, alpha2=None, searcher=None, fuzzy=False,
+		limit=None, minPopulation=0, bestPerCountry=False):
 	'''
 	Yield all geographical coordinates of a given settlement name,
 	optionally restricting search results to a specified country.
 	
+	The settlements are searched with the backend selected by useBackend.
+	The number of settlements, their minimum population and whether only
+	the best settlement of every country is kept are enforced by the
+	search itself, so that common names like 'Springfield' do not yield
+	every match. If fuzzy is true and the search finds nothing, the
+	settlements having a name variant within a small edit distance of the
+	name are yielded instead, see fuzzyGeocodeAll. If the cache is
+	enabled, the settlements are looked up in and stored to the cache,
+	see enableCache.
+	
 	:param settlement: the settlement name to search for
 	:param alpha2: the country to restrict search results to
+	:param searcher: the searcher to use instead of the shared one
+	:param fuzzy: whether to fall back to fuzzyGeocodeAll if nothing is found
+	:param limit: the maximum number of settlements or None for all
+	:param minPopulation: the minimum population of the settlements
+	:param bestPerCountry: whether to yield only the best settlement of
+		every country
 	'''
 	if not settlement:
 		return
-	lower = settlement.lower()
+	lower = ' '.join(settlement.lower().split())
+	options = limit, minPopulation, bool(bestPerCountry)
+	cache = resultCache
+	if cache is None:
+		yield from _geocodeAll(lower, alpha2, searcher, fuzzy, options)
+		return
+	key = (lower, alpha2, backend, bool(fuzzy)) + options
+	try:
+		token = _cacheToken(searcher)
+		cache.validate(token)
+		results = cache.get(key)
+	except TypeError:
+		# unhashable parameters can not be cached
+		key, results = None, None
+	disk = diskCache
+	if results is None and key is not None and disk is not None:
+		disk.validate(token)
+		results = disk.get(key)
+		if results is not None:
+			results = [tuple(result) for result in results]
+			cache.put(key, results)
+	if results is None:
+		results = [(record['lat'], record['lon'], record['locality'])
+			for record in _geocodeAll(lower, alpha2, searcher, fuzzy, options)]
+		if key is not None:
+			cache.put(key, results)
+			if disk is not None:
+				disk.put(key, results)
+	for lat, lon, locality in results:
+		yield GeoRecord(lat=lat, lon=lon, locality=locality)
+
+def _geocodeAll(lower, alpha2, searcher, fuzzy, options):
+	# options is the tuple of the limit, the minimum population and
+	# whether to keep the best settlement of every country only
+	found = False
+	for record in _search(lower, alpha2, searcher, options):
+		found = True
+		yield record
+	if fuzzy and not found:
+		yield from _fuzzyGeocodeAll(lower, alpha2, options)
+
+def _records(cities, ids):
+	# the records of the settlements of the gazetteer
+	places = zip(cities.lat[ids].tolist(), cities.lon[ids].tolist(),
+		cities.localities(ids))
+	for lat, lon, locality in places:
+		yield GeoRecord(lat=lat, lon=lon, locality=sys.intern(locality))
+
+def _search(lower, alpha2, searcher, options):
+	if backend == 'gazetteer':
+		cities = _gazetteer.get()
+		ids = cities.lookup([lower, lower.replace(' ', '-')], alpha2)
+		yield from _records(cities, cities.select(ids, *options))
+		return
+	limit, minPopulation, bestPerCountry = options
 	text = "'" + lower + "' OR '" + lower.replace(' ', '-') + "'"
-	query = parser.parse(text)
-	filterTerm = Term('alpha2', alpha2) if alpha2 else None
-	with ix.searcher() as searcher:
-		results = searcher.search(query, limit=None, filter=filterTerm)
-		for hit in results:
-			yield {
-				'lat': float(hit['lat']),
-				'lon': float(hit['lon']),
-				'locality': hit['name'],
-			}
-
-def geocode(settlement, alpha2=None):
+	searcher = searcher or _searchers.get().searcher()
+	generation = searcher.reader().generation()
+	query = parseCache.parse(_parser.get(), text, generation)
+	filters = [Term('alpha2', alpha2)] if alpha2 else []
+	if minPopulation:
+		if 'population' not in searcher.schema:
+			raise ValueError('the geoindex lacks the populations of the '
+				'settlements, rebuild it to use minPopulation')
+		filters.append(NumericRange('population', minPopulation, None))
+	filterQuery = And(filters) if filters else None
+	if bestPerCountry and filterQuery is not None:
+		# whoosh does not collapse filtered results, so restrict the query
+		# itself by a constant scoring query keeping the order of the hits
+		query = And([query, ConstantScoreQuery(filterQuery)])
+		filterQuery = None
+	results = searcher.search(query, limit=limit, filter=filterQuery,
+		collapse='alpha2' if bestPerCountry else None)
+	for hit in results:
+		yield GeoRecord(
+			lat=float(hit['lat']),
+			lon=float(hit['lon']),
+			locality=sys.intern(hit['name']),
+		)
+
+def _fuzzyGeocodeAll(lower, alpha2, options):
+	maxDistance = min(fuzzyDistance, len(lower) // 4)
+	matches = _deletions.get().search(lower, maxDistance) if maxDistance else []
+	if matches:
+		cities = _gazetteer.get()
+		slots, distances = zip(*matches)
+		ids = cities.lookupSlots(slots, distances, alpha2)
+		yield from _records(cities, cities.select(ids, *options))
+
+def fuzzyGeocodeAll(settlement, alpha2=None, limit=None, minPopulation=0,
+		bestPerCountry=False):
+	'''
+	Yield the geographical coordinates of all settlements having a name
+	variant within a small Levenshtein distance of a given settlement
+	name, so that misspelled names like 'Muenchen' or 'Zuerich' and
+	names garbled by OCR are found. The settlements are yielded in
+	ascending order of the distance and descending order of their
+	population. Names of 4 to 7 characters may be one edit apart, longer
+	names fuzzyDistance edits, shorter names find nothing.
+	
+	The name variants of the gazetteer are looked up in a deletion index,
+	see deletions.DeletionIndex, which is built on first use.
+	
+	:param settlement: the misspelled settlement name to search for
+	:param alpha2: the country to restrict search results to
+	:param limit: the maximum number of settlements or None for all
+	:param minPopulation: the minimum population of the settlements
+	:param bestPerCountry: whether to yield only the best settlement of
+		every country
+	'''
+	if settlement:
+		lower = ' '.join(settlement.lower().split())
+		options = limit, minPopulation, bool(bestPerCountry)
+		yield from _fuzzyGeocodeAll(lower, alpha2, options)
+
+def geocodeMany(settlements, alpha2s=None, searcher=None, fuzzy=False,
+		limit=None, minPopulation=0, bestPerCountry=False):
+	'''
+	Return a list of all geographical coordinates of every given
+	settlement name, see geocodeAll. The settlements are searched with a
+	single searcher and every distinct pair of a normalised name and a
+	country is searched only once. Without a cache, the gazetteer backend
+	looks up the names one after another and reads the settlements of
+	all names at once.
+	
+	:param settlements: an iterable of settlement names
+	:param alpha2s: an iterable of the countries to restrict the search
+		results of the settlements to or None for no restrictions
+	:param searcher: the searcher to use instead of the shared one
+	:param fuzzy: whether to fall back to fuzzyGeocodeAll if nothing is found
+	:param limit: the maximum number of settlements per name or None for all
+	:param minPopulation: the minimum population of the settlements
+	:param bestPerCountry: whether to return only the best settlement of
+		every country per name
+	'''
+	settlements = list(settlements)
+	if alpha2s is None:
+		alpha2s = [None] * len(settlements)
+	if searcher is None and backend == 'whoosh' and any(settlements):
+		searcher = _searchers.get().searcher()
+	located = {}
+	if backend == 'gazetteer' and resultCache is None:
+		options = limit, minPopulation, bool(bestPerCountry)
+		located = _lookupMany(settlements, alpha2s, fuzzy, options)
+	found = {}
+	results = []
+	for settlement, alpha2 in zip(settlements, alpha2s):
+		if not settlement:
+			results.append([])
+			continue
+		key = ' '.join(settlement.lower().split()), alpha2
+		try:
+			records = found.get(key)
+		except TypeError:
+			# unhashable parameters are searched every time
+			key, records = None, None
+		if records is None:
+			if key in located:
+				records = located[key]
+			else:
+				records = list(geocodeAll(key[0] if key else settlement, alpha2,
+					searcher, fuzzy, limit, minPopulation, bestPerCountry))
+			if key is not None:
+				found[key] = records
+		else:
+			records = [record.copy() for record in records]
+		results.append(records)
+	return results
+
+def _lookupMany(settlements, alpha2s, fuzzy, options):
+	# return the records of every distinct pair of a normalised name and a
+	# country found in the gazetteer, the records of all names are read at
+	# once instead of one settlement at a time
+	cities = _gazetteer.get()
+	keys, found = [], []
+	seen = set()
+	for settlement, alpha2 in zip(settlements, alpha2s):
+		if not settlement:
+			continue
+		key = ' '.join(settlement.lower().split()), alpha2
+		try:
+			if key in seen:
+				continue
+		except TypeError:
+			# unhashable parameters are searched by geocodeAll
+			continue
+		seen.add(key)
+		lower = key[0]
+		ids = cities.lookup([lower, lower.replace(' ', '-')], alpha2)
+		keys.append(key)
+		found.append(cities.select(ids, *options))
+	if not keys:
+		return {}
+	records = _records(cities, np.concatenate(found))
+	results = {}
+	for key, ids in zip(keys, found):
+		results[key] = list(itertools.islice(records, len(ids)))
+		if fuzzy and not len(ids):
+			results[key] = list(_fuzzyGeocodeAll(*key, options))
+	return results
+
+def geocode(settlement, alpha2=None, fuzzy=False, minPopulation=0):
 	'''
 	Get the most accurate geographical coordinate of a given settlement
 	name, optionally restricting search results to a specified country.
+	Only the best settlement is searched, see geocodeAll.
 	
 	:param settlement: the settlement name to search for
 	:param alpha2: the country to restrict search results to
+	:param fuzzy: whether to fall back to fuzzyGeocodeAll if nothing is found
+	:param minPopulation: the minimum population of the settlement
 	'''
 	try:
-		return next(geocodeAll(settlement, alpha2))
+		return next(geocodeAll(settlement, alpha2, fuzzy=fuzzy, limit=1,
+			minPopulation=minPopulation))
 	except StopIteration:
 		return
+
+def useBackend(name):
+	'''
+	Select the backend used to search for settlements. The default backend
+	'whoosh' searches the geoindex on disk and ranks the settlements by
+	their score. The backend 'gazetteer' looks up the name variants in the
+	gazetteer, see loadGazetteer, ranking the settlements by their
+	population. Both backends find the same settlements.
+	
+	:param name: either 'whoosh' or 'gazetteer'
+	'''
+	global backend
+	if name not in ('whoosh', 'gazetteer'):
+		raise ValueError('unknown backend {!r}'.format(name))
+	backend = name
+
+def unitVectors(lat, lon):
+	'''
+	Return the points of the unit sphere of the given coordinates as an
+	array of shape (points, 3), so that the Euclidean distance of two
+	points grows with their great-circle distance.
+	
+	:param lat: an array of latitudes
+	:param lon: an array of longitudes
+	'''
+	lat = np.radians(np.asarray(lat, dtype=np.float64))
+	lon = np.radians(np.asarray(lon, dtype=np.float64))
+	cosLat = np.cos(lat)
+	return np.stack([cosLat * np.cos(lon), cosLat * np.sin(lon), np.sin(lat)],
+		axis=-1)
+
+def _gazetteerSource():
+	# the binary gazetteer written by setup.py or else the GeoNames file
+	if os.path.exists(gazetteerPath):
+		return gazetteerPath
+	return citiesPath
+
+def loadGazetteer():
+	'''
+	Return the gazetteer of the settlements. The binary gazetteer built
+	by setup.py is memory-mapped, see gazetteer.Gazetteer.load, if it is
+	missing the gazetteer is built from the GeoNames file.
+	'''
+	from .gazetteer import Gazetteer, readGeoNames
+	path = _gazetteerSource()
+	if path == gazetteerPath:
+		return Gazetteer.load(path)
+	return Gazetteer(readGeoNames(path))
+
+def loadTree():
+	'''
+	Return the k-d tree of the unit vectors of the settlements of the
+	gazetteer, see unitVectors. The tree is built once and saved in the
+	data folder, it is built again whenever the source of the gazetteer
+	changes or the saved tree can not be read. If the tree can not be
+	saved, it is built on every first use.
+	'''
+	from .kdtree import KDTree
+	cities = _gazetteer.get()
+	stat = os.stat(_gazetteerSource())
+	token = [stat.st_size, stat.st_mtime]
+	try:
+		tree = KDTree.load(treePath)
+		if tree.token == token:
+			return tree
+	except (OSError, ValueError, KeyError, EOFError, BadZipFile):
+		pass
+	tree = KDTree(unitVectors(cities.lat, cities.lon))
+	try:
+		tree.save(treePath, token)
+	except OSError:
+		pass
+	return tree
+
+def loadDeletions():
+	'''
+	Return the deletion index of the name variants of the gazetteer, see
+	deletions.DeletionIndex.
+	'''
+	from .deletions import DeletionIndex
+	return DeletionIndex(list(_gazetteer.get().slots))
+
+def nearestSettlements(lat, lon, k=1):
+	'''
+	Return the city ids of the k nearest settlements of every given
+	coordinate in ascending order of their great-circle distance along
+	with the distances in kilometres as two arrays of shape (points, k).
+	The coordinates are searched at once using the k-d tree of the
+	gazetteer. Missing settlements, e.g. of invalid coordinates, have the
+	id -1 and an infinite distance. The settlements are described by the
+	arrays of the gazetteer, see gazetteer.Gazetteer.
+	
+	:param lat: an array or a sequence of latitudes
+	:param lon: an array or a sequence of longitudes
+	:param k: the number of settlements per coordinate
+	'''
+	points = unitVectors(lat, lon).reshape(-1, 3)
+	valid = np.isfinite(points).all(axis=1)
+	chords = np.full((len(points), k), np.inf)
+	ids = np.full((len(points), k), -1, dtype=np.int64)
+	chords[valid], ids[valid] = _tree.get().query(points[valid], k)
+	distances = 2 * earthRadius * np.arcsin(np.minimum(chords / 2, 1))
+	distances[ids < 0] = np.inf
+	return ids, distances
+
+def reverseGeocodeMany(lat, lon, k=1):
+	'''
+	Return a list of the k nearest settlements of every given coordinate
+	in ascending order of their great-circle distance, see reverseGeocode.
+	Invalid coordinates have no nearest settlements. Use
+	nearestSettlements to get arrays instead of records.
+	
+	:param lat: an array or a sequence of latitudes
+	:param lon: an array or a sequence of longitudes
+	:param k: the number of settlements per coordinate
+	'''
+	cities = _gazetteer.get()
+	ids, distances = nearestSettlements(lat, lon, k)
+	found = ids >= 0
+	cityIds = ids[found]
+	# look up the countries once per country code instead of once per record
+	codes, inverse = np.unique(cities.alpha2[cityIds], return_inverse=True)
+	countries = _countries.get()[0]
+	codes = [sys.intern(alpha2) for alpha2 in codes.tolist()]
+	countryNames = [countries.get(alpha2) for alpha2 in codes]
+	places = zip(cities.lat[cityIds].tolist(), cities.lon[cityIds].tolist(),
+		cities.localities(cityIds), inverse.tolist(),
+		distances[found].tolist())
+	records = []
+	for lat, lon, locality, code, km in places:
+		records.append(PlaceRecord(lat=lat, lon=lon, locality=locality,
+			country=countryNames[code], alpha2=codes[code], distance=km))
+	results = []
+	start = 0
+	for count in found.sum(axis=1).tolist():
+		results.append(records[start:start + count])
+		start += count
+	return results
+
+def reverseGeocode(lat, lon, k=1):
+	'''
+	Return a list of the k settlements nearest to the given coordinate in
+	ascending order of their great-circle distance along with their
+	country and their distance in kilometres.
+	
+	:param lat: the latitude of the coordinate
+	:param lon: the longitude of the coordinate
+	:param k: the number of settlements
+	'''
+	return reverseGeocodeMany([lat], [lon], k)[0]
+
+def _cacheToken(searcher=None):
+	# identify the data the cached settlements are read from: the source of
+	# the gazetteer, which the fuzzy fallback reads for either backend, and
+	# the segments of the geoindex if the backend searches it
+	path = _gazetteerSource()
+	try:
+		stat = os.stat(path)
+		token = [path, stat.st_ino, stat.st_size, stat.st_mtime_ns]
+	except OSError:
+		token = [path]
+	if backend == 'whoosh':
+		searcher = searcher or _searchers.get().searcher()
+		token.append(indexToken(searcher.reader()))
+	return token
+
+def enableCache(maxsize=4096, path=None, diskSize=1000000):
+	'''
+	Cache the settlements found by geocodeAll in memory, discarding the
+	least recently used results once more than maxsize queries are
+	cached. If a path is given, the results are persisted in a SQLite
+	database as well, which keeps at most diskSize queries and is shared
+	by every process using the same path. Queries finding nothing are
+	cached too. Both caches are cleared whenever the data searched by the
+	backend changes, i.e. the geoindex or the gazetteer is rebuilt.
+	
+	Queries are identified by their case and whitespace normalised
+	settlement name, their country, the backend, see useBackend, whether
+	they fall back to fuzzyGeocodeAll and the options restricting the
+	settlements.
+	
+	:param maxsize: the maximum number of queries cached in memory
+	:param path: the path of the database or None to cache in memory only
+	:param diskSize: the maximum number of queries cached in the database
+	'''
+	global resultCache, diskCache
+	disableCache()
+	resultCache = LRUCache(maxsize)
+	if path is not None:
+		diskCache = DiskCache(path, diskSize)
+
+def disableCache():
+	'''
+	Disable and discard the in-memory cache of geocodeAll results and close
+	the database of the on-disk cache without removing it.
+	'''
+	global resultCache, diskCache
+	if diskCache is not None:
+		diskCache.close()
+	resultCache = diskCache = None
+
+def cacheInfo():
+	'''
+	Return the number of hits, misses and evictions along with the size
+	of the in-memory cache of geocodeAll results and those of the on-disk
+	cache as the value of 'disk' or None if the cache is disabled.
+	'''
+	cache, disk = resultCache, diskCache
+	if cache is not None:
+		info = cache.info()
+		info['disk'] = disk.info() if disk is not None else None
+		return info
+
+def parseCacheInfo():
+	'''
+	Return the number of hits, misses and evictions along with the size
+	of the cache of parsed settlement queries, the time spent parsing and
+	the estimated time saved by the cache in seconds.
+	'''
+	return parseCache.info()
@@ -0,0 +1,262 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Module to find the nearest neighbours of batches of points.'''
+
+import math
+import os
+
+import numpy as np
+
+class KDTree():
+	'''
+	A balanced k-d tree answering batches of k nearest neighbour queries
+	with vectorised NumPy operations instead of a loop per point.
+	
+	The tree is complete: the children of the n-th node are the nodes
+	2n + 1 and 2n + 2 and the leaves divide the points into nearly equally
+	sized groups. Every node keeps the bounding box of its points, every
+	inner node the dimension and the value splitting its points between
+	its children. The points of the leaves are kept in a padded array of
+	shape (leaves, leafsize, dimensions) whose padding is infinitely far
+	away from every point.
+	
+	A batch of queries descends to the leaves of its points at first,
+	whose k-th nearest neighbours bound the distances to the neighbours.
+	The queries then descend again visiting only the nodes whose bounding
+	boxes are within these bounds.
+	
+	:param points: an array of the points of shape (size, dimensions)
+	:param leafsize: the maximum number of points of a leaf
+	'''
+	
+	def __init__(self, points, leafsize=32):
+		points = np.asarray(points, dtype=np.float64)
+		size, dims = points.shape
+		self.depth = max(0, math.ceil(math.log2(max(1, size / leafsize))))
+		leaves = 2 ** self.depth
+		nodes = 2 * leaves - 1
+		bounds = np.linspace(0, size, leaves + 1).round().astype(np.int64)
+		order = np.arange(size)
+		self.splitDim = np.zeros(leaves - 1, dtype=np.int64)
+		self.splitVal = np.zeros(leaves - 1)
+		self.counts = np.zeros(nodes, dtype=np.int64)
+		self.lo = np.full((nodes, dims), np.inf)
+		self.hi = np.full((nodes, dims), -np.inf)
+		for node in range(nodes):
+			level = int(math.log2(node + 1))
+			width = leaves >> level
+			first = (node + 1 - (1 << level)) * width
+			start, end = bounds[first], bounds[first + width]
+			self.counts[node] = end - start
+			if start == end:
+				continue
+			members = points[order[start:end]]
+			self.lo[node] = members.min(axis=0)
+			self.hi[node] = members.max(axis=0)
+			if node >= leaves - 1:
+				continue
+			# split at the median of the dimension of the widest extent
+			dim = int(np.argmax(self.hi[node] - self.lo[node]))
+			mid = bounds[first + width // 2]
+			self.splitDim[node] = dim
+			if start < mid < end:
+				part = np.argpartition(members[:, dim], mid - start)
+				order[start:end] = order[start:end][part]
+				self.splitVal[node] = points[order[mid], dim]
+			else:
+				self.splitVal[node] = np.inf if mid == end else -np.inf
+		counts = np.diff(bounds)
+		width = max(1, int(counts.max()))
+		self.leafIds = np.full((leaves, width), -1, dtype=np.int64)
+		self.leafPoints = np.full((leaves, width, dims), np.inf)
+		for leaf in range(leaves):
+			ids = order[bounds[leaf]:bounds[leaf + 1]]
+			self.leafIds[leaf, :len(ids)] = ids
+			self.leafPoints[leaf, :len(ids)] = points[ids]
+		self.size = size
+		self.token = None
+		self._regions()
+	
+	def __len__(self):
+		return self.size
+	
+	@classmethod
+	def load(cls, path):
+		'''
+		Load a tree saved by save.
+		
+		:param path: the path of the file
+		'''
+		tree = cls.__new__(cls)
+		with np.load(path) as data:
+			for name in ('splitDim', 'splitVal', 'counts', 'lo', 'hi',
+					'leafIds', 'leafPoints'):
+				setattr(tree, name, data[name])
+			tree.depth = int(data['depth'])
+			tree.size = int(data['size'])
+			tree.token = data['token'].tolist()
+		tree._regions()
+		return tree
+	
+	def save(self, path, token=None):
+		'''
+		Save the tree to a NumPy .npz file along with a token identifying
+		the points, which is available as the attribute token of the
+		loaded tree. The file is replaced at once, so that an interrupted
+		save or several processes saving at once never leave a truncated
+		file behind.
+		
+		:param path: the path of the file
+		:param token: a list of numbers identifying the points
+		'''
+		temp = '{}.{}.tmp'.format(path, os.getpid())
+		try:
+			with open(temp, 'wb') as f:
+				np.savez(f, splitDim=self.splitDim, splitVal=self.splitVal,
+					counts=self.counts, lo=self.lo, hi=self.hi,
+					leafIds=self.leafIds, leafPoints=self.leafPoints,
+					depth=self.depth, size=self.size,
+					token=np.array(token if token is not None else []))
+			os.replace(temp, path)
+		except BaseException:
+			try:
+				os.remove(temp)
+			except OSError:
+				pass
+			raise
+		self.token = token
+	
+	def _regions(self):
+		# derive the region of every node from the splits of its ancestors
+		nodes, dims = self.lo.shape
+		self.cellLo = np.full((nodes, dims), -np.inf)
+		self.cellHi = np.full((nodes, dims), np.inf)
+		for node, (dim, value) in enumerate(zip(self.splitDim, self.splitVal)):
+			for child in (2 * node + 1, 2 * node + 2):
+				self.cellLo[child] = self.cellLo[node]
+				self.cellHi[child] = self.cellHi[node]
+			self.cellHi[2 * node + 1, dim] = value
+			self.cellLo[2 * node + 2, dim] = value
+	
+	def _leaves(self, points):
+		# descend to the leaves whose regions contain the points
+		node = np.zeros(len(points), dtype=np.int64)
+		rows = np.arange(len(points))
+		for _ in range(self.depth):
+			right = points[rows, self.splitDim[node]] > self.splitVal[node]
+			node = 2 * node + 1 + right
+		return node - (len(self.splitDim))
+	
+	def _nearest(self, points, queries, leaves, k):
+		# return the k nearest squared distances and ids of every pair of a
+		# query and a leaf
+		diff = self.leafPoints[leaves] - points[queries, np.newaxis]
+		dist = np.einsum('ijk,ijk->ij', diff, diff)
+		ids = self.leafIds[leaves]
+		if k < dist.shape[1]:
+			part = np.argpartition(dist, k - 1, axis=1)[:, :k]
+			dist = np.take_along_axis(dist, part, axis=1)
+			ids = np.take_along_axis(ids, part, axis=1)
+		return dist, ids
+	
+	def _boxDistances(self, points, queries, nodes):
+		# return the squared distances between the points and the nearest
+		# and the farthest points of the boxes
+		point = points[queries]
+		lo, hi = self.lo[nodes] - point, point - self.hi[nodes]
+		gap = np.maximum(lo, 0) + np.maximum(hi, 0)
+		span = np.maximum(-lo, -hi)
+		return (np.einsum('ij,ij->i', gap, gap),
+			np.einsum('ij,ij->i', span, span))
+	
+	def query(self, points, k=1, batchsize=65536):
+		'''
+		Return the Euclidean distances and the ids of the k nearest
+		neighbours of every point as arrays of shape (points, k) in
+		ascending order of the distances. Missing neighbours have an
+		infinite distance and the id -1.
+		
+		:param points: an array of the query points of shape (points,
+			dimensions)
+		:param k: the number of neighbours
+		:param batchsize: the number of points queried at once
+		'''
+		points = np.asarray(points, dtype=np.float64)
+		dists = np.full((len(points), k), np.inf)
+		ids = np.full((len(points), k), -1, dtype=np.int64)
+		for start in range(0, len(points), batchsize):
+			end = start + batchsize
+			dists[start:end], ids[start:end] = self._query(
+				points[start:end], k)
+		return dists, ids
+	
+	def _query(self, points, k):
+		size = len(points)
+		# the leaves of the smallest subtree around the leaf of every point
+		# holding at least k points bound the distances to the neighbours
+		minimum = int(self.counts[len(self.splitDim):].min())
+		up = 0
+		while up < self.depth and minimum << up < k:
+			up += 1
+		span = 1 << up
+		group = self._leaves(points) // span
+		queries = np.repeat(np.arange(size), span)
+		leaves = group[queries] * span + np.tile(np.arange(span), size)
+		dist, ids = self._nearest(points, queries, leaves, k)
+		homeDist, homeIds = self._merge(size, k,
+			np.repeat(queries, dist.shape[1]), dist.ravel(), ids.ravel())
+		bound = homeDist[:, -1]
+		# visit the other leaves whose boxes are within the bounds unless
+		# the neighbours are closer than the borders of the home region
+		home = group + (len(self.splitDim) + 1 >> up) - 1
+		margin = np.minimum(points - self.cellLo[home],
+			self.cellHi[home] - points).min(axis=1)
+		queries = np.flatnonzero(~(margin * np.abs(margin) > bound))
+		nodes = np.zeros(len(queries), dtype=np.int64)
+		for _ in range(self.depth):
+			queries = np.repeat(queries, 2)
+			nodes = 2 * np.repeat(nodes, 2) + np.tile([1, 2], len(nodes))
+			near, far = self._boxDistances(points, queries, nodes)
+			# the k nearest neighbours are at most as far away as the
+			# farthest corner of a box holding at least k points, the bound
+			# is widened to keep rounding errors from pruning the box
+			full = self.counts[nodes] >= k
+			np.minimum.at(bound, queries[full], far[full] * (1 + 1e-9))
+			keep = near <= bound[queries]
+			queries, nodes = queries[keep], nodes[keep]
+		leaves = nodes - len(self.splitDim)
+		keep = leaves // span != group[queries]
+		queries, leaves = queries[keep], leaves[keep]
+		dist, ids = self._nearest(points, queries, leaves, k)
+		dist, ids = self._merge(size, k,
+			np.concatenate([np.repeat(np.arange(size), k),
+				np.repeat(queries, dist.shape[1])]),
+			np.concatenate([homeDist.ravel(), dist.ravel()]),
+			np.concatenate([homeIds.ravel(), ids.ravel()]))
+		return np.sqrt(dist), ids
+	
+	def _merge(self, size, k, queries, dist, ids):
+		# return the k nearest squared distances and ids of every query out
+		# of the candidate neighbours, one candidate per array element
+		order = np.lexsort((ids, dist, queries))
+		queries, dist, ids = queries[order], dist[order], ids[order]
+		starts = np.searchsorted(queries, np.arange(size))
+		rank = np.arange(len(queries)) - starts[queries]
+		keep = (rank < k) & (ids >= 0)
+		resultDist = np.full((size, k), np.inf)
+		resultIds = np.full((size, k), -1, dtype=np.int64)
+		resultDist[queries[keep], rank[keep]] = dist[keep]
+		resultIds[queries[keep], rank[keep]] = ids[keep]
+		return resultDist, resultIds
@@ -0,0 +1,189 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Module providing a service to search for institutions concurrently.'''
+
+from concurrent.futures import ThreadPoolExecutor
+
+from whoosh import index
+
+from . import core, geo
+from .pool import SearcherPool
+from .shards import ShardedIndex
+
+class Matcher():
+	'''
+	Search for institutions and settlements using a pool of worker
+	threads. The matcher opens its own institution and settlement indices
+	along with the shards of the institution index and hands out one
+	searcher per thread and index, the query parsers are created for every
+	thread, see core.query. The in-memory indices derived from the
+	institution index are shared with the functions of the core module.
+	
+	A matcher is a context manager closing its threads and searchers on
+	exit.
+	
+	:param workers: the number of worker threads, by default the number
+		chosen by concurrent.futures.ThreadPoolExecutor
+	'''
+	
+	def __init__(self, workers=None):
+		self.ix = index.open_dir(core.ixPath)
+		self.searchers = SearcherPool(self.ix)
+		self.shards = ShardedIndex(core.ixPath, self.searchers.searcher)
+		self.geoIx = index.open_dir(geo.ixPath)
+		self.geoSearchers = SearcherPool(self.geoIx)
+		self.executor = ThreadPoolExecutor(workers)
+	
+	def __enter__(self):
+		return self
+	
+	def __exit__(self, *exc_info):
+		self.close()
+	
+	def close(self):
+		'''Wait for the submitted searches, close the threads and searchers.'''
+		self.executor.shutdown()
+		self.shards.close()
+		self.searchers.close()
+		self.geoSearchers.close()
+	
+	def findAll(self, institution, alpha2=None, lat=None, lon=None, offset=0.4,
+			limit=None, fuzzy=False):
+		'''
+		Yield all institutions compatible with the search parameters in the
+		calling thread, see core.findAll. The results are not cached.
+		
+		:param institution: the institution name to search for
+		:param alpha2: the country to restrict search results to
+		:param lat: the latitude describing the middle of the preferred box
+		:param lon: the longitude describing the middle of preferred box
+		:param offset: the half-width of the preferred box in degree of arcs
+		:param limit: the maximum number of results or None for all results
+		:param fuzzy: whether to fall back to fuzzyQuery if nothing is found
+		'''
+		searcher = self.searchers.searcher()
+		yield from core._findAll(institution, alpha2, lat, lon, offset, limit,
+			fuzzy, searcher, self.shards)
+	
+	def find(self, institution, alpha2=None, lat=None, lon=None, offset=0.4,
+			fuzzy=False):
+		'''
+		Find the most accurate institution compatible with the search
+		parameters in the calling thread, see core.find. The results are
+		not cached.
+		
+		:param institution: the institution name to search for
+		:param alpha2: the country to restrict search results to
+		:param lat: the latitude describing the middle of the preferred box
+		:param lon: the longitude describing the middle of preferred box
+		:param offset: the half-width of the preferred box in degree of arcs
+		:param fuzzy: whether to fall back to fuzzyQuery if nothing is found
+		'''
+		searcher = self.searchers.searcher()
+		inst = core.exactMatch(institution, alpha2, lat, lon, offset, searcher)
+		core._countExact(inst is not None)
+		if inst is not None:
+			return inst
+		results = core._findAll(institution, alpha2, lat, lon, offset, 1, fuzzy,
+			searcher, self.shards)
+		return next(results, None)
+	
+	def geocodeAll(self, settlement, alpha2=None, fuzzy=False, limit=None,
+			minPopulation=0, bestPerCountry=False):
+		'''
+		Yield all geographical coordinates of a given settlement name in
+		the calling thread, see geo.geocodeAll.
+		
+		:param settlement: the settlement name to search for
+		:param alpha2: the country to restrict search results to
+		:param fuzzy: whether to fall back to geo.fuzzyGeocodeAll if nothing
+			is found
+		:param limit: the maximum number of settlements or None for all
+		:param minPopulation: the minimum population of the settlements
+		:param bestPerCountry: whether to yield only the best settlement of
+			every country
+		'''
+		searcher = self.geoSearchers.searcher()
+		yield from geo.geocodeAll(settlement, alpha2, searcher, fuzzy, limit,
+			minPopulation, bestPerCountry)
+	
+	def geocodeMany(self, settlements, alpha2s=None, fuzzy=False, limit=None,
+			minPopulation=0, bestPerCountry=False):
+		'''
+		Return a list of all geographical coordinates of every given
+		settlement name in the calling thread, see geo.geocodeMany.
+		
+		:param settlements: an iterable of settlement names
+		:param alpha2s: an iterable of the countries to restrict the search
+			results of the settlements to or None for no restrictions
+		:param fuzzy: whether to fall back to geo.fuzzyGeocodeAll if nothing
+			is found
+		:param limit: the maximum number of settlements per name or None
+			for all
+		:param minPopulation: the minimum population of the settlements
+		:param bestPerCountry: whether to return only the best settlement of
+			every country per name
+		'''
+		searcher = self.geoSearchers.searcher()
+		return geo.geocodeMany(settlements, alpha2s, searcher, fuzzy, limit,
+			minPopulation, bestPerCountry)
+	
+	def geocode(self, settlement, alpha2=None, fuzzy=False, minPopulation=0):
+		'''
+		Get the most accurate geographical coordinate of a given settlement
+		name in the calling thread, see geo.geocode.
+		
+		:param settlement: the settlement name to search for
+		:param alpha2: the country to restrict search results to
+		:param fuzzy: whether to fall back to geo.fuzzyGeocodeAll if nothing
+			is found
+		:param minPopulation: the minimum population of the settlement
+		'''
+		return next(self.geocodeAll(settlement, alpha2, fuzzy, 1,
+			minPopulation), None)
+	
+	def submit(self, institution, alpha2=None, lat=None, lon=None, offset=0.4,
+			fuzzy=False):
+		'''
+		Search for the most accurate institution compatible with the search
+		parameters in a worker thread and return a concurrent.futures.Future
+		of the institution or None, see find.
+		
+		:param institution: the institution name to search for
+		:param alpha2: the country to restrict search results to
+		:param lat: the latitude describing the middle of the preferred box
+		:param lon: the longitude describing the middle of preferred box
+		:param offset: the half-width of the preferred box in degree of arcs
+		:param fuzzy: whether to fall back to fuzzyQuery if nothing is found
+		'''
+		return self.executor.submit(
+			self.find, institution, alpha2, lat, lon, offset, fuzzy)
+	
+	def map(self, queries, fuzzy=False):
+		'''
+		Yield the most accurate institution for every query of the iterable
+		in the order of the queries, searching them concurrently in the
+		worker threads. A query is either an institution name or a tuple of
+		the parameters of the find function in the same order, see
+		core.findMany.
+		
+		:param queries: an iterable of institution names or parameter tuples
+		:param fuzzy: whether to fall back to fuzzyQuery if nothing is found
+		'''
+		def find(params):
+			if not isinstance(params, (tuple, list)):
+				params = (params,)
+			return self.find(*params, fuzzy=fuzzy)
+		return self.executor.map(find, queries)
@@ -0,0 +1,74 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Module to look up documents by their exact normalised names.'''
+
+from whoosh.analysis import CharsetFilter, LowercaseFilter, RegexTokenizer
+from whoosh.support.charset import accent_map
+import numpy as np
+
+from .store import indexToken
+
+# the tokenizer and the accent folding of the index analyzer without
+# removing stop words and stemming, which would merge different names
+normalizer = RegexTokenizer() | LowercaseFilter() | CharsetFilter(accent_map)
+
+def normalize(text):
+	'''
+	Return the lower case words of the text without accents separated by
+	single spaces, ignoring punctuation.
+	
+	:param text: the text to normalise
+	'''
+	return ' '.join(token.text for token in normalizer(text))
+
+class NameIndex():
+	'''
+	Map the normalised names and the normalised aliases of every document
+	of an index to the ascending arrays of the numbers of the documents
+	having the name or alias.
+	
+	:param reader: the index reader to load the stored fields from
+	'''
+	
+	def __init__(self, reader):
+		self.token = indexToken(reader)
+		names, aliases = {}, {}
+		for docnum, fields in reader.iter_docs():
+			name = normalize(fields['name'])
+			if name:
+				names.setdefault(name, []).append(docnum)
+			known = {'', name}
+			for alias in (fields.get('alias') or '').split(';'):
+				alias = normalize(alias)
+				if alias not in known:
+					known.add(alias)
+					aliases.setdefault(alias, []).append(docnum)
+		self.names = {name: np.array(docnums, dtype=np.int64)
+			for name, docnums in names.items()}
+		self.aliases = {alias: np.array(docnums, dtype=np.int64)
+			for alias, docnums in aliases.items()}
+		self.empty = np.zeros(0, dtype=np.int64)
+	
+	def lookup(self, text):
+		'''
+		Return the array of the numbers of the documents whose name equals
+		the text once both are normalised and the array of the numbers of
+		the documents whose alias equals the text.
+		
+		:param text: the name to look up
+		'''
+		text = normalize(text)
+		return (self.names.get(text, self.empty),
+			self.aliases.get(text, self.empty))
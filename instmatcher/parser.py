@@ -14,40 +14,60 @@
 
 '''Module to parse an affiliation string using grobid.'''
 
-import requests
 import xml.etree.ElementTree as et
 import csv
-from pkg_resources import resource_filename
 import re
+import threading
 from urllib.parse import quote_plus
 
-# generate two dictionaries mapping the ISO 3166-1 alpha-2 country codes to
-# the corresponding country names and to the corresponding population sizes
-countryDict, populationDict = {}, {}
-countryInfo = resource_filename(__name__, 'data/countryInfo.txt')
-with open(countryInfo) as csvfile:
-	data = filter(lambda row: not row[0].startswith('#'), csvfile)
-	reader = csv.reader(data, delimiter='\t', quoting=csv.QUOTE_NONE)
-	for row in reader:
-		countryDict[row[0]] = row[4]
-		populationDict[row[0]] = int(row[7])
-
-# create a list of country code and country tuples
-countryList = list(countryDict.items())
-# add alternative country names
-altCountries = resource_filename(__name__, 'data/alternativeCountryNames.csv')
-with open(altCountries) as csvfile:
-	reader = csv.reader(csvfile)
-	for row in reader:
-		countryList.append((row[0], row[1]))
-# sort the list by the population size
-countryList.sort(key=lambda item: populationDict[item[0]], reverse=True)
-# move country names which contain a part of another country name before these
-# countries in order to avoid false assignments when extracting them
-for i in range(len(countryList)):
-	for j in range(i + 1, len(countryList)):
-		if countryList[i][1] in countryList[j][1]:
-			countryList.insert(i, countryList.pop(j))
+from .records import ParseRecord
+from .resources import dataPath, Lazy, moduleGetattr
+
+def loadCountries():
+	'''
+	Return two dictionaries mapping the ISO 3166-1 alpha-2 country codes to
+	the corresponding country names and to the corresponding population
+	sizes along with a list of country code and country name tuples
+	including alternative country names.
+	
+	The list is sorted by the population size of the countries, country
+	names which contain a part of another country name are moved before
+	these countries in order to avoid false assignments when extracting
+	them.
+	'''
+	countryDict, populationDict = {}, {}
+	with open(dataPath('countryInfo.txt')) as csvfile:
+		data = filter(lambda row: not row[0].startswith('#'), csvfile)
+		reader = csv.reader(data, delimiter='\t', quoting=csv.QUOTE_NONE)
+		for row in reader:
+			countryDict[row[0]] = row[4]
+			populationDict[row[0]] = int(row[7])
+	
+	# create a list of country code and country tuples
+	countryList = list(countryDict.items())
+	# add alternative country names
+	with open(dataPath('alternativeCountryNames.csv')) as csvfile:
+		reader = csv.reader(csvfile)
+		for row in reader:
+			countryList.append((row[0], row[1]))
+	# sort the list by the population size
+	countryList.sort(key=lambda item: populationDict[item[0]], reverse=True)
+	# move country names which contain a part of another country name before
+	# these countries
+	for i in range(len(countryList)):
+		for j in range(i + 1, len(countryList)):
+			if countryList[i][1] in countryList[j][1]:
+				countryList.insert(i, countryList.pop(j))
+	return countryDict, populationDict, countryList
+
+# the country tables are loaded on first use and available as module
+# attributes of the same name
+_countries = Lazy(loadCountries)
+__getattr__ = moduleGetattr(__name__, {
+	'countryDict': Lazy(lambda: _countries.get()[0]),
+	'populationDict': Lazy(lambda: _countries.get()[1]),
+	'countryList': Lazy(lambda: _countries.get()[2]),
+})
 
 def parseAddress(affiliation, root, patternHK=re.compile(r'\b(?i)Hong Kong\b'),
 		patternMO=re.compile(r'\b(?i)Macao\b')):
@@ -62,6 +82,7 @@ def parseAddress(affiliation, root, patternHK=re.compile(r'\b(?i)Hong Kong\b'),
 	:param patternMO: the pattern to search for Macao
 	'''
 	result = {}
+	countryDict, populationDict, countryList = _countries.get()
 	
 	# extract the country code
 	for alpha2, country in countryList:
@@ -201,45 +222,155 @@ def parseOrganisations(affiliation, root, pattern=re.compile(r'^[^,]+(?=,)')):
 	
 	return result
 
+class GrobidError(Exception):
+	'''The error raised if the grobid service responds with an error.'''
+
+class GrobidClient():
+	'''
+	A client of a grobid service sending its requests through a session
+	which keeps the connections to the service alive in a pool, so that
+	consecutive requests skip the TCP and TLS handshakes. The session is
+	shared by all threads using the client, each of them taking an idle
+	connection from the pool or opening a new one.
+	
+	A client can be passed in place of the URL to parseAll, parse,
+	instmatcher.matchAll and instmatcher.match. It is a context manager
+	closing its connections on exit.
+	
+	:param url: the URL to the grobid service
+	:param poolSize: the maximum number of idle connections kept alive
+	:param connectTimeout: the seconds to wait for a connection to the
+		service or None to wait forever
+	:param readTimeout: the seconds to wait for the response of the
+		service or None to wait forever
+	:param keepAlive: whether to reuse the connections
+	'''
+	
+	def __init__(self, url='http://0.0.0.0:8080', poolSize=10,
+			connectTimeout=5, readTimeout=60, keepAlive=True):
+		# requests is imported on first use to keep importing the package fast
+		import requests
+		from requests.adapters import HTTPAdapter
+		self.url = url
+		self.timeout = (connectTimeout, readTimeout)
+		self.session = requests.Session()
+		adapter = HTTPAdapter(pool_connections=1, pool_maxsize=poolSize)
+		self.session.mount('http://', adapter)
+		self.session.mount('https://', adapter)
+		self.session.headers['Content-type'] = (
+			'application/x-www-form-urlencoded')
+		if not keepAlive:
+			self.session.headers['Connection'] = 'close'
+	
+	def __enter__(self):
+		return self
+	
+	def __exit__(self, *exc_info):
+		self.close()
+	
+	def post(self, path, data):
+		'''
+		Send a POST request to the path of the service and return the
+		response.
+		
+		:param path: the path relative to the URL of the service
+		:param data: the body of the request
+		:raises requests.Timeout: if the service does not respond in time
+		'''
+		return self.session.post(self.url + path, data=data,
+			timeout=self.timeout)
+	
+	def close(self):
+		'''
+		Close the connections of the client. Subsequent requests open new
+		connections.
+		'''
+		self.session.close()
+
+# the clients shared by all calls given the same URL instead of a client
+_clients = {}
+_clientsLock = threading.Lock()
+
+def grobidClient(url):
+	'''
+	Return the given client or the client shared by all calls given the
+	same URL, see GrobidClient.
+	
+	:param url: the URL to the grobid service or a GrobidClient
+	'''
+	if isinstance(url, GrobidClient):
+		return url
+	with _clientsLock:
+		try:
+			return _clients[url]
+		except KeyError:
+			client = _clients[url] = GrobidClient(url)
+			return client
+
+def close():
+	'''
+	Close the clients shared by all calls given the same URL. Calling any
+	function given a URL afterwards creates a new client.
+	'''
+	with _clientsLock:
+		for client in _clients.values():
+			client.close()
+		_clients.clear()
+
 def queryGrobid(affiliation, url):
 	'''
 	Try to retrieve a structured xml representation of the the
 	affiliation string using grobid.
 	
 	:param affiliation: the affiliation string to be sent to grobid
-	:param url: the URL to the grobid service
+	:param url: the URL to the grobid service or a GrobidClient
+	:raises GrobidError: if grobid responds with an error
 	'''
 	try:
 		cmd = 'affiliations=' + quote_plus(affiliation)
 	except TypeError:
 		return '<results></results>'
-	headers = {'Content-type': 'application/x-www-form-urlencoded'}
-	r = requests.post(url + '/processAffiliations', data=cmd, headers=headers)
+	r = grobidClient(url).post('/processAffiliations', cmd)
+	if not 200 <= r.status_code < 300:
+		raise GrobidError('grobid responded with {!r}'.format(
+			'{} {}'.format(r.status_code, r.reason)))
 	return '<results>' + r.content.decode('UTF-8') + '</results>'
 
-def parseAll(affiliation, url):
+def parseResults(affiliation, results):
 	'''
 	Yield all possible institutions along with their corresponding
-	departments, laboratories and address information using grobid and
-	regular expressions to parse the given affiliation string.
+	departments, laboratories and address information using the xml
+	string retrieved by queryGrobid and regular expressions to parse the
+	given affiliation string.
 	
 	:param affiliation: the affiliation string to be parsed
-	:param url: the URL to the grobid service
+	:param results: the xml string retrieved by queryGrobid
 	'''
 	try:
-		root = et.fromstring(queryGrobid(affiliation, url))
+		root = et.fromstring(results)
 	except et.ParseError:
 		return
 	organisations = parseOrganisations(affiliation, root)
 	address = parseAddress(affiliation, root)
 	settlement = parseSettlement(affiliation, root)
 	for organisation in organisations:
-		result = {}
+		result = ParseRecord()
 		result.update(organisation)
 		result.update(address)
 		result.update(settlement)
 		yield result
 
+def parseAll(affiliation, url):
+	'''
+	Yield all possible institutions along with their corresponding
+	departments, laboratories and address information using grobid and
+	regular expressions to parse the given affiliation string.
+	
+	:param affiliation: the affiliation string to be parsed
+	:param url: the URL to the grobid service or a GrobidClient
+	'''
+	yield from parseResults(affiliation, queryGrobid(affiliation, url))
+
 def parse(affiliation, url):
 	'''
 	Get the first institution along with the corresponding
@@ -247,7 +378,7 @@ def parse(affiliation, url):
 	regular expressions to parse the given affiliation string.
 	
 	:param affiliation: the affiliation string to be parsed
-	:param url: the URL to the grobid service
+	:param url: the URL to the grobid service or a GrobidClient
 	'''
 	try:
 		return next(parseAll(affiliation, url))
@@ -0,0 +1,96 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Module to cache the queries parsed by the query parsers.'''
+
+import functools
+import threading
+import time
+
+from whoosh.analysis import StemFilter
+from whoosh.lang import porter
+
+from .cache import LRUCache
+
+# the porter stemmer of the analyzers memoised by a thread-safe cache
+# shared by every parser, see memoiseStemmers
+stem = functools.lru_cache(maxsize=65536)(porter.stem)
+
+def memoiseStemmers(schema):
+	'''
+	Let the porter stemming filters of the analyzers of the schema use the
+	shared memoised stemmer instead of their own caches. Return the schema.
+	
+	:param schema: the schema whose analyzers are modified
+	'''
+	for name, field in schema.items():
+		for item in getattr(getattr(field, 'analyzer', None), 'items', ()):
+			if (isinstance(item, StemFilter) and item.stemfn is porter.stem
+					and not item.lang):
+				# StemFilter calls the cached wrapper of its stemming function
+				item._stem = stem
+	return schema
+
+class ParseCache():
+	'''
+	A thread-safe cache of bounded size mapping query strings to the
+	queries parsed from them. The cache counts the time spent parsing the
+	queries which were not cached.
+	
+	:param maxsize: the maximum number of cached queries
+	'''
+	
+	def __init__(self, maxsize):
+		self.cache = LRUCache(maxsize)
+		self.lock = threading.Lock()
+		self.parseTime = 0.0
+	
+	def parse(self, parser, text, token=None):
+		'''
+		Return the query parsed from the text by the parser, parsing the
+		text only if it is not cached. Every cached query is discarded if
+		the token differs from the token of the previous call.
+		
+		:param parser: the query parser to parse the text with on a miss
+		:param text: the query string
+		:param token: an object identifying the schema of the parser, e.g.
+			the generation of the index
+		'''
+		self.cache.validate(token)
+		query = self.cache.get(text)
+		if query is None:
+			start = time.perf_counter()
+			query = parser.parse(text)
+			elapsed = time.perf_counter() - start
+			self.cache.put(text, query)
+			with self.lock:
+				self.parseTime += elapsed
+		return query
+	
+	def clear(self):
+		'''Remove every query from the cache.'''
+		self.cache.clear()
+	
+	def info(self):
+		'''
+		Return the statistics and the size of the cache along with the time
+		spent parsing and the estimated time saved by the cache in seconds.
+		'''
+		info = self.cache.info()
+		with self.lock:
+			info['parseTime'] = self.parseTime
+		# every hit saves the mean time spent parsing a miss
+		hits, misses = info['hits'], info['misses']
+		info['savedTime'] = hits * info['parseTime'] / misses if misses else 0.0
+		return info
@@ -0,0 +1,113 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Module to share long-lived searchers of an index.'''
+
+import os
+import threading
+import time
+
+# the file systems update the modification time of a folder at a coarse
+# resolution, a folder listed within this many seconds of its last
+# modification may have been modified again without changing it
+mtimeResolution = 2
+
+class SearcherPool():
+	'''
+	Hand out one long-lived searcher of an index per thread.
+	
+	Opening a searcher reads the segment metadata and opens the segment
+	readers of the index. A pooled searcher is therefore reused by every
+	search of the same thread and only replaced when the files of the
+	index on disk change, see token. The searchers of threads
+	which have exited are closed once another thread opens a searcher.
+	
+	:param ix: the index to create searchers for
+	:param kwargs: the keyword arguments passed to the searchers
+	'''
+	
+	def __init__(self, ix, **kwargs):
+		self.ix = ix
+		self.kwargs = kwargs
+		self.local = threading.local()
+		self.lock = threading.Lock()
+		self.searchers = {}
+		self.epoch = 0
+		self.listing = None
+	
+	def token(self):
+		'''
+		Return the names of the files of the index. Every commit writes a
+		new table of contents and every rebuild writes new segments, so
+		unlike the generation, which restarts at one whenever the index is
+		created anew, the names change on every update of the index.
+		
+		The files of an index in a folder are only listed again once the
+		modification time of the folder changes or if the folder was
+		listed shortly after its modification, see mtimeResolution.
+		'''
+		storage = self.ix.storage
+		try:
+			stat = os.stat(storage.folder)
+		except (AttributeError, OSError):
+			# storages without a folder are listed on every call
+			return frozenset(storage.list())
+		key = stat.st_ino, stat.st_mtime_ns
+		listing = self.listing
+		if (listing is not None and listing[0] == key
+				and listing[1] - stat.st_mtime >= mtimeResolution):
+			return listing[2]
+		now = time.time()
+		token = frozenset(storage.list())
+		self.listing = key, now, token
+		return token
+	
+	def searcher(self):
+		'''
+		Return the searcher of the calling thread reflecting the latest
+		contents of the index. The searcher must not be closed by the
+		caller, use close instead.
+		'''
+		token = self.token()
+		local = self.local
+		searcher = getattr(local, 'searcher', None)
+		if (searcher is not None and local.epoch == self.epoch
+				and local.token == token):
+			return searcher
+		searcher = self.ix.searcher(**self.kwargs)
+		thread = threading.current_thread()
+		with self.lock:
+			# close the previous searcher of the calling thread and the
+			# searchers of the threads which have exited, whose identifiers
+			# may be reused by new threads
+			for ident, (owner, previous) in list(self.searchers.items()):
+				if owner is thread or not owner.is_alive():
+					previous.close()
+					del self.searchers[ident]
+			self.searchers[thread.ident] = thread, searcher
+			local.epoch = self.epoch
+		local.token = token
+		local.searcher = searcher
+		return searcher
+	
+	def close(self):
+		'''
+		Close every searcher handed out by this pool. Subsequent calls to
+		searcher will open new searchers.
+		'''
+		with self.lock:
+			for owner, searcher in self.searchers.values():
+				searcher.close()
+			self.searchers.clear()
+			self.epoch += 1
@@ -0,0 +1,87 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Module defining the lightweight records yielded as results.'''
+
+import sys
+
+class Record(dict):
+	'''
+	A dictionary holding the values of a result. Records are dictionaries,
+	so that they are serialised by json and compared like dictionaries,
+	but they have no attribute dictionary of their own. Subclasses name
+	the kind of result, copies keep the subclass.
+	'''
+	
+	__slots__ = ()
+	
+	def copy(self):
+		'''Return a shallow copy of the record.'''
+		return type(self)(self)
+
+class InstitutionRecord(Record):
+	'''
+	The record of an institution found by core.query. The strings are
+	interned: records of the same institution share their strings as do
+	the countries, country codes and types of all records.
+	'''
+	
+	__slots__ = ()
+	
+	@classmethod
+	def fromStore(cls, store, docnum):
+		'''
+		Return the record of an institution read from the field store.
+		
+		:param store: the field store, see store.FieldStore
+		:param docnum: the document number of the institution
+		'''
+		return cls.fromFields(store.fields(docnum))
+	
+	@classmethod
+	def fromFields(cls, fields):
+		'''
+		Return a record of the stored fields of an institution.
+		
+		:param fields: the stored fields of the institution
+		'''
+		intern = sys.intern
+		return cls(
+			source=intern(fields['source']),
+			name=intern(fields['name']),
+			isni=intern(fields['isni']),
+			lat=float(fields['lat']),
+			lon=float(fields['lon']),
+			country=intern(fields['country']),
+			alpha2=intern(fields['alpha2']),
+			type=intern(fields['type']),
+		)
+
+class GeoRecord(Record):
+	'''The record of a settlement found by geo.geocodeAll.'''
+	
+	__slots__ = ()
+
+class PlaceRecord(Record):
+	'''
+	The record of a settlement found by geo.reverseGeocode along with its
+	country and its distance to the given coordinates in kilometres.
+	'''
+	
+	__slots__ = ()
+
+class ParseRecord(Record):
+	'''The record of an institution parsed by parser.parseAll.'''
+	
+	__slots__ = ()
@@ -0,0 +1,100 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Module to load the resources of the package on first use.'''
+
+import os.path
+import threading
+
+dataDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+def dataPath(name):
+	'''
+	Return the path of a file or folder inside of the data folder.
+	
+	:param name: the name of the file or folder
+	'''
+	return os.path.join(dataDir, name)
+
+class Lazy():
+	'''
+	Load a resource when it is accessed for the first time. The resource
+	is loaded exactly once even if several threads access it at the same
+	time.
+	
+	:param load: the function without parameters returning the resource
+	'''
+	
+	def __init__(self, load):
+		self.load = load
+		self.lock = threading.Lock()
+		self.loaded = False
+		self.value = None
+	
+	def get(self):
+		'''Return the resource, loading it on the first call.'''
+		if not self.loaded:
+			with self.lock:
+				if not self.loaded:
+					self.value = self.load()
+					self.loaded = True
+		return self.value
+	
+	def reset(self):
+		'''Discard the resource so that the next call of get reloads it.'''
+		with self.lock:
+			self.loaded = False
+			self.value = None
+
+class ThreadLocal():
+	'''
+	Load a resource for every thread accessing it, e.g. to give every
+	thread its own copy of an object which is not thread-safe.
+	
+	:param load: the function without parameters returning the resource
+	'''
+	
+	def __init__(self, load):
+		self.load = load
+		self.local = threading.local()
+		self.epoch = 0
+	
+	def get(self):
+		'''Return the resource of the calling thread, loading it if needed.'''
+		local = self.local
+		if getattr(local, 'epoch', None) != self.epoch:
+			local.value = self.load()
+			local.epoch = self.epoch
+		return local.value
+	
+	def reset(self):
+		'''Discard the resources so that every thread reloads them.'''
+		self.epoch += 1
+
+def moduleGetattr(module, resources):
+	'''
+	Return a module level __getattr__ function exposing the lazily loaded
+	resources as attributes of the module.
+	
+	:param module: the name of the module
+	:param resources: a dictionary mapping attribute names to Lazy or
+		ThreadLocal objects
+	'''
+	def __getattr__(name):
+		try:
+			return resources[name].get()
+		except KeyError:
+			raise AttributeError('module {!r} has no attribute {!r}'.format(
+				module, name)) from None
+	return __getattr__
@@ -0,0 +1,186 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Module to split an index into one index per country.'''
+
+import json
+import os.path
+import threading
+
+from whoosh import index
+from whoosh.fields import STORED
+from whoosh.scoring import BM25F, BM25FScorer, WeightScorer
+import numpy as np
+
+from .pool import SearcherPool
+from .store import indexToken
+
+# the shards are kept in a subfolder so that refreshing a searcher of the
+# global index does not list the files of every shard
+folderName = 'shards'
+manifestName = 'shards.json'
+
+def createShards(ixPath, reader, fieldnames):
+	'''
+	Write one index per country into a subfolder of the folder of the
+	index read by the reader. The shards are named after the ISO 3166-1
+	alpha-2 country codes and contain the documents of the country in the
+	order of the global index along with their global document number. A
+	manifest lists the shards along with the generation and the segments
+	of the global index they were created from.
+	
+	:param ixPath: the folder of the global index
+	:param reader: the reader of the global index
+	:param fieldnames: a dictionary mapping the names of the indexed fields
+		to the names of the stored fields holding their content
+	'''
+	countries = {}
+	for docnum, fields in reader.iter_docs():
+		countries.setdefault(fields['alpha2'], []).append((docnum, fields))
+	shardPath = os.path.join(ixPath, folderName)
+	os.makedirs(shardPath, exist_ok=True)
+	schema = reader.schema.copy()
+	schema.add('docnum', STORED)
+	stored = set(schema.stored_names())
+	for alpha2, documents in sorted(countries.items()):
+		ix = index.create_in(shardPath, schema, indexname=alpha2)
+		writer = ix.writer()
+		for docnum, fields in documents:
+			document = {name: fields[name] for name in fields if name in stored}
+			for name, source in fieldnames.items():
+				document[name] = fields.get(source) or ''
+			writer.add_document(docnum=docnum, **document)
+		writer.commit()
+	manifest = {
+		'generation': reader.generation(),
+		'token': indexToken(reader),
+		'countries': sorted(countries),
+	}
+	with open(os.path.join(shardPath, manifestName), 'w') as f:
+		json.dump(manifest, f)
+
+class GlobalBM25F(BM25F):
+	'''
+	BM25F weighting taking the inverse document frequencies and average
+	field lengths from the searcher of another index, so that the scores
+	of the documents of a shard equal their scores in the global index.
+	
+	:param statistics: a function returning the searcher of the global index
+	'''
+	
+	def __init__(self, statistics, B=0.75, K1=1.2):
+		BM25F.__init__(self, B, K1)
+		self.statistics = statistics
+	
+	def scorer(self, searcher, fieldname, text, qf=1):
+		if not searcher.schema[fieldname].scorable:
+			return WeightScorer.for_(searcher, fieldname, text)
+		return GlobalBM25FScorer(self.statistics(), searcher, fieldname, text,
+			self.B, self.K1, qf)
+
+class GlobalBM25FScorer(BM25FScorer):
+	
+	def __init__(self, parent, searcher, fieldname, text, B, K1, qf=1):
+		self.idf = parent.idf(fieldname, text)
+		self.avgfl = parent.avg_field_length(fieldname) or 1
+		self.B = B
+		self.K1 = K1
+		self.qf = qf
+		self.setup(searcher, fieldname, text)
+
+class Shard():
+	'''
+	The index of the institutions of a single country.
+	
+	:param ix: the index of the shard
+	:param weighting: the weighting of the searchers of the shard
+	'''
+	
+	def __init__(self, ix, weighting):
+		self.searchers = SearcherPool(ix, weighting=weighting)
+		self.lock = threading.Lock()
+		self.token = None
+		self.docnums = None
+	
+	def mapping(self, searcher):
+		'''
+		Return an array of the global document numbers of the documents of
+		the shard.
+		
+		:param searcher: a searcher of the shard
+		'''
+		reader = searcher.reader()
+		token = indexToken(reader)
+		with self.lock:
+			if self.token != token:
+				docnums = np.full(reader.doc_count_all(), -1, dtype=np.int64)
+				for docnum, fields in reader.iter_docs():
+					docnums[docnum] = fields['docnum']
+				self.docnums = docnums
+				self.token = token
+			return self.docnums
+
+class ShardedIndex():
+	'''
+	Look up the shard of a country written by createShards for the global
+	index read by a searcher.
+	
+	:param ixPath: the folder of the global index
+	:param statistics: a function returning the searcher of the global index
+	'''
+	
+	def __init__(self, ixPath, statistics):
+		self.shardPath = os.path.join(ixPath, folderName)
+		self.weighting = GlobalBM25F(statistics)
+		self.lock = threading.Lock()
+		self.shards = {}
+		try:
+			with open(os.path.join(self.shardPath, manifestName)) as f:
+				manifest = json.load(f)
+		except (OSError, ValueError):
+			manifest = {'generation': None, 'token': None, 'countries': []}
+		self.generation = manifest['generation']
+		self.token = manifest['token']
+		self.countries = set(manifest['countries'])
+	
+	def shard(self, alpha2, searcher):
+		'''
+		Return the shard of the country or None if there is no shard of the
+		country for the global index read by the searcher.
+		
+		:param alpha2: the ISO 3166-1 alpha-2 code of the country
+		:param searcher: the searcher of the global index
+		'''
+		try:
+			if alpha2 not in self.countries:
+				return
+		except TypeError:
+			return
+		reader = searcher.reader()
+		if (self.generation != reader.generation()
+				or self.token != indexToken(reader)):
+			return
+		with self.lock:
+			try:
+				return self.shards[alpha2]
+			except KeyError:
+				ix = index.open_dir(self.shardPath, indexname=alpha2)
+				shard = self.shards[alpha2] = Shard(ix, self.weighting)
+				return shard
+	
+	def close(self):
+		'''Close the searchers of every opened shard.'''
+		with self.lock:
+			for shard in self.shards.values():
+				shard.searchers.close()
@@ -0,0 +1,110 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Module to look up the documents of an index by their coordinates.'''
+
+import math
+
+import numpy as np
+
+from .store import indexToken
+
+class CoordinateIndex():
+	'''
+	Keep the coordinates and country codes of every document of an index
+	in arrays indexed by the document number.
+	
+	Distances are measured in degrees of latitude: a longitude difference
+	is scaled by the cosine of the latitude of the reference point to
+	account for the meridians converging toward the poles.
+	
+	:param reader: the index reader to load the stored fields from
+	'''
+	
+	def __init__(self, reader):
+		self.token = indexToken(reader)
+		size = reader.doc_count_all()
+		self.lat = np.full(size, np.nan)
+		self.lon = np.full(size, np.nan)
+		self.alpha2 = np.zeros(size, dtype='U2')
+		for docnum, fields in reader.iter_docs():
+			self.lat[docnum] = fields['lat']
+			self.lon[docnum] = fields['lon']
+			self.alpha2[docnum] = fields['alpha2']
+	
+	def distances(self, lat, lon, docnums=None):
+		'''
+		Return the latitude and the scaled longitude differences between
+		the given point and the documents.
+		
+		:param lat: the latitude of the reference point
+		:param lon: the longitude of the reference point
+		:param docnums: the document numbers or None for every document
+		'''
+		lats = self.lat if docnums is None else self.lat[docnums]
+		lons = self.lon if docnums is None else self.lon[docnums]
+		scale = math.cos(math.radians(lat))
+		dlat = lats - lat
+		dlon = (lons - lon + 180) % 360 - 180
+		return dlat, dlon * scale
+	
+	def inside(self, lat, lon, offset, docnums=None):
+		'''
+		Return a boolean array marking the documents inside of the box
+		centered at the given coordinates.
+		
+		:param lat: the latitude describing the middle of the box
+		:param lon: the longitude describing the middle of the box
+		:param offset: the half-width of the box in degree of arcs
+		:param docnums: the document numbers or None for every document
+		'''
+		dlat, dlon = self.distances(lat, lon, docnums)
+		with np.errstate(invalid='ignore'):
+			return (np.abs(dlat) <= offset) & (np.abs(dlon) <= offset)
+	
+	def decay(self, lat, lon, offset, docnums):
+		'''
+		Return a factor for every document decreasing with its distance
+		to the given coordinates following a Gaussian whose standard
+		deviation equals the offset.
+		
+		:param lat: the latitude of the reference point
+		:param lon: the longitude of the reference point
+		:param offset: the standard deviation in degree of arcs
+		:param docnums: the document numbers
+		'''
+		if not offset:
+			return np.ones(len(docnums))
+		dlat, dlon = self.distances(lat, lon, docnums)
+		return np.exp(-0.5 * (dlat ** 2 + dlon ** 2) / offset ** 2)
+	
+	def boost(self, lat, lon, offset, docnums, scores):
+		'''
+		Return a boolean array marking the documents inside of the box
+		centered at the given coordinates along with their scores. The
+		scores of the documents inside of the box are multiplied with
+		their decay, the other scores are kept.
+		
+		:param lat: the latitude describing the middle of the box
+		:param lon: the longitude describing the middle of the box
+		:param offset: the half-width of the box in degree of arcs
+		:param docnums: the document numbers
+		:param scores: the scores of the documents
+		'''
+		docnums = np.asarray(docnums)
+		inside = self.inside(lat, lon, offset, docnums)
+		scores = np.array(scores, dtype=float)
+		if inside.any():
+			scores[inside] *= self.decay(lat, lon, offset, docnums[inside])
+		return inside, scores
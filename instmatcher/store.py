@@ -0,0 +1,153 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''Module to store the stored fields of an index in a columnar file.'''
+
+import json
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+magic = b'IMSTORE1'
+
+def indexToken(reader):
+	'''
+	Return a list identifying the segments read by the index reader.
+	
+	:param reader: the index reader
+	'''
+	return [leaf.segment().segment_id() for leaf, offset in reader.leaf_readers()]
+
+def writeStore(reader, path, fieldnames, floatFields=()):
+	'''
+	Write the stored fields of every document of the index reader into a
+	columnar file: every float field becomes an array of doubles, every
+	other field a heap of UTF-8 encoded strings along with an array of
+	the offsets of the strings inside of the heap. All arrays are indexed
+	by the document number.
+	
+	:param reader: the index reader to read the stored fields from
+	:param path: the path of the file to write
+	:param fieldnames: the names of the stored fields to write
+	:param floatFields: the names of the fields converted to floats
+	'''
+	size = reader.doc_count_all()
+	values = {}
+	for name in fieldnames:
+		values[name] = np.full(size, np.nan) if name in floatFields else [b''] * size
+	for docnum, fields in reader.iter_docs():
+		for name in fieldnames:
+			if name in floatFields:
+				values[name][docnum] = float(fields[name])
+			else:
+				values[name][docnum] = fields[name].encode('utf-8')
+	
+	columns, blobs = [], []
+	position = 0
+	def append(blob):
+		nonlocal position
+		# align every array to 8 bytes
+		padding = -position % 8
+		blobs.append(b'\0' * padding + blob)
+		position += padding
+		start = position
+		position += len(blob)
+		return start
+	for name in fieldnames:
+		if name in floatFields:
+			columns.append({
+				'name': name,
+				'values': append(values[name].tobytes()),
+			})
+			continue
+		offsets = np.zeros(size + 1, dtype=np.int64)
+		np.cumsum([len(value) for value in values[name]], out=offsets[1:])
+		columns.append({
+			'name': name,
+			'offsets': append(offsets.tobytes()),
+			'heap': append(b''.join(values[name])),
+		})
+	header = json.dumps({
+		'byteorder': sys.byteorder,
+		'size': size,
+		'token': indexToken(reader),
+		'columns': columns,
+	}).encode('utf-8')
+	# the arrays start at the first multiple of 8 after the header
+	start = len(magic) + 8 + len(header)
+	start += -start % 8
+	# replace the file at once since it may be memory-mapped by a reader
+	temp = path + '.tmp'
+	with open(temp, 'wb') as f:
+		f.write(magic)
+		f.write(struct.pack('<Q', start))
+		f.write(header)
+		f.write(b'\0' * (start - len(magic) - 8 - len(header)))
+		for blob in blobs:
+			f.write(blob)
+	os.replace(temp, path)
+
+class FieldStore():
+	'''
+	Look up the stored fields of a document in a columnar file written by
+	writeStore. The file is memory-mapped: the pages are shared between
+	processes and only the values of a looked up document are read.
+	
+	:param path: the path of the file
+	:raises ValueError: if the file is not a store of this byte order
+	'''
+	
+	def __init__(self, path):
+		with open(path, 'rb') as f:
+			self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		if self.buffer[:len(magic)] != magic:
+			raise ValueError('{} is not a field store'.format(path))
+		start, = struct.unpack_from('<Q', self.buffer, len(magic))
+		header = json.loads(self.buffer[len(magic) + 8:start].rstrip(b'\0')
+			.decode('utf-8'))
+		if header['byteorder'] != sys.byteorder:
+			raise ValueError('{} has a different byte order'.format(path))
+		self.size = header['size']
+		self.token = header['token']
+		view = memoryview(self.buffer)
+		self.columns = []
+		for column in header['columns']:
+			if 'values' in column:
+				offset = start + column['values']
+				values = view[offset:offset + 8 * self.size].cast('d')
+				self.columns.append((column['name'], values, None))
+			else:
+				offset = start + column['offsets']
+				offsets = view[offset:offset + 8 * (self.size + 1)].cast('q')
+				self.columns.append((column['name'], offsets, start + column['heap']))
+	
+	def fields(self, docnum):
+		'''
+		Return a dictionary of the stored fields of the document in the
+		order of the field names passed to writeStore.
+		
+		:param docnum: the document number
+		'''
+		buffer = self.buffer
+		fields = {}
+		for name, array, heap in self.columns:
+			if heap is None:
+				fields[name] = array[docnum]
+			else:
+				fields[name] = str(
+					buffer[heap + array[docnum]:heap + array[docnum + 1]], 'utf-8')
+		return fields
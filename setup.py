@@ -18,7 +18,7 @@ import os, os.path
 import csv
 import math
 import multiprocessing
-from setuptools import setup
+from setuptools import Command, setup
 from setuptools.command.develop import develop
 from setuptools.command.install import install
 from setuptools.command.test import test
@@ -41,7 +41,7 @@ def create_index(procs, multisegment, ixPath):
 	schema = Schema(
 		name=STORED,
 		tokens=TEXT(analyzer=ana),
-		alias=TEXT(analyzer=ana),
+		alias=TEXT(analyzer=ana, stored=True),
 		lat=NUMERIC(numtype=float, stored=True),
 		lon=NUMERIC(numtype=float, stored=True),
 		isni=STORED,
@@ -68,10 +68,17 @@ def create_index(procs, multisegment, ixPath):
 				writer.add_document(**row)
 				visited.add(row['source'])
 	writer.commit()
+	
+	# write the stored fields into a memory-mappable columnar file and
+	# split the index into one index per country
+	from instmatcher import core, shards
+	with ix.reader() as reader:
+		core.buildStore(reader, os.path.join(ixPath, 'fields.store'))
+		shards.createShards(ixPath, reader, {'tokens': 'name'})
 
 def create_geoindex(procs, multisegment, ixPath):
 	from whoosh import index
-	from whoosh.fields import Schema, STORED, ID, IDLIST
+	from whoosh.fields import Schema, STORED, ID, IDLIST, NUMERIC
 	
 	schema = Schema(
 		name=STORED,
@@ -82,6 +89,7 @@ def create_geoindex(procs, multisegment, ixPath):
 		lon=STORED,
 		alpha2=ID(stored=True),
 		country=ID(stored=True),
+		population=NUMERIC(numtype=int, bits=64),
 	)
 	ix = index.create_in(ixPath, schema)
 	writer = ix.writer(procs=procs, multisegment=multisegment)
@@ -99,10 +107,31 @@ def create_geoindex(procs, multisegment, ixPath):
 				lon=row[5],
 				alpha2=row[8],
 				country=codes[row[8]],
+				population=population,
 				_boost=math.log(max(math.e, population)),
 			)
 	writer.commit()
 
+def create_gazetteer(path):
+	# write the settlements into a compact memory-mappable binary file
+	from instmatcher.gazetteer import Gazetteer, readGeoNames
+	cities = os.path.join('instmatcher', 'data', 'cities1000.txt')
+	Gazetteer(readGeoNames(cities)).save(path)
+
+class BuildGazetteerCommand(Command):
+	description = 'build the binary gazetteer from cities1000.txt'
+	user_options = []
+	
+	def initialize_options(self):
+		pass
+	
+	def finalize_options(self):
+		pass
+	
+	def run(self):
+		print('creating the gazetteer')
+		create_gazetteer(os.path.join('instmatcher', 'data', 'gazetteer.bin'))
+
 def create_indices(force):
 	def decorator(command_subclass):
 		orig_run = command_subclass.run
@@ -128,6 +157,11 @@ def create_indices(force):
 				print('creating the geoindex, this may take some time')
 				create_geoindex(procs, multisegment, ixPath)
 			
+			gazetteerPath = os.path.join('instmatcher', 'data', 'gazetteer.bin')
+			if forceGeo or not os.path.exists(gazetteerPath):
+				print('creating the gazetteer')
+				create_gazetteer(gazetteerPath)
+			
 			orig_run(self)
 		command_subclass.run = new_run
 		return command_subclass
@@ -157,6 +191,7 @@ setup(
 		'install': CustomInstallCommand,
 		'develop': CustomDevelopCommand,
 		'test': CustomTestCommand,
+		'build_gazetteer': BuildGazetteerCommand,
 	},
 	name='instmatcher',
 	version=__version__,
@@ -172,13 +207,16 @@ setup(
 			'data/abbreviations.csv',
 			'data/alternativeCountryNames.csv',
 			'data/countryInfo.txt',
+			'data/gazetteer.bin',
 			'data/index/*',
+			'data/index/shards/*',
 			'data/geoindex/*',
 		]
 	},
 	install_requires=[
 		'Whoosh>=2.7.4',
 		'requests>=2.10.0',
+		'numpy>=1.11.0',
 	],
 	extras_require={
 		'docs':[
@@ -190,6 +228,7 @@ setup(
 			'py2neo>=3.1.1',
 		],
 	},
+	python_requires='>=3.7',
 	include_package_data=True,
 	zip_safe=False,
 	keywords='institute institution affiliation organisation search match',
@@ -198,8 +237,8 @@ setup(
 		'Development Status :: 4 - Beta',
 		'License :: OSI Approved :: Apache Software License',
 		'Intended Audience :: Developers',
-		'Programming Language :: Python :: 3.5',
-		'Programming Language :: Python :: 3.4',
+		'Programming Language :: Python :: 3 :: Only',
+		'Programming Language :: Python :: 3.7',
 		'Topic :: Text Processing :: General',
 		'Topic :: Software Development :: Libraries :: Python Modules',
 	],
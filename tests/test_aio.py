@@ -0,0 +1,125 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import socket
+import unittest
+import instmatcher
+from instmatcher import aio, parser
+from .util import GrobidProxy, GrobidServer
+
+class test_aio(unittest.TestCase):
+	
+	def setUp(self):
+		host = 'localhost'
+		port = 8081
+		self.url = 'http://' + host + ':' + str(port)
+		self.server = GrobidServer(host, port)
+		self.server.start()
+		self.server.setResponse(
+			'University of Oxford, Oxford, UK',
+			'''<affiliation>
+				<orgName type="institution">University of Oxford</orgName>
+				<address>
+					<settlement>Oxford</settlement>
+					<country key="GB">UK</country>
+				</address>
+			</affiliation>'''
+		)
+	
+	def tearDown(self):
+		self.server.stop()
+		aio.configure()
+	
+	def run(self, result=None):
+		with ThreadPoolExecutor(2) as executor:
+			self.executor = executor
+			return unittest.TestCase.run(self, result)
+	
+	def test_parse(self):
+		arg = 'University of Oxford, Oxford, UK'
+		actual = asyncio.run(aio.parseAll(arg, self.url))
+		self.assertEqual(actual, list(instmatcher.parseAll(arg, self.url)))
+		self.assertEqual(asyncio.run(aio.parse(None, self.url)), None)
+	
+	def test_post_query_string(self):
+		url = self.url + '/processAffiliations?consolidate=1'
+		asyncio.run(aio._post(url, b'affiliations=', 'text/plain', (1, 1)))
+		self.assertEqual(GrobidProxy.lastPath,
+			'/processAffiliations?consolidate=1')
+	
+	def test_queryGrobid_error_status(self):
+		with self.assertRaises(parser.GrobidError):
+			asyncio.run(aio.queryGrobid(__name__, self.url + '/unknown'))
+	
+	def test_parseAll_error_status(self):
+		url = self.url + '/unknown'
+		with self.assertRaises(parser.GrobidError) as expected:
+			list(parser.parseAll(__name__, url))
+		with self.assertRaises(parser.GrobidError) as actual:
+			asyncio.run(aio.parseAll(__name__, url))
+		self.assertEqual(str(actual.exception), str(expected.exception))
+	
+	def test_queryGrobid_readTimeout(self):
+		# a listening socket accepts connections but never responds
+		with socket.socket() as listener:
+			listener.bind(('localhost', 0))
+			listener.listen()
+			url = 'http://localhost:' + str(listener.getsockname()[1])
+			with parser.GrobidClient(url, readTimeout=0.1) as client:
+				with self.assertRaises(asyncio.TimeoutError):
+					asyncio.run(aio.queryGrobid(__name__, client))
+			aio.configure(readTimeout=0.1)
+			with self.assertRaises(asyncio.TimeoutError):
+				asyncio.run(aio.queryGrobid(__name__, url))
+	
+	def test_geocode(self):
+		actual = asyncio.run(aio.geocodeAll('Oxford', 'GB'))
+		self.assertEqual(actual, list(instmatcher.geocodeAll('Oxford', 'GB')))
+		actual = asyncio.run(aio.geocode('Oxford', 'GB'))
+		self.assertEqual(actual, instmatcher.geocode('Oxford', 'GB'))
+		args = ['Oxford', 'Berlin'], ['GB', 'DE']
+		actual = asyncio.run(aio.geocodeMany(*args))
+		self.assertEqual(actual, instmatcher.geocodeMany(*args))
+		actual = asyncio.run(aio.geocode('Berllin', 'DE', fuzzy=True))
+		expected = instmatcher.geocode('Berllin', 'DE', fuzzy=True)
+		self.assertEqual(actual, expected)
+	
+	def test_find(self):
+		actual = asyncio.run(aio.findAll('London', 'CA', limit=2))
+		expected = list(instmatcher.findAll('London', 'CA', limit=2))
+		self.assertEqual(repr(actual), repr(expected))
+		actual = asyncio.run(aio.find('TU Berlin'))
+		self.assertEqual(actual['name'], 'Technical University of Berlin')
+	
+	def test_match(self):
+		arg = 'University of Oxford, Oxford, UK'
+		actual = asyncio.run(aio.match(arg, self.url))
+		self.assertEqual(actual, instmatcher.match(arg, self.url))
+		self.assertEqual(actual['name'], 'University of Oxford')
+		actual = asyncio.run(aio.matchAll(arg, self.url))
+		expected = list(instmatcher.matchAll(arg, self.url))
+		self.assertEqual(repr(actual), repr(expected))
+		self.assertEqual(asyncio.run(aio.match('', self.url)), None)
+	
+	def test_concurrent_match(self):
+		aio.configure(self.executor, concurrency=2)
+		arg = 'University of Oxford, Oxford, UK'
+		async def matchMany():
+			return await asyncio.gather(
+				*[aio.match(arg, self.url) for i in range(10)])
+		actual = [item['name'] for item in asyncio.run(matchMany())]
+		self.assertSequenceEqual(actual, ['University of Oxford'] * 10)
+		self.assertIs(aio.lookupExecutor, self.executor)
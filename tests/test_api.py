@@ -13,7 +13,10 @@
 # limitations under the License.
 
 import unittest
+from unittest import mock
 import instmatcher
+from instmatcher import core, geo
+from instmatcher.resources import Lazy
 from .util import GrobidServer
 
 class test_api(unittest.TestCase):
@@ -67,3 +70,86 @@ class test_api(unittest.TestCase):
 			'type': 'university',
 		}
 		self.assertEqual(instmatcher.match(arg, self.url), expected)
+	
+	def test_match_GrobidClient(self):
+		arg = 'University of Oxford, Oxford, UK'
+		self.server.setResponse(
+			arg,
+			'''<affiliation>
+				<orgName type="institution">University of Oxford</orgName>
+				<address>
+					<settlement>Oxford</settlement>
+					<country key="GB">UK</country>
+				</address>
+			</affiliation>'''
+		)
+		expected = instmatcher.match(arg, self.url)
+		with instmatcher.GrobidClient(self.url) as client:
+			self.assertEqual(instmatcher.match(arg, client), expected)
+			self.assertEqual(next(instmatcher.matchAll(arg, client, limit=1)),
+				expected)
+	
+	def test_match_geocodes_lazily(self):
+		arg = 'University of Oxford, Oxford, UK; University of Pisa, Pisa'
+		self.server.setResponse(
+			arg,
+			'''<affiliation>
+				<orgName type="institution">University of Oxford</orgName>
+				<address>
+					<settlement>Oxford</settlement>
+					<country key="GB">UK</country>
+				</address>
+			</affiliation>
+			<affiliation>
+				<orgName type="institution">University of Pisa</orgName>
+				<address>
+					<settlement>Pisa</settlement>
+				</address>
+			</affiliation>'''
+		)
+		with mock.patch.object(instmatcher, 'geocodeAll',
+				wraps=geo.geocodeAll) as geocodeAll:
+			actual = instmatcher.match(arg, self.url)
+			self.assertEqual(geocodeAll.call_count, 1)
+		self.assertEqual(actual['name'], 'University of Oxford')
+		with mock.patch.object(instmatcher, 'geocodeMany',
+				wraps=geo.geocodeMany) as geocodeMany:
+			matches = instmatcher.matchAll(arg, self.url, limit=1)
+			self.assertEqual(next(matches), actual)
+			self.assertEqual(geocodeMany.call_count, 1)
+			list(matches)
+			self.assertEqual(geocodeMany.call_count, 2)
+	
+	def test_matchAll_bestPerCountry(self):
+		arg = 'University of London, London'
+		self.server.setResponse(
+			arg,
+			'''<affiliation>
+				<orgName type="institution">University of London</orgName>
+				<address>
+					<settlement>London</settlement>
+				</address>
+			</affiliation>'''
+		)
+		for bestPerCountry in [True, False]:
+			expected = len(list(geo.geocodeAll('London',
+				bestPerCountry=bestPerCountry)))
+			with mock.patch.object(instmatcher, 'findAll',
+					return_value=iter([])) as findAll:
+				list(instmatcher.matchAll(arg, self.url,
+					bestPerCountry=bestPerCountry))
+				self.assertEqual(findAll.call_count, expected)
+		with mock.patch.object(instmatcher, 'findAll',
+				return_value=iter([])) as findAll:
+			list(instmatcher.matchAll(arg, self.url))
+			self.assertEqual(findAll.call_count, expected)
+		best = list(geo.geocodeAll('London', bestPerCountry=True))
+		self.assertLess(len(best), len(list(geo.geocodeAll('London'))))
+	
+	def test_close_loads_nothing(self):
+		load = mock.Mock()
+		with mock.patch.multiple(core, _searchers=Lazy(load),
+				_shards=Lazy(load)):
+			with mock.patch.object(geo, '_searchers', Lazy(load)):
+				instmatcher.close()
+		load.assert_not_called()
@@ -0,0 +1,88 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import instmatcher
+from instmatcher import batch, core
+from .util import GrobidServer
+
+queries = [
+	'TU Berlin',
+	('London', 'CA', 43.0, -81.27, 0.5),
+	('university of london', 'GB', 51.52, -0.13, 0.05),
+	('univ* of london', 'GB'),
+	'Berlin TU',
+	'Unknown',
+	None,
+]
+
+affiliation = 'University of Oxford, Oxford, UK'
+
+class test_batch(unittest.TestCase):
+	
+	@classmethod
+	def setUpClass(cls):
+		host = 'localhost'
+		port = 8081
+		cls.url = 'http://' + host + ':' + str(port)
+		cls.server = GrobidServer(host, port)
+		cls.server.start()
+		cls.server.setResponse(
+			affiliation,
+			'''<affiliation>
+				<orgName type="institution">University of Oxford</orgName>
+				<address>
+					<settlement>Oxford</settlement>
+					<country key="GB">UK</country>
+				</address>
+			</affiliation>'''
+		)
+		cls.pool = batch.BatchPool(2, chunksize=3)
+	
+	@classmethod
+	def tearDownClass(cls):
+		cls.pool.close()
+		cls.server.stop()
+	
+	def sources(self, results):
+		return [item and item['source'] for item in results]
+	
+	def test_find(self):
+		actual = self.sources(self.pool.find(queries * 3))
+		expected = self.sources(core.findMany(queries * 3))
+		self.assertSequenceEqual(actual, expected)
+	
+	def test_find_unordered(self):
+		actual = sorted(self.pool.find(queries * 3, ordered=False),
+			key=lambda item: item[0])
+		self.assertSequenceEqual([position for position, inst in actual],
+			range(len(queries) * 3))
+		expected = self.sources(core.findMany(queries * 3))
+		self.assertSequenceEqual(self.sources(inst for _, inst in actual), expected)
+	
+	def test_find_empty(self):
+		self.assertSequenceEqual(list(self.pool.find([])), [])
+	
+	def test_match(self):
+		actual = list(self.pool.match([affiliation, '', affiliation], self.url))
+		self.assertEqual(actual[0]['name'], 'University of Oxford')
+		self.assertEqual(actual[1], None)
+		self.assertEqual(repr(actual[2]),
+			repr(instmatcher.match(affiliation, self.url)))
+	
+	def test_extract(self):
+		actual = list(self.pool.extract([affiliation], self.url))
+		self.assertEqual(actual, [batch.extract(affiliation, self.url)])
+		self.assertEqual(actual[0][0]['institution'], 'University of Oxford')
+		self.assertIn('lat', actual[0][0])
@@ -0,0 +1,101 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from whoosh.analysis import StemmingAnalyzer
+from whoosh.fields import Schema, TEXT, NUMERIC, ID
+from whoosh.filedb.filestore import RamStorage
+from whoosh.qparser import MultifieldParser
+from instmatcher.bm25 import BM25Index
+from instmatcher.spatial import CoordinateIndex
+
+class test_bm25(unittest.TestCase):
+	
+	def setUp(self):
+		schema = Schema(
+			tokens=TEXT(analyzer=StemmingAnalyzer()),
+			alias=TEXT(analyzer=StemmingAnalyzer()),
+			lat=NUMERIC(numtype=float, stored=True),
+			lon=NUMERIC(numtype=float, stored=True),
+			alpha2=ID(stored=True),
+		)
+		self.ix = RamStorage().create_index(schema)
+		documents = [
+			('University of Oxford', 'Oxford University', 51.75, -1.25, 'GB'),
+			('Oxford Brookes University', '', 51.75, -1.22, 'GB'),
+			('University of Mississippi', 'Ole Miss', 34.36, -89.53, 'US'),
+			('Miami University', 'Miami of Ohio', 39.51, -84.73, 'US'),
+			('Technical University of Berlin', 'TU Berlin', 52.51, 13.33, 'DE'),
+			('Free University of Berlin', 'FU Berlin', 52.45, 13.29, 'DE'),
+			('Berlin Institute of Technology', '', 52.51, 13.32, 'DE'),
+		]
+		for i in range(2):
+			writer = self.ix.writer()
+			for tokens, alias, lat, lon, alpha2 in documents[i::2]:
+				writer.add_document(tokens=tokens, alias=alias, lat=lat,
+					lon=lon, alpha2=alpha2)
+			writer.commit(merge=False)
+		self.searcher = self.ix.searcher()
+		self.parser = MultifieldParser(['tokens', 'alias',], self.ix.schema)
+		self.engine = BM25Index(self.searcher.reader(), ['tokens', 'alias',])
+		self.coords = CoordinateIndex(self.searcher.reader())
+	
+	def tearDown(self):
+		self.searcher.close()
+	
+	def assertSameResults(self, text, alpha2=None, limit=None):
+		q = self.parser.parse(text)
+		expected = [(hit.docnum, hit.score) for hit in
+			self.searcher.search(q, limit=None, filter=None)
+			if not alpha2 or hit['alpha2'] == alpha2][:limit]
+		actual = self.engine.search(q, self.coords, alpha2, None, None, 1, limit)
+		self.assertEqual([item[0] for item in actual],
+			[item[0] for item in expected])
+		for (_, actualScore), (_, expectedScore) in zip(actual, expected):
+			self.assertAlmostEqual(actualScore, expectedScore)
+	
+	def test_terms(self):
+		self.assertSameResults('university of berlin')
+		self.assertSameResults('oxford')
+		self.assertSameResults('miss')
+	
+	def test_prefix_and_wildcard(self):
+		self.assertSameResults('univ* berlin')
+		self.assertSameResults('tech*')
+		self.assertSameResults('m?am*')
+	
+	def test_boolean_operators(self):
+		self.assertSameResults('oxford OR berlin')
+		self.assertSameResults('(oxford AND brookes) OR miami')
+	
+	def test_filter_and_limit(self):
+		self.assertSameResults('university', alpha2='DE')
+		self.assertSameResults('university', limit=2)
+		self.assertSameResults('university', alpha2='US', limit=1)
+	
+	def test_no_results(self):
+		self.assertSameResults('the')
+		self.assertSameResults('unknown')
+	
+	def test_unsupported_query(self):
+		with self.assertRaises(NotImplementedError):
+			self.engine.search(self.parser.parse('university NOT berlin'),
+				self.coords, None, None, None, 1)
+	
+	def test_proximity(self):
+		q = self.parser.parse('berlin')
+		actual = self.engine.search(q, self.coords, None, 52.45, 13.29, 0.03)
+		docnums = [item[0] for item in actual]
+		self.assertEqual(len(docnums), 3)
+		self.assertEqual(self.coords.lat[docnums[0]], 52.45)
@@ -0,0 +1,152 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+from instmatcher.cache import DiskCache, LRUCache
+
+class test_cache(unittest.TestCase):
+	
+	def test_hit_and_miss(self):
+		cache = LRUCache(2)
+		cache.put('a', 1)
+		self.assertEqual(cache.get('a'), 1)
+		self.assertEqual(cache.get('b'), None)
+		self.assertEqual(cache.get('b', 2), 2)
+		expected = {'hits': 1, 'misses': 2, 'evictions': 0, 'size': 1, 'maxsize': 2}
+		self.assertEqual(cache.info(), expected)
+	
+	def test_evict_least_recently_used(self):
+		cache = LRUCache(2)
+		cache.put('a', 1)
+		cache.put('b', 2)
+		cache.get('a')
+		cache.put('c', 3)
+		self.assertEqual(cache.get('b'), None)
+		self.assertEqual(cache.get('a'), 1)
+		self.assertEqual(cache.get('c'), 3)
+		self.assertEqual(cache.info()['evictions'], 1)
+		self.assertEqual(cache.info()['size'], 2)
+	
+	def test_validate(self):
+		cache = LRUCache(2)
+		cache.validate(1)
+		cache.put('a', 1)
+		cache.validate(1)
+		self.assertEqual(cache.get('a'), 1)
+		cache.validate(2)
+		self.assertEqual(cache.get('a'), None)
+	
+	def test_clear(self):
+		cache = LRUCache(2)
+		cache.put('a', 1)
+		cache.clear()
+		self.assertEqual(cache.get('a'), None)
+		self.assertEqual(cache.info()['size'], 0)
+
+class test_diskCache(unittest.TestCase):
+	
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.path = os.path.join(self.tmp.name, 'cache.db')
+	
+	def tearDown(self):
+		self.tmp.cleanup()
+	
+	def test_hit_and_miss(self):
+		cache = DiskCache(self.path, 2)
+		cache.put(('a', None), [[1.5, 2.5, 'A']])
+		self.assertEqual(cache.get(('a', None)), [[1.5, 2.5, 'A']])
+		self.assertEqual(cache.get(('b', None)), None)
+		self.assertEqual(cache.get(('b', None), []), [])
+		expected = {'hits': 1, 'misses': 2, 'evictions': 0, 'size': 1, 'maxsize': 2}
+		self.assertEqual(cache.info(), expected)
+		cache.close()
+	
+	def test_evict_least_recently_used(self):
+		cache = DiskCache(self.path, 2)
+		cache.put('a', 1)
+		cache.put('b', 2)
+		cache.get('a')
+		cache.put('c', 3)
+		self.assertEqual(cache.get('b'), None)
+		self.assertEqual(cache.get('a'), 1)
+		self.assertEqual(cache.get('c'), 3)
+		self.assertEqual(cache.info()['evictions'], 1)
+		self.assertEqual(cache.info()['size'], 2)
+		cache.close()
+	
+	def test_batch_times_of_use(self):
+		cache = DiskCache(self.path, 3, batch=2)
+		cache.put('a', 1)
+		cache.put('b', 2)
+		cache.put('c', 3)
+		changes = cache.connection.total_changes
+		cache.get('a')
+		self.assertEqual(cache.connection.total_changes, changes)
+		cache.get('b')
+		self.assertEqual(cache.connection.total_changes, changes + 2)
+		cache.get('c')
+		cache.put('d', 4)
+		self.assertEqual(cache.get('a'), None)
+		self.assertEqual(cache.get('c'), 3)
+		self.assertEqual(cache.info()['size'], 3)
+		cache.close()
+	
+	def test_overwrite(self):
+		cache = DiskCache(self.path, 2)
+		cache.put('a', 1)
+		cache.put('a', 2)
+		self.assertEqual(cache.get('a'), 2)
+		self.assertEqual(cache.info()['size'], 1)
+		cache.close()
+	
+	def test_persistence(self):
+		cache = DiskCache(self.path, 2)
+		cache.validate(1)
+		cache.put('a', 1)
+		cache.close()
+		cache = DiskCache(self.path, 2)
+		cache.validate(1)
+		self.assertEqual(cache.get('a'), 1)
+		self.assertEqual(cache.info()['size'], 1)
+		cache.close()
+	
+	def test_validate(self):
+		cache = DiskCache(self.path, 2)
+		cache.validate([1, 2.5])
+		cache.put('a', 1)
+		cache.validate([1, 2.5])
+		self.assertEqual(cache.get('a'), 1)
+		cache.close()
+		cache = DiskCache(self.path, 2)
+		cache.validate([2, 2.5])
+		self.assertEqual(cache.get('a'), None)
+		self.assertEqual(cache.info()['size'], 0)
+		cache.close()
+	
+	def test_clear(self):
+		cache = DiskCache(self.path, 2)
+		cache.put('a', 1)
+		cache.clear()
+		self.assertEqual(cache.get('a'), None)
+		self.assertEqual(cache.info()['size'], 0)
+		cache.close()
+	
+	def test_unserialisable(self):
+		cache = DiskCache(self.path, 2)
+		self.assertRaises(TypeError, cache.get, object())
+		self.assertRaises(TypeError, cache.put, 'a', object())
+		cache.close()
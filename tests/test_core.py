@@ -12,8 +12,19 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
+import os.path
+import tempfile
 import unittest
+from unittest import mock
+from whoosh import index
+from whoosh.analysis import CharsetFilter, StemmingAnalyzer, LowercaseFilter
+from whoosh.fields import Schema, TEXT, NUMERIC, STORED, ID
+from whoosh.support.charset import accent_map
 from instmatcher import core
+from instmatcher.pool import SearcherPool
+from instmatcher.resources import Lazy
+from instmatcher.shards import ShardedIndex
 import itertools
 
 class test_core(unittest.TestCase):
@@ -37,6 +48,43 @@ class test_core(unittest.TestCase):
 		actualNames = [item[0]['name'] for item in actual]
 		self.assertSequenceEqual(actualNames, expectedNames)
 	
+	def test_misspelled_fuzzy(self):
+		name = 'Massachusets Institue of Technolgy'
+		self.assertIsNone(core.find(name))
+		actual = core.find(name, fuzzy=True)
+		self.assertEqual(actual['name'], 'Massachusetts Institute of Technology')
+		actual = [item['name'] for item in core.findAll(name, 'US', fuzzy=True)]
+		self.assertEqual(actual[0], 'Massachusetts Institute of Technology')
+		self.assertIsNone(core.find(name, 'DE', fuzzy=True))
+		self.assertIsNone(core.find('xyzzy', fuzzy=True))
+	
+	def test_fuzzyQuery(self):
+		actual = core.fuzzyQuery([
+			'Tecnical Universty Berlin',
+			'Univ of Pisa',
+			'',
+		], limit=2)
+		self.assertEqual(actual[0][0][0]['name'], 'Technical University of Berlin')
+		self.assertEqual(actual[1][0][0]['name'], 'University of Pisa')
+		self.assertEqual(len(actual[0]), 2)
+		self.assertSequenceEqual(actual[2], [])
+	
+	def test_findMany_fuzzy(self):
+		queries = [
+			'Tecnical Universty Berlin',
+			'TU Berlin',
+			('Massachusets Institue of Technolgy', 'US'),
+			'xyzzy',
+		]
+		self.assertSequenceEqual(list(core.findMany(queries))[0::2], [None, None])
+		actual = list(core.findMany(queries, fuzzy=True))
+		self.assertSequenceEqual([item['name'] if item else None for item in actual], [
+			'Technical University of Berlin',
+			'Technical University of Berlin',
+			'Massachusetts Institute of Technology',
+			None,
+		])
+	
 	def test_zero_search_radius(self):
 		actual = core.query('Pisa University', None, 0, 0, 0)
 		expectedNames = [
@@ -85,6 +133,153 @@ class test_core(unittest.TestCase):
 		actualNames = [item[0]['name'] for item in actual]
 		self.assertSequenceEqual(actualNames, expectedNames)
 	
+	def test_limit(self):
+		args = [
+			('university of london', None, None, None, 1),
+			('university of london', 'GB', 51.5, -0.1, 0.1),
+			('university of london', 'GB', 51.5, -0.1, 1),
+			('London', 'CA', 42.98, -81.23, 1),
+		]
+		for arg in args:
+			expected = [item[0]['source'] for item in core.query(*arg)]
+			self.assertGreater(len(expected), 1)
+			for limit in [1, 2, len(expected), len(expected) + 1]:
+				actual = [item[0]['source'] for item in
+					core.query(*arg, limit=limit)]
+				self.assertSequenceEqual(actual, expected[:limit])
+	
+	def test_proximity_ranking(self):
+		actual = core.query('London', 'CA', 43.0, -81.27, 0.5)
+		expectedNames = [
+			"University of Western Ontario",
+			"London Health Sciences Centre",
+		]
+		actualNames = [item[0]['name'] for item in actual]
+		self.assertSequenceEqual(actualNames, expectedNames)
+	
+	def test_proximity_decay(self):
+		actual = list(core.query('university of london', 'GB', 51.52, -0.13, 0.05))
+		scores = [item[1] for item in actual]
+		self.assertSequenceEqual(scores[:5], sorted(scores[:5], reverse=True))
+		self.assertEqual(actual[0][0]['name'], 'University of London')
+		self.assertEqual(actual[4][0]['name'], "King's College London")
+	
+	def test_bm25_backend(self):
+		args = [
+			('TU Berlin', None, None, None, 1),
+			('London', 'CA', None, None, 1),
+			('univ* of london', 'GB', 51.52, -0.13, 0.05),
+			('Pisa  University', None, '120', {'lon':0}, 1),
+			('Whasington', None, None, None, 1),
+		]
+		expected = [[item[0]['source'] for item in core.query(*arg)]
+			for arg in args]
+		core.useBackend('bm25')
+		try:
+			actual = [[item[0]['source'] for item in core.query(*arg)]
+				for arg in args]
+		finally:
+			core.useBackend('whoosh')
+		self.assertSequenceEqual(actual, expected)
+	
+	def test_unknown_backend(self):
+		with self.assertRaises(ValueError):
+			core.useBackend('unknown')
+	
+	def test_field_store(self):
+		args = [
+			('TU Berlin', None, None, None, 1),
+			('university of london', 'GB', 51.52, -0.13, 0.05),
+		]
+		with tempfile.TemporaryDirectory() as tmp:
+			core.buildStore(core.searchers.searcher().reader(),
+				os.path.join(tmp, 'fields.store'))
+			store = core.loadStore(os.path.join(tmp, 'fields.store'))
+			with mock.patch.object(core._store, 'get', return_value=store):
+				actual = [list(core.query(*arg)) for arg in args]
+		with mock.patch.object(core._store, 'get', return_value=None):
+			expected = [list(core.query(*arg)) for arg in args]
+		# compare the representations since NaN coordinates are never equal
+		self.assertEqual(repr(actual), repr(expected))
+		self.assertIsNone(core.loadStore(os.path.join(tmp, 'fields.store')))
+	
+	def test_country_shards(self):
+		args = [
+			('TU Berlin', 'DE', None, None, 1),
+			('London', 'CA', 43.0, -81.27, 0.5),
+			('university of london', 'GB', 51.52, -0.13, 0.05),
+			('univ* of london', 'GB', 51.52, -0.13, 0.05),
+			('Pisa  University', 'IT', '120', {'lon':0}, 1),
+		]
+		with mock.patch.object(core.shards, 'shard', wraps=core.shards.shard) as shard:
+			actual = [list(core.query(*arg)) for arg in args]
+			self.assertEqual(shard.call_count, 4)
+		with mock.patch.object(core.shards, 'shard', return_value=None):
+			expected = [list(core.query(*arg)) for arg in args]
+		self.assertEqual(repr(actual), repr(expected))
+	
+	def test_exact_match(self):
+		before = core.exactMatchInfo()
+		with mock.patch.object(core, 'query', wraps=core.query) as query:
+			tu = core.find('Technische Universität  Berlin')
+			vienna = core.find('university of vienna', 'AT')
+			self.assertEqual(query.call_count, 0)
+			self.assertIsNone(core.find('University of Vienna', 'DE'))
+			self.assertEqual(query.call_count, 1)
+		self.assertEqual(tu['name'], 'Technical University of Berlin')
+		self.assertEqual(vienna['name'], 'University of Vienna')
+		after = core.exactMatchInfo()
+		self.assertEqual(after['calls'] - before['calls'], 3)
+		self.assertEqual(after['hits'] - before['hits'], 2)
+		self.assertGreater(after['ratio'], 0)
+	
+	def test_exact_match_proximity(self):
+		args = [
+			(None, None, 0.4, 39.814166666667),
+			(43.7, -88.4, 0.4, 43.7778),
+			(43.7, -88.4, 0.01, 39.814166666667),
+			('120', {'lon':0}, 1, 39.814166666667),
+		]
+		for lat, lon, offset, expected in args:
+			actual = core.find('Marian University', 'US', lat, lon, offset)
+			self.assertEqual(actual['lat'], expected)
+	
+	def test_exact_match_agrees_with_findAll(self):
+		args = [
+			('Auburn Hospital', None, 42.3737, -71.1339),
+			('Auburn Hospital',),
+			('University of Education', None, 35.16, 126.85),
+			('Assam University', 'IN'),
+		]
+		for arg in args:
+			expected = next(core.findAll(*arg))
+			self.assertEqual(core.find(*arg), expected)
+			self.assertEqual(core.find(*arg), expected)
+		actual = core.find('Auburn Hospital', None, 42.3737, -71.1339)
+		self.assertEqual(actual['name'], 'Mount Auburn Hospital')
+	
+	def test_parse_cache(self):
+		core.parseCache.clear()
+		before = core.parseCacheInfo()
+		first = list(core.query('Berlin  TU', None, None, None, 1))
+		second = list(core.query('berlin tu', None, None, None, 1))
+		after = core.parseCacheInfo()
+		self.assertEqual(repr(first), repr(second))
+		self.assertEqual(after['misses'] - before['misses'], 1)
+		self.assertEqual(after['hits'] - before['hits'], 1)
+		self.assertGreaterEqual(after['stemHits'] + after['stemMisses'],
+			before['stemHits'] + before['stemMisses'])
+	
+	def test_findAll_limit(self):
+		actual = [item['name'] for item in core.findAll('London', 'CA', limit=1)]
+		expected = ["London Health Sciences Centre",]
+		self.assertSequenceEqual(actual, expected)
+		for limit in [0, -1]:
+			for args in [(), (None, 51.75, -1.25)]:
+				actual = list(core.findAll('University of Oxford', *args,
+					limit=limit, fuzzy=True))
+				self.assertEqual(actual, [])
+	
 	def test_TU_Berlin(self):
 		actual = core.query('TU Berlin', None, None, None, 1)
 		expected = [{
@@ -124,6 +319,16 @@ class test_core(unittest.TestCase):
 		expected = 'UNIV_univ chemacad'
 		self.assertEqual(actual, expected)
 	
+	def test_compiled_abbreviations_with_common_prefixes(self):
+		pattern = core.compileAbbreviations(['in', 'int', 'inst', 'i.e'])
+		actual = pattern.findall('in Int inST ins intx i.e iXe')
+		expected = ['in', 'Int', 'inST', 'i.e']
+		self.assertEqual(actual, expected)
+	
+	def test_compiled_abbreviations_empty(self):
+		pattern = core.compileAbbreviations([])
+		self.assertEqual(pattern.findall('univ inst'), [])
+	
 	def test_find_TU_Berlin(self):
 		arg = 'TU Berlin'
 		expected = [
@@ -141,6 +346,9 @@ class test_core(unittest.TestCase):
 		first = expected[0]
 		self.assertSequenceEqual(list(core.findAll(arg)), expected)
 		self.assertEqual(core.find(arg), first)
+		self.assertEqual(json.loads(json.dumps(core.find(arg))), first)
+		self.assertEqual(json.loads(json.dumps(list(core.findAll(arg)))),
+			expected)
 	
 	def test_find_Univ_Louvain(self):
 		arg = 'Univ Louvain'
@@ -161,6 +369,120 @@ class test_core(unittest.TestCase):
 		self.assertSequenceEqual(list(core.findAll(arg)), expected)
 		self.assertEqual(core.find(arg), first)
 	
+	def test_findMany(self):
+		queries = [
+			'TU Berlin',
+			('Pisa University', None, 0, 0, 0),
+			('Fantasia',),
+			('London', 'CA'),
+			'TU Berlin',
+			('Pisa  University', None, '120', {'lon':0}, 1),
+		]
+		source = lambda item: item and item['source']
+		expected = [source(core.find(*query)) if isinstance(query, tuple)
+			else source(core.find(query)) for query in queries]
+		for batchSize in [1, 2, 1000]:
+			actual = [source(item) for item in core.findMany(queries, batchSize)]
+			self.assertSequenceEqual(actual, expected)
+	
+	def test_findMany_deduplication(self):
+		queries = ['Berlin TU', ('Berlin TU',), ['Berlin TU', None], 'Pisa']
+		with mock.patch.object(core, 'query', wraps=core.query) as query:
+			actual = [item['name'] for item in core.findMany(queries)]
+		expected = ['Technical University of Berlin',] * 3 + ['University of Pisa',]
+		self.assertSequenceEqual(actual, expected)
+		self.assertEqual(query.call_count, 2)
+	
+	def test_findMany_duplicates_are_copies(self):
+		first, second = core.findMany(['Berlin TU', 'Berlin TU'])
+		self.assertIsNot(first, second)
+		first['name'] = None
+		self.assertEqual(second['name'], 'Technical University of Berlin')
+	
+	def test_findMany_empty(self):
+		self.assertSequenceEqual(list(core.findMany([])), [])
+	
+	def test_cache(self):
+		core.enableCache(maxsize=2, precision=1)
+		try:
+			first = core.find('Berlin  TU', 'DE', 52.51, 13.4)
+			second = core.find('berlin tu', 'DE', 52.52, 13.41)
+			self.assertEqual(first, second)
+			self.assertEqual(core.cacheInfo()['hits'], 1)
+			self.assertEqual(core.cacheInfo()['misses'], 1)
+			core.find('Pisa', None)
+			core.find('London', 'CA')
+			self.assertEqual(core.cacheInfo()['evictions'], 1)
+			self.assertEqual(core.cacheInfo()['size'], 2)
+			core.find('Berlin TU', 'DE', 52.5, 13.4)
+			self.assertEqual(core.cacheInfo()['misses'], 4)
+		finally:
+			core.disableCache()
+		self.assertEqual(core.cacheInfo(), None)
+	
+	def createIndex(self, path, name):
+		# create a new index of a single institution in the folder
+		ana = StemmingAnalyzer() | CharsetFilter(accent_map) | LowercaseFilter()
+		schema = Schema(
+			name=STORED,
+			tokens=TEXT(analyzer=ana),
+			alias=TEXT(analyzer=ana, stored=True),
+			lat=NUMERIC(numtype=float, stored=True),
+			lon=NUMERIC(numtype=float, stored=True),
+			isni=STORED,
+			country=STORED,
+			alpha2=ID(stored=True),
+			source=ID(stored=True, unique=True),
+			type=STORED,
+		)
+		ix = index.create_in(path, schema)
+		with ix.writer() as writer:
+			writer.add_document(name=name, tokens=name, alias='', lat=1.0,
+				lon=2.0, isni='', country='Germany', alpha2='DE',
+				source=name, type='university')
+		return ix
+	
+	def test_cache_invalidation_on_index_rebuild(self):
+		with tempfile.TemporaryDirectory() as path:
+			self.createIndex(path, 'Alpha University')
+			ix = Lazy(lambda: index.open_dir(path))
+			searchers = SearcherPool(ix.get())
+			with mock.patch.multiple(core, _ix=ix,
+					_searchers=Lazy(lambda: searchers),
+					_shards=Lazy(lambda: ShardedIndex(path, searchers.searcher)),
+					coordinates=None, bm25=None, trigrams=None, names=None):
+				core.enableCache()
+				try:
+					actual = core.find('University')['name']
+					self.assertEqual(actual, 'Alpha University')
+					self.createIndex(path, 'Beta University')
+					self.assertEqual(ix.get().latest_generation(), 1)
+					actual = core.find('University')['name']
+					self.assertEqual(actual, 'Beta University')
+					self.assertEqual(core.cacheInfo()['hits'], 0)
+					self.assertEqual(core.cacheInfo()['size'], 1)
+				finally:
+					core.disableCache()
+					searchers.close()
+	
+	def test_cache_results_are_copies(self):
+		core.enableCache()
+		try:
+			core.find('TU Berlin')['name'] = None
+			actual = core.find('TU Berlin')['name']
+			self.assertEqual(actual, 'Technical University of Berlin')
+		finally:
+			core.disableCache()
+	
+	def test_cache_unhashable_parameters(self):
+		core.enableCache()
+		try:
+			actual = core.find('Pisa  University', None, '120', {'lon':0}, 1)
+			self.assertEqual(actual['name'], 'University of Pisa')
+			self.assertEqual(core.cacheInfo()['size'], 0)
+		finally:
+			core.disableCache()
+	
 	def test_institution_uniqeness(self):
 		return
 		visited = set()
@@ -0,0 +1,64 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from instmatcher.deletions import editDistances, DeletionIndex
+
+class test_deletions(unittest.TestCase):
+	
+	def setUp(self):
+		self.keys = [
+			'zürich', 'zurich', 'münchen', 'munich', 'göttingen', 'gottingen',
+			'frankfurt', 'frankfort', 'ulm', 'ulmen', 'santiago de compostela',
+		]
+		self.index = DeletionIndex(self.keys)
+	
+	def test_editDistances(self):
+		actual = editDistances('zuerich', ['zurich', 'zürich', 'zuerich', '',
+			'zeurich', 'xxxxxxx'])
+		self.assertSequenceEqual(actual.tolist(), [1, 2, 0, 7, 1, 7])
+		self.assertSequenceEqual(editDistances('', ['', 'ab']).tolist(), [0, 2])
+	
+	def test_transposition(self):
+		actual = editDistances('frankfrut', ['frankfurt', 'frankfort'])
+		self.assertSequenceEqual(actual.tolist(), [1, 2])
+		actual = editDistances('abc', ['ca', 'bca', 'cba'])
+		self.assertSequenceEqual(actual.tolist(), [3, 2, 2])
+	
+	def test_search(self):
+		actual = self.index.search('zuerich')
+		self.assertSequenceEqual(actual, [(1, 1), (0, 2)])
+		actual = self.index.search('goettingen')
+		self.assertSequenceEqual(actual, [(5, 1), (4, 2)])
+		actual = self.index.search('muenchen')
+		self.assertSequenceEqual(actual, [(2, 2)])
+	
+	def test_max_distance(self):
+		self.assertSequenceEqual(self.index.search('zuerich', 1), [(1, 1)])
+		self.assertSequenceEqual(self.index.search('zurich', 0), [(1, 0)])
+		self.assertSequenceEqual(self.index.search('ulm', 2), [(8, 0), (9, 2)])
+		self.assertRaises(ValueError, self.index.search, 'ulm', 3)
+	
+	def test_long_names(self):
+		# the deletions of the prefixes find names differing at the end
+		actual = self.index.search('santiago de compostella')
+		self.assertSequenceEqual(actual, [(10, 1)])
+		actual = self.index.search('santaigo de compostela')
+		self.assertSequenceEqual(actual, [(10, 1)])
+		self.assertSequenceEqual(self.index.search('santiago de chile'), [])
+	
+	def test_unknown(self):
+		self.assertSequenceEqual(self.index.search('berlin'), [])
+		self.assertSequenceEqual(self.index.search(''), [])
+		self.assertEqual(len(self.index), len(self.keys))
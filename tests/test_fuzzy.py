@@ -0,0 +1,96 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from whoosh.fields import Schema, STORED, ID
+from whoosh.filedb.filestore import RamStorage
+from instmatcher.fuzzy import trigrams, TrigramIndex
+
+class test_fuzzy(unittest.TestCase):
+	
+	def setUp(self):
+		schema = Schema(
+			name=STORED,
+			alias=STORED,
+			alpha2=ID(stored=True),
+		)
+		self.ix = RamStorage().create_index(schema)
+		documents = [
+			('University of Washington', 'UW; U Dub', 'US'),
+			('Washington University in St. Louis', '', 'US'),
+			('Technical University of Berlin', 'TU Berlin', 'DE'),
+			('Free University of Berlin', 'FU Berlin', 'DE'),
+			('University of Vienna', 'Universität Wien', 'AT'),
+		]
+		writer = self.ix.writer()
+		for name, alias, alpha2 in documents:
+			writer.add_document(name=name, alias=alias, alpha2=alpha2)
+		writer.commit()
+		self.reader = self.ix.reader()
+		self.index = TrigramIndex(self.reader)
+	
+	def tearDown(self):
+		self.reader.close()
+	
+	def names(self, results):
+		return [[self.reader.stored_fields(docnum)['name']
+			for docnum, similarity in items] for items in results]
+	
+	def test_trigrams(self):
+		self.assertSequenceEqual(trigrams('TU Berlin'), [
+			'  t', ' tu', 'tu ', 'u  ', '  b', ' be', 'ber', 'erl', 'rli',
+			'lin', 'in ', 'n  ',
+		])
+		self.assertSequenceEqual(trigrams(' ,. '), [])
+	
+	def test_misspelled(self):
+		actual = self.names(self.index.search([
+			'Univrsity of Whasington',
+			'Tecnical Universty Berlin',
+		], limit=1))
+		self.assertSequenceEqual(actual, [
+			['University of Washington'],
+			['Technical University of Berlin'],
+		])
+	
+	def test_aliases(self):
+		actual = self.names(self.index.search(['Universitat Wein'], limit=1))
+		self.assertSequenceEqual(actual, [['University of Vienna']])
+	
+	def test_similarities(self):
+		actual = self.index.search(['technical university of berlin'])[0]
+		self.assertEqual(actual[0][0], 2)
+		self.assertAlmostEqual(actual[0][1], 1.0)
+		similarities = [similarity for docnum, similarity in actual]
+		self.assertSequenceEqual(similarities, sorted(similarities, reverse=True))
+	
+	def test_country_threshold_and_limit(self):
+		actual = self.names(self.index.search(['University of Berlin'],
+			alpha2s=['US'], limit=None))
+		self.assertSequenceEqual(actual, [[
+			'University of Washington',
+			'Washington University in St. Louis',
+		]])
+		actual = self.index.search(['University of Berlin'], threshold=0.5,
+			limit=None)[0]
+		self.assertTrue(all(similarity >= 0.5 for docnum, similarity in actual))
+		actual = self.index.search(['University of Berlin'], limit=2)[0]
+		self.assertEqual(len(actual), 2)
+	
+	def test_batches(self):
+		texts = ['TU Berlin', 'Wien', 'xyz', '', 'Washington', 'Free Berlin']
+		expected = self.index.search(texts)
+		self.assertSequenceEqual(self.index.search(texts, batchSize=1), expected)
+		self.assertSequenceEqual(self.index.search([]), [])
+		self.assertSequenceEqual(expected[3], [])
@@ -0,0 +1,168 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from instmatcher import geo
+from instmatcher.gazetteer import Gazetteer
+
+def row(name, ascii, alternates, lat, lon, alpha2, population):
+	fields = [''] * 19
+	fields[1], fields[2], fields[3] = name, ascii, alternates
+	fields[4], fields[5], fields[8] = str(lat), str(lon), alpha2
+	fields[14] = str(population)
+	return fields
+
+class test_gazetteer(unittest.TestCase):
+	
+	def setUp(self):
+		self.gazetteer = Gazetteer([
+			row('Frankfurt (Oder)', 'Frankfurt (Oder)', 'Frankfurt', 52.3, 14.5,
+				'DE', 60000),
+			row('Frankfurt am Main', 'Frankfurt am Main', 'Frankfurt,Francfort',
+				50.1, 8.7, 'DE', 650000),
+			row('Zürich', 'Zurich', 'Zurigo', 47.4, 8.5, 'CH', 340000),
+			row('Frankfort', 'Frankfort', '', 38.2, -84.9, 'US', 25000),
+			row('Gif-sur-Yvette', 'Gif-sur-Yvette', '', 48.7, 2.1, 'FR', 21000),
+		])
+	
+	def test_len(self):
+		self.assertEqual(len(self.gazetteer), 5)
+	
+	def test_unknown(self):
+		actual = list(self.gazetteer.lookup(['berlin']))
+		self.assertSequenceEqual(actual, [])
+	
+	def test_ordered_by_population(self):
+		actual = list(self.gazetteer.lookup(['frankfurt']))
+		self.assertSequenceEqual(actual, [1, 0])
+	
+	def test_ascii_and_alternate_names(self):
+		self.assertSequenceEqual(list(self.gazetteer.lookup(['zurich'])), [2])
+		self.assertSequenceEqual(list(self.gazetteer.lookup(['zürich'])), [2])
+		self.assertSequenceEqual(list(self.gazetteer.lookup(['zurigo'])), [2])
+	
+	def test_several_variants(self):
+		actual = list(self.gazetteer.lookup(['frankfort', 'francfort']))
+		self.assertSequenceEqual(actual, [1, 3])
+	
+	def test_alpha2(self):
+		actual = list(self.gazetteer.lookup(['frankfort', 'francfort'], 'US'))
+		self.assertSequenceEqual(actual, [3])
+		actual = list(self.gazetteer.lookup(['frankfurt'], 'FR'))
+		self.assertSequenceEqual(actual, [])
+	
+	def test_arrays(self):
+		self.assertEqual(self.gazetteer.names[2], 'Zürich')
+		self.assertEqual(self.gazetteer.lat[2], 47.4)
+		self.assertEqual(self.gazetteer.lon[2], 8.5)
+		self.assertEqual(self.gazetteer.alpha2[2], 'CH')
+	
+	def test_lookupSlots(self):
+		slots = self.gazetteer.slots
+		frankfurt, francfort = slots['frankfurt'], slots['francfort']
+		frankfort, zurich = slots['frankfort'], slots['zurich']
+		actual = self.gazetteer.lookupSlots([frankfort, frankfurt], [1, 2])
+		self.assertSequenceEqual(list(actual), [3, 1, 0])
+		actual = self.gazetteer.lookupSlots([frankfurt, francfort, zurich],
+			[2, 1, 1])
+		self.assertSequenceEqual(list(actual), [1, 2, 0])
+		actual = self.gazetteer.lookupSlots([frankfurt, zurich], [1, 1], 'DE')
+		self.assertSequenceEqual(list(actual), [1, 0])
+		self.assertSequenceEqual(list(self.gazetteer.lookupSlots([], [])), [])
+	
+	def test_select(self):
+		ids = self.gazetteer.lookup(['frankfurt', 'frankfort', 'zurich'])
+		self.assertSequenceEqual(list(ids), [1, 2, 0, 3])
+		select = self.gazetteer.select
+		self.assertSequenceEqual(list(select(ids, limit=2)), [1, 2])
+		self.assertSequenceEqual(list(select(ids, minPopulation=60000)),
+			[1, 2, 0])
+		self.assertSequenceEqual(list(select(ids, bestPerCountry=True)),
+			[1, 2, 3])
+		self.assertSequenceEqual(list(select(ids, 2, 100000, True)), [1, 2])
+		self.assertSequenceEqual(list(select(ids, limit=0)), [])
+	
+	def test_empty_names(self):
+		gazetteer = Gazetteer([row('Nowhere', '', '', 0, 0, 'XX', 0)])
+		self.assertSequenceEqual(list(gazetteer.lookup([''])), [])
+	
+	def test_save_and_load(self):
+		with tempfile.TemporaryDirectory() as tmp:
+			path = os.path.join(tmp, 'gazetteer.bin')
+			self.gazetteer.save(path)
+			loaded = Gazetteer.load(path)
+			self.assertEqual(len(loaded), 5)
+			self.assertEqual(len(loaded.slots), len(self.gazetteer.slots))
+			for variant in self.gazetteer.slots:
+				for alpha2 in [None, 'DE', 'US']:
+					self.assertSequenceEqual(
+						list(loaded.lookup([variant], alpha2)),
+						list(self.gazetteer.lookup([variant], alpha2)))
+			self.assertSequenceEqual(list(loaded.lookup(['frankfort',
+				'francfort'])), [1, 3])
+			self.assertSequenceEqual(list(loaded.lookup(['frank'])), [])
+			self.assertSequenceEqual(list(loaded.names), self.gazetteer.names)
+			self.assertEqual(loaded.lat[2], 47.4)
+			self.assertEqual(loaded.lon[2], 8.5)
+			self.assertEqual(loaded.alpha2[2], 'CH')
+			self.assertEqual(loaded.population[2], 340000)
+			ids = np.array([2, 0, 2])
+			self.assertEqual(loaded.localities(ids),
+				['Zürich', 'Frankfurt (Oder)', 'Zürich'])
+			self.assertEqual(loaded.localities(ids),
+				self.gazetteer.localities(ids))
+			del loaded
+	
+	def test_load_invalid(self):
+		with tempfile.TemporaryDirectory() as tmp:
+			path = os.path.join(tmp, 'gazetteer.bin')
+			with open(path, 'wb') as f:
+				f.write(b'0' * 64)
+			self.assertRaises(ValueError, Gazetteer.load, path)
+	
+	def test_geo_backend(self):
+		try:
+			geo.useBackend('gazetteer')
+			actual = list(geo.geocodeAll('Gif sur Yvette', 'FR'))
+			names = [record['locality'] for record in actual]
+			self.assertIn('Gif-sur-Yvette', names)
+			self.assertSequenceEqual(list(geo.geocodeAll(None)), [])
+		finally:
+			geo.useBackend('whoosh')
+	
+	def test_geo_backend_geocodeMany(self):
+		settlements = ['Oxford', None, 'Berlin', ' oxford ', 'Berllin',
+			'Oxford', 'Unknown']
+		alpha2s = ['GB', 'DE', 'DE', 'GB', 'DE', None, None]
+		try:
+			geo.useBackend('gazetteer')
+			for fuzzy in [False, True]:
+				actual = geo.geocodeMany(settlements, alpha2s, fuzzy=fuzzy,
+					limit=3)
+				expected = [
+					list(geo.geocodeAll(settlement, alpha2, fuzzy=fuzzy, limit=3))
+					for settlement, alpha2 in zip(settlements, alpha2s)]
+				self.assertEqual(actual, expected)
+				self.assertIsNot(actual[0][0], actual[3][0])
+			self.assertNotEqual(actual[4], [])
+		finally:
+			geo.useBackend('whoosh')
+	
+	def test_unknown_backend(self):
+		self.assertRaises(ValueError, geo.useBackend, 'dict')
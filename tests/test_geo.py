@@ -12,7 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+import tempfile
 import unittest
+from unittest import mock
 from instmatcher import geo
 
 class test_geo(unittest.TestCase):
@@ -163,3 +166,230 @@ class test_geo(unittest.TestCase):
 			'locality': 'Gif-sur-Yvette',
 		},]
 		self.assertSequenceEqual(actual, expected)
+	
+	def test_fuzzy(self):
+		self.assertEqual(geo.geocode('Berllin', 'DE'), None)
+		actual = geo.geocode('Berllin', 'DE', fuzzy=True)
+		expected = {'lat': 52.52437, 'lon': 13.41053, 'locality': 'Berlin',}
+		self.assertEqual(actual, expected)
+		actual = list(geo.geocodeAll('Zuerrich', 'CH', fuzzy=True))
+		self.assertEqual(actual[0]['locality'], 'Zurich')
+		# names shorter than four characters are not looked up
+		self.assertEqual(list(geo.fuzzyGeocodeAll('Ulx')), [])
+		self.assertEqual(list(geo.fuzzyGeocodeAll(None)), [])
+	
+	def test_fuzzy_only_without_results(self):
+		expected = list(geo.geocodeAll('Boston', 'US'))
+		self.assertEqual(list(geo.geocodeAll('Boston', 'US', fuzzy=True)),
+			expected)
+		actual = geo.geocodeMany(['Berllin', 'Berlin'], ['DE', 'DE'],
+			fuzzy=True)
+		self.assertEqual(actual[0][0], actual[1][0])
+	
+	def test_fuzzy_cache(self):
+		geo.enableCache()
+		try:
+			self.assertEqual(geo.geocode('Berllin', 'DE'), None)
+			self.assertNotEqual(geo.geocode('Berllin', 'DE', fuzzy=True), None)
+			self.assertEqual(geo.cacheInfo()['misses'], 2)
+		finally:
+			geo.disableCache()
+	
+	def test_limit(self):
+		for backend in ['whoosh', 'gazetteer']:
+			try:
+				geo.useBackend(backend)
+				expected = list(geo.geocodeAll('London'))
+				actual = list(geo.geocodeAll('London', limit=2))
+				self.assertEqual(actual, expected[:2])
+				self.assertEqual(geo.geocode('London'), expected[0])
+			finally:
+				geo.useBackend('whoosh')
+	
+	def test_minPopulation(self):
+		cities = geo.gazetteer
+		ids = cities.lookup(['london'])
+		population = int(cities.population[ids[len(ids) // 2]])
+		expected = [{
+			'lat': float(cities.lat[city]),
+			'lon': float(cities.lon[city]),
+			'locality': cities.names[city],
+		} for city in ids if cities.population[city] >= population]
+		key = lambda record: (record['lat'], record['lon'])
+		for backend in ['whoosh', 'gazetteer']:
+			try:
+				geo.useBackend(backend)
+				actual = geo.geocodeAll('London', minPopulation=population)
+				self.assertEqual(sorted(actual, key=key),
+					sorted(expected, key=key))
+				self.assertEqual(list(geo.geocodeAll('London',
+					minPopulation=10 ** 10)), [])
+			finally:
+				geo.useBackend('whoosh')
+	
+	def test_bestPerCountry(self):
+		results = {}
+		for backend in ['whoosh', 'gazetteer']:
+			try:
+				geo.useBackend(backend)
+				for alpha2 in ['GB', 'US', 'CA']:
+					expected = list(geo.geocodeAll('London', alpha2))[:1]
+					actual = list(geo.geocodeAll('London', alpha2,
+						bestPerCountry=True))
+					self.assertEqual(actual, expected)
+				results[backend] = list(geo.geocodeAll('London',
+					bestPerCountry=True))
+			finally:
+				geo.useBackend('whoosh')
+		self.assertEqual(results['whoosh'], results['gazetteer'])
+		self.assertEqual(results['whoosh'][0], geo.geocode('London'))
+	
+	def test_cache(self):
+		geo.enableCache(maxsize=2)
+		try:
+			first = list(geo.geocodeAll('Sao Paulo'))
+			second = list(geo.geocodeAll(' SAO  paulo '))
+			self.assertEqual(first, second)
+			self.assertEqual(geo.cacheInfo()['hits'], 1)
+			self.assertEqual(geo.cacheInfo()['misses'], 1)
+			self.assertEqual(geo.cacheInfo()['disk'], None)
+			self.assertSequenceEqual(list(geo.geocodeAll('Turyan')), [])
+			self.assertSequenceEqual(list(geo.geocodeAll('Turyan')), [])
+			self.assertEqual(geo.cacheInfo()['hits'], 2)
+			list(geo.geocodeAll('London', 'CA'))
+			self.assertEqual(geo.cacheInfo()['evictions'], 1)
+			self.assertEqual(geo.cacheInfo()['size'], 2)
+		finally:
+			geo.disableCache()
+		self.assertEqual(geo.cacheInfo(), None)
+	
+	def test_disk_cache(self):
+		with tempfile.TemporaryDirectory() as tmp:
+			path = os.path.join(tmp, 'geocode.db')
+			try:
+				geo.enableCache(path=path)
+				expected = list(geo.geocodeAll('Boston', 'US'))
+				list(geo.geocodeAll('Turyan'))
+				geo.enableCache(path=path)
+				with mock.patch.object(geo, '_geocodeAll') as search:
+					actual = list(geo.geocodeAll('Boston', 'US'))
+					self.assertEqual(actual, expected)
+					self.assertSequenceEqual(list(geo.geocodeAll('Turyan')), [])
+					search.assert_not_called()
+				self.assertEqual(geo.cacheInfo()['misses'], 2)
+				self.assertEqual(geo.cacheInfo()['disk']['hits'], 2)
+			finally:
+				geo.disableCache()
+	
+	def test_cache_invalidation_on_index_rebuild(self):
+		with tempfile.TemporaryDirectory() as tmp:
+			try:
+				geo.enableCache(path=os.path.join(tmp, 'geocode.db'))
+				list(geo.geocodeAll('Boston'))
+				list(geo.geocodeAll('Boston'))
+				self.assertEqual(geo.cacheInfo()['size'], 1)
+				token = geo._cacheToken()
+				with mock.patch.object(geo, '_cacheToken',
+						return_value=token + ['rebuilt']):
+					self.assertEqual(geo.cacheInfo()['disk']['size'], 1)
+					list(geo.geocodeAll('Boston'))
+					self.assertEqual(geo.cacheInfo()['hits'], 1)
+					self.assertEqual(geo.cacheInfo()['misses'], 2)
+					self.assertEqual(geo.cacheInfo()['disk']['misses'], 2)
+			finally:
+				geo.disableCache()
+	
+	def test_cache_invalidation_on_gazetteer_rebuild(self):
+		# load the gazetteer before its source is replaced below
+		geo.gazetteer
+		with tempfile.TemporaryDirectory() as tmp:
+			path = os.path.join(tmp, 'gazetteer.bin')
+			open(path, 'wb').close()
+			try:
+				geo.useBackend('gazetteer')
+				geo.enableCache()
+				# the gazetteer backend does not need the geoindex
+				with mock.patch.object(geo, 'gazetteerPath', path), \
+						mock.patch.object(geo._searchers, 'get',
+							side_effect=AssertionError):
+					list(geo.geocodeAll('Boston'))
+					list(geo.geocodeAll('Boston'))
+					self.assertEqual(geo.cacheInfo()['hits'], 1)
+					os.utime(path, (0, 0))
+					list(geo.geocodeAll('Boston'))
+					self.assertEqual(geo.cacheInfo()['hits'], 1)
+					self.assertEqual(geo.cacheInfo()['misses'], 2)
+			finally:
+				geo.useBackend('whoosh')
+				geo.disableCache()
+	
+	def test_reverseGeocode(self):
+		actual = geo.reverseGeocode(52.52437, 13.41053, 2)
+		self.assertEqual(len(actual), 2)
+		self.assertEqual(actual[0]['locality'], 'Berlin')
+		self.assertEqual(actual[0]['alpha2'], 'DE')
+		self.assertEqual(actual[0]['country'], 'Germany')
+		self.assertAlmostEqual(actual[0]['distance'], 0)
+		self.assertLess(actual[0]['distance'], actual[1]['distance'])
+		self.assertLess(actual[1]['distance'], 5)
+	
+	def test_reverseGeocode_invalid(self):
+		self.assertSequenceEqual(geo.reverseGeocode(float('nan'), 13.4), [])
+	
+	def test_reverseGeocodeMany(self):
+		actual = geo.reverseGeocodeMany([52.52437, float('nan'), 52.52437],
+			[13.41053, 0, 13.41053 + 360])
+		self.assertEqual(len(actual), 3)
+		self.assertEqual(actual[0], geo.reverseGeocode(52.52437, 13.41053))
+		self.assertSequenceEqual(actual[1], [])
+		self.assertEqual(actual[2][0]['locality'], 'Berlin')
+		self.assertSequenceEqual(geo.reverseGeocodeMany([], []), [])
+	
+	def test_loadTree_truncated(self):
+		with tempfile.TemporaryDirectory() as tmp:
+			path = os.path.join(tmp, 'cities.tree.npz')
+			with open(geo.treePath, 'rb') as f:
+				data = f.read()
+			with open(path, 'wb') as f:
+				f.write(data[:len(data) // 2])
+			with mock.patch.object(geo, 'treePath', path):
+				tree = geo.loadTree()
+				self.assertEqual(len(tree), len(geo.gazetteer))
+				self.assertEqual(len(geo.loadTree()), len(tree))
+	
+	def test_nearestSettlements(self):
+		ids, distances = geo.nearestSettlements([52.52437, float('nan')],
+			[13.41053, 0], 2)
+		self.assertEqual(ids.shape, (2, 2))
+		self.assertEqual(ids[1].tolist(), [-1, -1])
+		self.assertEqual(distances[1].tolist(), [float('inf')] * 2)
+		expected = geo.reverseGeocode(52.52437, 13.41053, 2)
+		self.assertEqual(geo.gazetteer.localities(ids[0]),
+			[record['locality'] for record in expected])
+		self.assertEqual(distances[0].tolist(),
+			[record['distance'] for record in expected])
+	
+	def test_unitVectors(self):
+		actual = geo.unitVectors([0, 90, 0], [0, 0, 90])
+		expected = [[1, 0, 0], [0, 0, 1], [0, 1, 0]]
+		for row, expectedRow in zip(actual.tolist(), expected):
+			for value, expectedValue in zip(row, expectedRow):
+				self.assertAlmostEqual(value, expectedValue)
+	
+	def test_geocodeMany(self):
+		settlements = ['Oxford', None, 'Berlin', ' oxford ', 'Turyan', 'Oxford']
+		alpha2s = ['GB', 'DE', 'DE', 'GB', None, None]
+		actual = geo.geocodeMany(settlements, alpha2s)
+		expected = [list(geo.geocodeAll(settlement, alpha2))
+			for settlement, alpha2 in zip(settlements, alpha2s)]
+		self.assertEqual(actual, expected)
+		self.assertIsNot(actual[0][0], actual[3][0])
+		self.assertSequenceEqual(geo.geocodeMany([]), [])
+		expected = [list(geo.geocodeAll('Berlin'))]
+		self.assertEqual(geo.geocodeMany(['Berlin']), expected)
+	
+	def test_geocodeMany_single_search(self):
+		with mock.patch.object(geo, 'geocodeAll',
+				wraps=geo.geocodeAll) as search:
+			geo.geocodeMany(['Oxford', 'OXFORD', 'Oxford'], ['GB', 'GB', None])
+			self.assertEqual(search.call_count, 2)
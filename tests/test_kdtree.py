@@ -0,0 +1,91 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from instmatcher.kdtree import KDTree
+
+def bruteForce(points, queries, k):
+	dist = np.sqrt(((queries[:, np.newaxis] - points[np.newaxis]) ** 2).sum(-1))
+	return np.sort(dist, axis=1)[:, :k]
+
+class test_kdtree(unittest.TestCase):
+	
+	def setUp(self):
+		rng = np.random.default_rng(0)
+		self.points = rng.normal(size=(2000, 3))
+		self.points[:500] = self.points[0] + rng.normal(scale=1e-3, size=(500, 3))
+		self.points[500:520] = self.points[0]
+		self.queries = rng.normal(size=(300, 3))
+		self.queries[:50] = self.points[:50] + 1e-6
+	
+	def test_nearest(self):
+		for leafsize in [1, 4, 32]:
+			tree = KDTree(self.points, leafsize)
+			for k in [1, 3, 50]:
+				dist, ids = tree.query(self.queries, k, batchsize=64)
+				expected = bruteForce(self.points, self.queries, k)
+				np.testing.assert_allclose(dist, expected)
+				actual = np.sqrt(((self.points[ids] - self.queries[:, np.newaxis])
+					** 2).sum(-1))
+				np.testing.assert_allclose(actual, dist)
+	
+	def test_ties(self):
+		tree = KDTree(self.points)
+		dist, ids = tree.query(self.points[:1], 21)
+		self.assertSequenceEqual(sorted(ids[0, :20].tolist()),
+			[0] + list(range(500, 519)))
+	
+	def test_fewer_points_than_neighbours(self):
+		tree = KDTree(self.points[:3])
+		dist, ids = tree.query(self.queries[:2], 5)
+		self.assertSequenceEqual(ids[:, 3:].tolist(), [[-1, -1], [-1, -1]])
+		self.assertTrue(np.isinf(dist[:, 3:]).all())
+		self.assertSequenceEqual(sorted(ids[0, :3].tolist()), [0, 1, 2])
+	
+	def test_empty(self):
+		tree = KDTree(np.zeros((0, 3)))
+		self.assertEqual(len(tree), 0)
+		dist, ids = tree.query(self.queries[:2])
+		self.assertSequenceEqual(ids.tolist(), [[-1], [-1]])
+		dist, ids = KDTree(self.points).query(np.zeros((0, 3)))
+		self.assertEqual(ids.shape, (0, 1))
+	
+	def test_save_and_load(self):
+		tree = KDTree(self.points)
+		with tempfile.TemporaryDirectory() as tmp:
+			path = os.path.join(tmp, 'tree.npz')
+			tree.save(path, [1, 2.5])
+			loaded = KDTree.load(path)
+		self.assertEqual(loaded.token, [1, 2.5])
+		self.assertEqual(len(loaded), len(self.points))
+		expected = tree.query(self.queries, 2)
+		actual = loaded.query(self.queries, 2)
+		np.testing.assert_array_equal(actual[0], expected[0])
+		np.testing.assert_array_equal(actual[1], expected[1])
+	
+	def test_interrupted_save(self):
+		tree = KDTree(self.points)
+		with tempfile.TemporaryDirectory() as tmp:
+			path = os.path.join(tmp, 'tree.npz')
+			tree.save(path, [1])
+			with mock.patch.object(np, 'savez', side_effect=KeyboardInterrupt):
+				self.assertRaises(KeyboardInterrupt, tree.save, path, [2])
+			self.assertEqual(os.listdir(tmp), ['tree.npz'])
+			self.assertEqual(KDTree.load(path).token, [1])
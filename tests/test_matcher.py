@@ -0,0 +1,122 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+import threading
+import unittest
+from unittest import mock
+import instmatcher
+from instmatcher import core, geo
+
+queries = [
+	'TU Berlin',
+	('London', 'CA', 43.0, -81.27, 0.5),
+	('university of london', 'GB', 51.52, -0.13, 0.05),
+	('univ* of london', 'GB'),
+	('Pisa  University', 'IT', '120', {'lon':0}, 1),
+	'Berlin TU',
+	'Univ Louvain',
+	'Unknown',
+	None,
+]
+
+class test_matcher(unittest.TestCase):
+	
+	def setUp(self):
+		self.matcher = instmatcher.Matcher(4)
+	
+	def tearDown(self):
+		self.matcher.close()
+	
+	def sources(self, results):
+		return [item and item['source'] for item in results]
+	
+	def test_find(self):
+		for params in queries:
+			if not isinstance(params, tuple):
+				params = (params,)
+			self.assertEqual(repr(self.matcher.find(*params)),
+				repr(core.find(*params)))
+			self.assertEqual(repr(list(self.matcher.findAll(*params, limit=3))),
+				repr(list(core.findAll(*params, limit=3))))
+	
+	def test_geocode(self):
+		self.assertEqual(list(self.matcher.geocodeAll('Oxford', 'GB')),
+			list(geo.geocodeAll('Oxford', 'GB')))
+		self.assertEqual(self.matcher.geocode('Berlin'), geo.geocode('Berlin'))
+		args = ['Oxford', 'Berlin'], ['GB', None]
+		self.assertEqual(self.matcher.geocodeMany(*args), geo.geocodeMany(*args))
+		self.assertEqual(self.matcher.geocode('Berllin', 'DE', fuzzy=True),
+			geo.geocode('Berllin', 'DE', fuzzy=True))
+	
+	def test_submit(self):
+		future = self.matcher.submit('London', 'CA', 43.0, -81.27, 0.5)
+		expected = core.find('London', 'CA', 43.0, -81.27, 0.5)
+		self.assertEqual(repr(future.result()), repr(expected))
+	
+	def test_map(self):
+		actual = self.sources(self.matcher.map(queries * 4))
+		expected = self.sources(core.findMany(queries * 4))
+		self.assertSequenceEqual(actual, expected)
+	
+	def test_fuzzy(self):
+		actual = list(self.matcher.map(['Technicl Universty of Berlin'], True))
+		self.assertEqual(actual[0]['name'], 'Technical University of Berlin')
+	
+	def test_context_manager(self):
+		with instmatcher.Matcher(1) as matcher:
+			future = matcher.submit('TU Berlin')
+		self.assertEqual(future.result()['name'], 'Technical University of Berlin')
+		with self.assertRaises(RuntimeError):
+			matcher.submit('TU Berlin')
+	
+	def test_close_shard_searchers(self):
+		with mock.patch.object(core._shards, 'get', side_effect=AssertionError):
+			with instmatcher.Matcher(2) as matcher:
+				actual = list(matcher.map(queries))
+				shards = matcher.shards.shards.values()
+				pools = [shard.searchers for shard in shards]
+				pools.append(matcher.searchers)
+				searchers = [searcher for pool in pools
+					for owner, searcher in pool.searchers.values()]
+		expected = self.sources(core.findMany(queries))
+		self.assertEqual(self.sources(actual), expected)
+		self.assertGreater(len(pools), 1)
+		self.assertTrue(all(searcher.is_closed for searcher in searchers))
+	
+	def test_concurrent_module_functions(self):
+		names = ['Berlin TU', 'univ* of london', 'Pisa University',
+			'Technical University', 'Institute of Physics', 'Hospital London']
+		expected = [self.sources(core.findAll(name, limit=5)) for name in names]
+		failures = []
+		def search():
+			try:
+				for _ in range(5):
+					actual = [self.sources(core.findAll(name, limit=5))
+						for name in names]
+					if actual != expected:
+						failures.append(actual)
+			except Exception as e:
+				failures.append(e)
+		interval = sys.getswitchinterval()
+		sys.setswitchinterval(1e-5)
+		try:
+			threads = [threading.Thread(target=search) for _ in range(8)]
+			for thread in threads:
+				thread.start()
+			for thread in threads:
+				thread.join()
+		finally:
+			sys.setswitchinterval(interval)
+		self.assertEqual(failures, [])
@@ -0,0 +1,64 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from whoosh.fields import Schema, STORED
+from whoosh.filedb.filestore import RamStorage
+from instmatcher.names import normalize, NameIndex
+
+class test_names(unittest.TestCase):
+	
+	def setUp(self):
+		schema = Schema(name=STORED, alias=STORED)
+		self.ix = RamStorage().create_index(schema)
+		documents = [
+			('University of Vienna', 'Universität Wien'),
+			('Technical University of Berlin', 'TU Berlin'),
+			('University of Washington', 'UW; U Dub'),
+			('Technical University of Berlin', ''),
+			('University of Wien', 'University of Vienna'),
+		]
+		writer = self.ix.writer()
+		for name, alias in documents:
+			writer.add_document(name=name, alias=alias)
+		writer.commit()
+		self.reader = self.ix.reader()
+		self.index = NameIndex(self.reader)
+	
+	def tearDown(self):
+		self.reader.close()
+	
+	def lookup(self, text):
+		names, aliases = self.index.lookup(text)
+		return names.tolist(), aliases.tolist()
+	
+	def test_normalize(self):
+		self.assertEqual(normalize('  Universität  WIEN, '), 'universitat wien')
+		self.assertEqual(normalize('École (Paris)'), 'ecole paris')
+		self.assertEqual(normalize(' ,. '), '')
+	
+	def test_lookup_name(self):
+		self.assertEqual(self.lookup('university of vienna'), ([0], [4]))
+		self.assertEqual(
+			self.lookup('Technical University of Berlin'), ([1, 3], []))
+	
+	def test_lookup_alias(self):
+		self.assertEqual(self.lookup('Universitat Wien'), ([], [0]))
+		self.assertEqual(self.lookup('u dub'), ([], [2]))
+		self.assertEqual(self.lookup('TU-Berlin'), ([], [1]))
+		self.assertEqual(self.lookup('University of Wien'), ([4], []))
+	
+	def test_lookup_unknown(self):
+		self.assertEqual(self.lookup('University'), ([], []))
+		self.assertEqual(self.lookup(''), ([], []))
@@ -13,7 +13,9 @@
 # limitations under the License.
 
 import unittest
-from .util import GrobidServer
+import socket
+import requests
+from .util import GrobidProxy, GrobidServer
 from instmatcher import parser
 import xml.etree.ElementTree as et
 
@@ -425,6 +427,50 @@ class test_parser(unittest.TestCase):
 		expected = []
 		self.assertEqual(actual, expected)
 	
+	def test_GrobidClient(self):
+		affiliation = 'first instit,'
+		self.server.setResponse(affiliation, '')
+		expected = list(parser.parseAll(affiliation, self.url))
+		with parser.GrobidClient(self.url) as client:
+			connections = GrobidProxy.connections
+			for _ in range(3):
+				actual = list(parser.parseAll(affiliation, client))
+				self.assertEqual(actual, expected)
+			self.assertEqual(GrobidProxy.connections - connections, 1)
+	
+	def test_GrobidClient_no_keepAlive(self):
+		with parser.GrobidClient(self.url, keepAlive=False) as client:
+			connections = GrobidProxy.connections
+			for _ in range(3):
+				self.assertEqual(parser.parse(__name__, client), None)
+			self.assertEqual(GrobidProxy.connections - connections, 3)
+	
+	def test_GrobidClient_readTimeout(self):
+		# a listening socket accepts connections but never responds
+		with socket.socket() as listener:
+			listener.bind(('localhost', 0))
+			listener.listen()
+			url = 'http://localhost:' + str(listener.getsockname()[1])
+			with parser.GrobidClient(url, readTimeout=0.1) as client:
+				with self.assertRaises(requests.Timeout):
+					parser.parse(__name__, client)
+	
+	def test_queryGrobid_error_status(self):
+		with self.assertRaises(parser.GrobidError):
+			parser.queryGrobid(__name__, self.url + '/unknown')
+		with parser.GrobidClient(self.url + '/unknown') as client:
+			with self.assertRaises(parser.GrobidError):
+				parser.parse(__name__, client)
+	
+	def test_grobidClient(self):
+		client = parser.grobidClient(self.url)
+		self.assertIsInstance(client, parser.GrobidClient)
+		self.assertEqual(client.url, self.url)
+		self.assertIs(parser.grobidClient(self.url), client)
+		self.assertIs(parser.grobidClient(client), client)
+		parser.close()
+		self.assertIsNot(parser.grobidClient(self.url), client)
+	
 	def test_parseAddress_Guinea(self):
 		actual = parser.parseAddress('guinea', et.Element(None))
 		expected = {
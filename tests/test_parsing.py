@@ -0,0 +1,69 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from unittest import mock
+from whoosh.analysis import StemmingAnalyzer
+from whoosh.fields import Schema, TEXT, ID
+from whoosh.qparser import QueryParser
+from instmatcher import parsing
+from instmatcher.parsing import memoiseStemmers, ParseCache
+
+class test_parsing(unittest.TestCase):
+	
+	def setUp(self):
+		self.schema = Schema(
+			tokens=TEXT(analyzer=StemmingAnalyzer()),
+			alpha2=ID,
+		)
+		self.parser = QueryParser('tokens', self.schema)
+	
+	def test_parse_cache(self):
+		cache = ParseCache(2)
+		parse = mock.Mock(wraps=self.parser.parse)
+		with mock.patch.object(self.parser, 'parse', parse):
+			first = cache.parse(self.parser, 'universities of berlin', 1)
+			second = cache.parse(self.parser, 'universities of berlin', 1)
+			self.assertEqual(parse.call_count, 1)
+		self.assertIs(first, second)
+		self.assertEqual(first, self.parser.parse('universities of berlin'))
+		info = cache.info()
+		self.assertEqual(info['hits'], 1)
+		self.assertEqual(info['misses'], 1)
+		self.assertGreater(info['parseTime'], 0)
+		self.assertEqual(info['savedTime'], info['parseTime'])
+	
+	def test_parse_cache_token(self):
+		cache = ParseCache(2)
+		first = cache.parse(self.parser, 'berlin', 1)
+		self.assertIsNot(cache.parse(self.parser, 'berlin', 2), first)
+		self.assertEqual(cache.info()['misses'], 2)
+		cache.clear()
+		self.assertEqual(cache.info()['size'], 0)
+	
+	def test_empty_cache_info(self):
+		info = ParseCache(2).info()
+		self.assertEqual(info['parseTime'], 0.0)
+		self.assertEqual(info['savedTime'], 0.0)
+	
+	def test_memoiseStemmers(self):
+		expected = self.parser.parse('universities of berlin')
+		self.assertIs(memoiseStemmers(self.schema), self.schema)
+		before = parsing.stem.cache_info()
+		parser = QueryParser('tokens', self.schema)
+		actual = parser.parse('universities of berlin')
+		after = parsing.stem.cache_info()
+		self.assertEqual(actual, expected)
+		calls = after.hits + after.misses - before.hits - before.misses
+		self.assertEqual(calls, 2)
@@ -0,0 +1,126 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import time
+import unittest
+import threading
+from unittest import mock
+from whoosh import index
+from whoosh.fields import Schema, ID
+from whoosh.filedb.filestore import RamStorage
+from instmatcher.pool import SearcherPool
+
+class test_pool(unittest.TestCase):
+	
+	def setUp(self):
+		self.storage = RamStorage()
+		self.ix = self.storage.create_index(Schema(name=ID(stored=True)))
+		self.addDocument('first')
+		self.pool = SearcherPool(self.ix)
+	
+	def tearDown(self):
+		self.pool.close()
+	
+	def addDocument(self, name):
+		writer = self.ix.writer()
+		writer.add_document(name=name)
+		writer.commit()
+	
+	def test_reuse_searcher(self):
+		first = self.pool.searcher()
+		second = self.pool.searcher()
+		self.assertIs(first, second)
+		self.assertEqual(second.doc_count(), 1)
+	
+	def test_refresh_on_new_generation(self):
+		first = self.pool.searcher()
+		self.addDocument('second')
+		second = self.pool.searcher()
+		self.assertIsNot(first, second)
+		self.assertEqual(second.doc_count(), 2)
+		self.assertIs(second, self.pool.searcher())
+	
+	def test_refresh_on_rebuild(self):
+		first = self.pool.searcher()
+		generation = self.ix.latest_generation()
+		self.ix = self.storage.create_index(Schema(name=ID(stored=True)))
+		self.addDocument('second')
+		self.assertEqual(self.ix.latest_generation(), generation)
+		second = self.pool.searcher()
+		self.assertIsNot(first, second)
+		self.assertTrue(first.is_closed)
+		self.assertEqual(list(second.lexicon('name')), [b'second'])
+	
+	def test_folder_listed_once_modified(self):
+		with tempfile.TemporaryDirectory() as folder:
+			ix = index.create_in(folder, Schema(name=ID(stored=True)))
+			def addDocument(name, age):
+				with ix.writer() as writer:
+					writer.add_document(name=name)
+				modified = time.time() - age
+				os.utime(folder, (modified, modified))
+			addDocument('first', 10)
+			pool = SearcherPool(ix)
+			with mock.patch.object(ix.storage, 'list',
+					wraps=ix.storage.list) as listing:
+				# opening a searcher lists the files as well
+				first = pool.searcher()
+				calls = listing.call_count
+				self.assertIs(pool.searcher(), first)
+				self.assertEqual(listing.call_count, calls)
+				addDocument('second', 5)
+				second = pool.searcher()
+				self.assertIsNot(second, first)
+				self.assertEqual(second.doc_count(), 2)
+				calls = listing.call_count
+				self.assertIs(pool.searcher(), second)
+				self.assertEqual(listing.call_count, calls)
+				# a folder modified just now may change again unnoticed
+				addDocument('third', 0)
+				third = pool.searcher()
+				calls = listing.call_count
+				self.assertIs(pool.searcher(), third)
+				self.assertEqual(listing.call_count, calls + 1)
+			pool.close()
+	
+	def test_searcher_per_thread(self):
+		searchers = []
+		def target():
+			searchers.append(self.pool.searcher())
+		thread = threading.Thread(target=target)
+		thread.start()
+		thread.join()
+		self.assertIsNot(self.pool.searcher(), searchers[0])
+	
+	def test_close_searchers_of_exited_threads(self):
+		searchers = []
+		def target():
+			searchers.append(self.pool.searcher())
+		thread = threading.Thread(target=target)
+		thread.start()
+		thread.join()
+		self.assertFalse(searchers[0].is_closed)
+		self.pool.searcher()
+		self.assertTrue(searchers[0].is_closed)
+		self.assertEqual(len(self.pool.searchers), 1)
+	
+	def test_close(self):
+		first = self.pool.searcher()
+		self.pool.close()
+		self.assertTrue(first.is_closed)
+		second = self.pool.searcher()
+		self.assertIsNot(first, second)
+		self.assertFalse(second.is_closed)
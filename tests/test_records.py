@@ -0,0 +1,102 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+import json
+import pickle
+import unittest
+from instmatcher.records import InstitutionRecord, GeoRecord, ParseRecord
+
+class FakeStore():
+	
+	def __init__(self):
+		self.calls = 0
+	
+	def fields(self, docnum):
+		self.calls += 1
+		return {
+			'source': 'http://www.wikidata.org/entity/Q51985',
+			'name': 'Technical University of Berlin',
+			'isni': '0000 0001 2195 9817',
+			'lat': 52.511944444444,
+			'lon': 13.326388888889,
+			'country': 'Germany',
+			'alpha2': 'DE',
+			'type': 'university',
+		}
+
+class test_records(unittest.TestCase):
+	
+	def test_mapping(self):
+		record = GeoRecord(lat=1.0, locality='Berlin')
+		self.assertEqual(record, {'lat': 1.0, 'locality': 'Berlin'})
+		self.assertEqual({'lat': 1.0, 'locality': 'Berlin'}, record)
+		self.assertNotEqual(record, {'lat': 1.0})
+		self.assertEqual(len(record), 2)
+		self.assertSequenceEqual(list(record), ['lat', 'locality'])
+		self.assertNotIn('lon', record)
+		self.assertIsNone(record.get('lon'))
+		with self.assertRaises(KeyError):
+			record['lon']
+		self.assertEqual(repr(record), repr({'lat': 1.0, 'locality': 'Berlin'}))
+	
+	def test_mutation(self):
+		record = ParseRecord(institution='TU Berlin')
+		record['alpha2'] = 'DE'
+		record['extra'] = 1
+		record.update({'settlement': ['Berlin']})
+		self.assertEqual(dict(record), {
+			'institution': 'TU Berlin',
+			'alpha2': 'DE',
+			'settlement': ['Berlin'],
+			'extra': 1,
+		})
+		del record['extra']
+		del record['alpha2']
+		with self.assertRaises(KeyError):
+			del record['alpha2']
+		with self.assertRaises(KeyError):
+			del record['unknown']
+		self.assertEqual(record, {'institution': 'TU Berlin', 'settlement': ['Berlin']})
+		self.assertFalse(hasattr(record, '__dict__'))
+	
+	def test_copies(self):
+		record = ParseRecord(institution='TU Berlin', extra=1)
+		for other in [record.copy(), copy.copy(record),
+				pickle.loads(pickle.dumps(record))]:
+			self.assertIsInstance(other, ParseRecord)
+			self.assertEqual(other, record)
+			other['institution'] = None
+			self.assertEqual(record['institution'], 'TU Berlin')
+	
+	def test_institution(self):
+		store = FakeStore()
+		record = InstitutionRecord.fromStore(store, 42)
+		self.assertEqual(store.calls, 1)
+		self.assertEqual(record['name'], 'Technical University of Berlin')
+		self.assertEqual(record, store.fields(42))
+		other = InstitutionRecord.fromFields(store.fields(42))
+		self.assertEqual(other, record)
+		self.assertIs(other['source'], record['source'])
+		self.assertIs(other['country'], record['country'])
+		self.assertEqual(pickle.loads(pickle.dumps(record)), record)
+	
+	def test_json(self):
+		store = FakeStore()
+		results = [InstitutionRecord.fromStore(store, 42),
+			GeoRecord(lat=1.0, lon=2.0), ParseRecord(settlement=['Berlin'])]
+		expected = [store.fields(42),
+			{'lat': 1.0, 'lon': 2.0}, {'settlement': ['Berlin']}]
+		self.assertEqual(json.loads(json.dumps(results)), expected)
+		self.assertEqual(json.loads(json.dumps(results, indent=1)), expected)
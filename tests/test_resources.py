@@ -0,0 +1,83 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os.path
+import threading
+import time
+import unittest
+from instmatcher import core, geo, parser
+from instmatcher.resources import dataPath, Lazy, moduleGetattr, ThreadLocal
+
+class test_resources(unittest.TestCase):
+	
+	def test_dataPath(self):
+		self.assertTrue(os.path.isfile(dataPath('countryInfo.txt')))
+		self.assertTrue(os.path.isdir(dataPath('index')))
+	
+	def test_lazy_loads_once(self):
+		calls = []
+		def load():
+			calls.append(None)
+			time.sleep(0.01)
+			return len(calls)
+		resource = Lazy(load)
+		self.assertEqual(calls, [])
+		results = []
+		threads = [threading.Thread(target=lambda: results.append(resource.get()))
+			for _ in range(8)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.assertEqual(len(calls), 1)
+		self.assertEqual(results, [1] * 8)
+	
+	def test_thread_local(self):
+		resource = ThreadLocal(object)
+		first = resource.get()
+		self.assertIs(resource.get(), first)
+		results = []
+		thread = threading.Thread(target=lambda: results.append(resource.get()))
+		thread.start()
+		thread.join()
+		self.assertIsNot(results[0], first)
+		resource.reset()
+		self.assertIsNot(resource.get(), first)
+	
+	def test_parsers_per_thread(self):
+		parsers = []
+		def load():
+			parsers.append((core.instParser, geo.parser))
+		thread = threading.Thread(target=load)
+		thread.start()
+		thread.join()
+		load()
+		self.assertIsNot(parsers[0][0], parsers[1][0])
+		self.assertIsNot(parsers[0][0].schema, parsers[1][0].schema)
+		self.assertIsNot(parsers[0][1], parsers[1][1])
+	
+	def test_moduleGetattr(self):
+		__getattr__ = moduleGetattr('module', {'value': Lazy(lambda: 42)})
+		self.assertEqual(__getattr__('value'), 42)
+		with self.assertRaises(AttributeError):
+			__getattr__('missing')
+	
+	def test_module_attributes(self):
+		self.assertIs(core.searchers.ix, core.ix)
+		self.assertIs(geo.searchers.ix, geo.ix)
+		self.assertEqual(core.abbreviations['univ'], 'univ*')
+		self.assertEqual(parser.countryDict['DE'], 'Germany')
+		self.assertGreater(len(parser.countryList), len(parser.countryDict))
+		with self.assertRaises(AttributeError):
+			core.missing
@@ -0,0 +1,107 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+from whoosh import index
+from whoosh.analysis import StemmingAnalyzer
+from whoosh.fields import Schema, TEXT, STORED, ID
+from whoosh.qparser import MultifieldParser
+from whoosh.query import Term
+from instmatcher.shards import createShards, ShardedIndex
+
+class test_shards(unittest.TestCase):
+	
+	def setUp(self):
+		self.dir = tempfile.TemporaryDirectory()
+		schema = Schema(
+			name=STORED,
+			tokens=TEXT(analyzer=StemmingAnalyzer()),
+			alias=TEXT(analyzer=StemmingAnalyzer(), stored=True),
+			alpha2=ID(stored=True),
+		)
+		self.ix = index.create_in(self.dir.name, schema)
+		documents = [
+			('University of Oxford', 'Oxford University', 'GB'),
+			('Technical University of Berlin', 'TU Berlin', 'DE'),
+			('Oxford Brookes University', '', 'GB'),
+			('Free University of Berlin', 'FU Berlin', 'DE'),
+			('University of Mississippi', 'Ole Miss', 'US'),
+			('Berlin Institute of Technology', '', 'DE'),
+			('University of London', '', 'GB'),
+		]
+		writer = self.ix.writer()
+		for name, alias, alpha2 in documents:
+			writer.add_document(name=name, tokens=name, alias=alias, alpha2=alpha2)
+		writer.commit()
+		self.searcher = self.ix.searcher()
+		createShards(self.dir.name, self.searcher.reader(), {'tokens': 'name'})
+		self.shards = ShardedIndex(self.dir.name, lambda: self.searcher)
+		self.parser = MultifieldParser(['tokens', 'alias',], schema)
+	
+	def tearDown(self):
+		for shard in self.shards.shards.values():
+			shard.searchers.close()
+		self.searcher.close()
+		self.dir.cleanup()
+	
+	def test_routing(self):
+		self.assertEqual(self.shards.countries, {'DE', 'GB', 'US'})
+		self.assertIsNone(self.shards.shard('FR', self.searcher))
+		self.assertIsNone(self.shards.shard(None, self.searcher))
+		self.assertIsNone(self.shards.shard(['DE'], self.searcher))
+		shard = self.shards.shard('DE', self.searcher)
+		self.assertIs(self.shards.shard('DE', self.searcher), shard)
+		docnums = shard.mapping(shard.searchers.searcher())
+		self.assertSequenceEqual(docnums.tolist(), [1, 3, 5])
+	
+	def test_subfolder(self):
+		names = os.listdir(self.dir.name)
+		self.assertIn('shards', names)
+		self.assertFalse([name for name in names if name.startswith('_DE_')])
+	
+	def test_global_scores(self):
+		for text, alpha2 in [('berlin', 'DE'), ('university', 'GB'),
+				('univ* of berlin', 'DE'), ('oxford OR london', 'GB')]:
+			q = self.parser.parse(text)
+			expected = [(hit['name'], hit.score) for hit in self.searcher.search(
+				q, limit=None, filter=Term('alpha2', alpha2))]
+			searcher = self.shards.shard(alpha2, self.searcher).searchers.searcher()
+			actual = [(hit['name'], hit.score)
+				for hit in searcher.search(q, limit=None)]
+			self.assertSequenceEqual([item[0] for item in actual],
+				[item[0] for item in expected])
+			for (_, actualScore), (_, expectedScore) in zip(actual, expected):
+				self.assertAlmostEqual(actualScore, expectedScore)
+	
+	def test_outdated_shards(self):
+		writer = self.ix.writer()
+		writer.add_document(name='Humboldt University', tokens='Humboldt University',
+			alias='', alpha2='DE')
+		writer.commit()
+		with self.ix.searcher() as searcher:
+			self.assertIsNone(self.shards.shard('DE', searcher))
+	
+	def test_deletions(self):
+		writer = self.ix.writer()
+		writer.delete_document(1)
+		writer.commit()
+		with self.ix.searcher() as searcher:
+			self.assertIsNone(self.shards.shard('DE', searcher))
+	
+	def test_missing_manifest(self):
+		with tempfile.TemporaryDirectory() as empty:
+			shards = ShardedIndex(empty, lambda: self.searcher)
+			self.assertIsNone(shards.shard('DE', self.searcher))
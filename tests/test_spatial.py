@@ -0,0 +1,83 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import numpy as np
+from whoosh.fields import Schema, ID, NUMERIC
+from whoosh.filedb.filestore import RamStorage
+from instmatcher.spatial import CoordinateIndex
+
+class test_spatial(unittest.TestCase):
+	
+	def setUp(self):
+		schema = Schema(
+			lat=NUMERIC(numtype=float, stored=True),
+			lon=NUMERIC(numtype=float, stored=True),
+			alpha2=ID(stored=True),
+		)
+		ix = RamStorage().create_index(schema)
+		writer = ix.writer()
+		for lat, lon, alpha2 in [
+			(0.0, 0.0, 'AA'),
+			(0.5, 0.5, 'BB'),
+			(60.0, 11.5, 'AA'),
+			(60.0, 12.5, 'AA'),
+			(10.0, 179.9, 'CC'),
+			(float('nan'), float('nan'), 'AA'),
+		]:
+			writer.add_document(lat=lat, lon=lon, alpha2=alpha2)
+		writer.commit()
+		self.reader = ix.reader()
+		self.coords = CoordinateIndex(self.reader)
+	
+	def tearDown(self):
+		self.reader.close()
+	
+	def box(self, lat, lon, offset):
+		return np.flatnonzero(self.coords.inside(lat, lon, offset)).tolist()
+	
+	def test_box(self):
+		self.assertEqual(self.box(0, 0, 1), [0, 1])
+		self.assertEqual(self.box(0, 0, 0), [0])
+		self.assertEqual(self.box(45, 45, 1), [])
+		actual = self.coords.inside(0, 0, 1, np.array([1, 2, 5])).tolist()
+		self.assertEqual(actual, [True, False, False])
+	
+	def test_box_longitude_scaled_by_latitude(self):
+		self.assertEqual(self.box(60, 10, 1), [2])
+		self.assertEqual(self.box(60, 10, 1.3), [2, 3])
+		self.assertEqual(self.box(0, 10, 1.3), [])
+	
+	def test_box_across_antimeridian(self):
+		self.assertEqual(self.box(10, -179.9, 0.5), [4])
+	
+	def test_box_illegal_coordinates(self):
+		for lat, lon in [(None, 0), (0, None), ('1', 0), (0, {'lon': 0})]:
+			with self.assertRaises(TypeError):
+				self.coords.inside(lat, lon, 1)
+	
+	def test_decay(self):
+		actual = self.coords.decay(0, 0, 1, [0, 1]).tolist()
+		self.assertAlmostEqual(actual[0], 1)
+		self.assertAlmostEqual(actual[1], 0.7788007830714049)
+		actual = self.coords.decay(0, 0, 0, [0, 1]).tolist()
+		self.assertEqual(actual, [1, 1])
+	
+	def test_boost(self):
+		inside, scores = self.coords.boost(0, 0, 1, np.array([2, 1, 0]),
+			[3.0, 2.0, 1.0])
+		self.assertEqual(inside.tolist(), [False, True, True])
+		self.assertEqual(scores[0], 3.0)
+		self.assertAlmostEqual(scores[1], 2 * 0.7788007830714049)
+		self.assertAlmostEqual(scores[2], 1.0)
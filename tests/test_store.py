@@ -0,0 +1,80 @@
+# Copyright 2016 Matthias Gazzari
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import os.path
+import tempfile
+import unittest
+from whoosh.fields import Schema, STORED, NUMERIC, ID
+from whoosh.filedb.filestore import RamStorage
+from instmatcher.store import FieldStore, indexToken, writeStore
+
+class test_store(unittest.TestCase):
+	
+	def setUp(self):
+		schema = Schema(
+			name=STORED,
+			lat=NUMERIC(numtype=float, stored=True),
+			alpha2=ID(stored=True),
+		)
+		self.ix = RamStorage().create_index(schema)
+		self.documents = [
+			('University of Oxford', 51.75, 'GB'),
+			('Universität Wien', 48.21, 'AT'),
+			('', float('nan'), ''),
+			('東京大学', 35.71, 'JP'),
+		]
+		for i in range(2):
+			writer = self.ix.writer()
+			for name, lat, alpha2 in self.documents[2 * i:2 * i + 2]:
+				writer.add_document(name=name, lat=lat, alpha2=alpha2)
+			writer.commit(merge=False)
+		self.reader = self.ix.reader()
+		self.dir = tempfile.TemporaryDirectory()
+		self.path = os.path.join(self.dir.name, 'fields.store')
+	
+	def tearDown(self):
+		self.reader.close()
+		self.dir.cleanup()
+	
+	def test_fields(self):
+		writeStore(self.reader, self.path, ['name', 'lat', 'alpha2'], ['lat'])
+		store = FieldStore(self.path)
+		self.assertEqual(store.size, len(self.documents))
+		self.assertEqual(store.token, indexToken(self.reader))
+		for docnum, (name, lat, alpha2) in enumerate(self.documents):
+			fields = store.fields(docnum)
+			self.assertSequenceEqual(list(fields), ['name', 'lat', 'alpha2'])
+			self.assertEqual(fields['name'], name)
+			self.assertEqual(fields['alpha2'], alpha2)
+			self.assertIsInstance(fields['lat'], float)
+			if math.isnan(lat):
+				self.assertTrue(math.isnan(fields['lat']))
+			else:
+				self.assertEqual(fields['lat'], lat)
+	
+	def test_rewrite(self):
+		writeStore(self.reader, self.path, ['name'])
+		store = FieldStore(self.path)
+		writeStore(self.reader, self.path, ['alpha2'])
+		self.assertEqual(store.fields(0), {'name': 'University of Oxford'})
+		self.assertEqual(FieldStore(self.path).fields(0), {'alpha2': 'GB'})
+	
+	def test_invalid_file(self):
+		with open(self.path, 'wb') as f:
+			f.write(b'no field store')
+		with self.assertRaises(ValueError):
+			FieldStore(self.path)
+		with self.assertRaises(OSError):
+			FieldStore(self.path + '.missing')
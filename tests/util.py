@@ -19,25 +19,41 @@ from urllib.parse import unquote_plus
 
 class GrobidProxy(BaseHTTPRequestHandler):
 	
+	# keep the connections alive and count them, remember the last path
+	protocol_version = 'HTTP/1.1'
+	connections = 0
+	lastPath = None
+	
+	def setup(self):
+		GrobidProxy.connections += 1
+		super().setup()
+	
 	def do_POST(self):
-		self.send_response(200)
-		self.send_header('Content-type', 'text/plain')
-		self.end_headers()
+		length = int(self.headers['Content-Length'])
+		data = self.rfile.read(length).decode('utf-8')
 		
-		if self.path == '/processAffiliations':
-			length = int(self.headers['Content-Length'])
-			data = self.rfile.read(length).decode('utf-8')
+		GrobidProxy.lastPath = self.path
+		if self.path.partition('?')[0] == '/processAffiliations':
 			_, _, tail = data.partition('affiliations=')
 			response = GrobidProxy.responses.get(unquote_plus(tail), '')
+			status = 200
 		else:
 			response = ''
-		self.wfile.write(bytes(response, 'utf-8'))
+			status = 404
+		body = bytes(response, 'utf-8')
+		self.send_response(status)
+		self.send_header('Content-type', 'text/plain')
+		self.send_header('Content-Length', str(len(body)))
+		if self.headers.get('Connection', '').lower() == 'close':
+			self.send_header('Connection', 'close')
+		self.end_headers()
+		self.wfile.write(body)
 	
 	def log_message(self, format, *args):
 		return
 
 class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
-	pass
+	daemon_threads = True
 
 class GrobidServer():
 	